@@ -0,0 +1,56 @@
+import os
+import sys
+
+# 将 backend/models 下的本地模型导出为 ONNX，并生成动态量化的 int8 版本
+# 用法: python scripts/export_onnx.py [model_name]
+
+def export_onnx(model_name: str = "all-MiniLM-L6-v2"):
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    model_path = os.path.join(project_root, "models", model_name)
+    if not os.path.exists(model_path):
+        print(f"Error: model not found at {model_path}. Run scripts/download_model.py first.")
+        sys.exit(1)
+
+    onnx_dir = os.path.join(model_path, "onnx")
+    os.makedirs(onnx_dir, exist_ok=True)
+    onnx_path = os.path.join(onnx_dir, "model.onnx")
+    int8_path = os.path.join(onnx_dir, "model_qint8.onnx")
+
+    print(f"Loading {model_path}...")
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModel.from_pretrained(model_path)
+    model.eval()
+
+    # 输出 token 级向量 (last_hidden_state)，池化与归一化在 OnnxEmbeddings 中完成
+    sample = tokenizer(["docBrain export sample"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask"]
+    if "token_type_ids" in sample:
+        input_names.append("token_type_ids")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    print(f"Exporting to {onnx_path}...")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+
+    print(f"Quantizing to {int8_path}...")
+    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+
+    print("Export complete.")
+    print("Set \"embedding_backend\" to \"onnx\" or \"onnx-int8\" in docbrain_config.json, "
+          "then check parity with tools/benchmark_embeddings.py.")
+
+if __name__ == "__main__":
+    export_onnx(sys.argv[1] if len(sys.argv) > 1 else "all-MiniLM-L6-v2")
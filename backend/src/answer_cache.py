@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.config_manager import config_manager
+
+class AnswerCache:
+    """
+    语义答案缓存。新查询与已缓存查询的向量余弦相似度达到阈值时直接返回缓存的答案。
+    每个条目记录回答时引用的来源及其版本号 (IngestionEngine.source_version)，
+    任一来源变化、知识库新增来源或条目超过 TTL 后失效。条目数超过上限时按 LRU 淘汰。
+    """
+
+    def __init__(self, ingestor, threshold: Optional[float] = None, ttl_seconds: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        self.ingestor = ingestor
+        if threshold is None:
+            threshold = config_manager.get("answer_cache_threshold", 0.95)
+        if ttl_seconds is None:
+            ttl_seconds = config_manager.get("answer_cache_ttl_seconds", 3600)
+        if max_entries is None:
+            max_entries = config_manager.get("answer_cache_max_entries", 256)
+        self.threshold = float(threshold)
+        self.ttl = float(ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def begin(self) -> int:
+        """请求开始时记下变更计数; 回答期间知识库有变化则不缓存该答案。"""
+        return self.ingestor.change_count
+
+    def _is_valid(self, entry: dict) -> bool:
+        if entry["generation"] != self.ingestor.corpus_generation:
+            return False
+        return all(self.ingestor.source_version(s) == v for s, v in entry["versions"].items())
+
+    def get(self, query_vector: List[float], options: Tuple) -> Optional[Any]:
+        q = self._unit(query_vector)
+        now = time.time()
+        with self._lock:
+            best_key, best_sim = None, self.threshold
+            for key, entry in list(self._entries.items()):
+                if now - entry["created"] > self.ttl:
+                    del self._entries[key]
+                    continue
+                if entry["options"] != options:
+                    continue
+                sim = float(np.dot(entry["vector"], q))
+                if sim >= best_sim:
+                    best_key, best_sim = key, sim
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            entry = self._entries[best_key]
+            if not self._is_valid(entry):
+                del self._entries[best_key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            print(f"Answer cache hit (similarity {best_sim:.3f}): '{entry['query']}'")
+            return entry["answer"]
+
+    def put(self, query: str, query_vector: List[float], options: Tuple, answer: Any,
+            sources: Iterable[str], started_change_count: int):
+        if self.ingestor.change_count != started_change_count:
+            # 回答期间有来源被修改，引用的内容可能已经过时
+            return
+        entry = {
+            "query": query,
+            "vector": self._unit(query_vector),
+            "options": options,
+            "answer": answer,
+            "versions": {s: self.ingestor.source_version(s) for s in set(sources)},
+            "generation": self.ingestor.corpus_generation,
+            "created": time.time()
+        }
+        with self._lock:
+            self._entries[self._next_key] = entry
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries
+        }
@@ -1,11 +1,15 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Header, Depends, Query, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 import os
 import sys
+import json
+import threading
+import time
 from dotenv import load_dotenv
 from dotenv import load_dotenv
 from markdownify import markdownify as md
@@ -25,6 +29,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.ingest import IngestionEngine
 from src.query import QueryEngine
 from src.config_manager import config_manager
+from src.embeddings import get_embedding_stats
+from src.endpoint_executor import EndpointExecutor, EndpointBusy
+from src.filters import build_where, filter_key as build_filter_key
+from src.ranking import keywords_signature
 from src.scheduler import scheduler
 from src.monitor import global_monitor, start_watching
 
@@ -33,16 +41,73 @@ load_dotenv()
 # 全局引擎 (在 lifespan 中初始化)
 engine = None
 query_engine = None
+# 阻塞端点的有界执行器 (在 lifespan 中初始化)
+query_executor = None
+webpage_executor = None
+
+# 预热进度: 预热完成 (无论各组件是否加载成功) 或未启用预热时 /ready 返回 200，失败原因见 errors
+warmup_state = {"running": False, "finished": False, "errors": {}}
+# CrewAI 只用于复杂查询，导入失败时 /query 仍可回退到 RAG，不影响就绪状态
+OPTIONAL_COMPONENTS = ("crew",)
+
+def component_status() -> Dict[str, bool]:
+    """重量级组件是否已加载 (由 /ready 报告)。"""
+    return {
+        "embedding_model": engine is not None and engine.embedding_model.loaded,
+        "llm": query_engine is not None and query_engine.llm_loaded,
+        "crew": "src.crew_agent" in sys.modules
+    }
+
+def warm_up():
+    """在后台线程中预热嵌入模型、LLM 与 CrewAI，使第一个请求不必等待加载。"""
+    started = time.time()
+    warmup_state["running"] = True
+    errors = warmup_state["errors"]
+    try:
+        try:
+            engine.embedding_model.model
+        except Exception as e:
+            print(f"Warm-up: failed to load embedding model: {e}")
+            errors["embedding_model"] = str(e)
+        if query_engine.llm is None:
+            errors["llm"] = "LLM client could not be created, check the provider settings"
+        if query_engine.router is not None:
+            try:
+                query_engine.router.ensure_fitted()
+            except Exception as e:
+                print(f"Warm-up: failed to fit complexity router: {e}")
+        query_engine.prepare_lexical_index()
+        try:
+            engine.ensure_ranking_features()
+        except Exception as e:
+            print(f"Warm-up: failed to update ranking features: {e}")
+        try:
+            engine.ensure_path_index()
+        except Exception as e:
+            print(f"Warm-up: failed to build path index: {e}")
+        try:
+            import src.crew_agent
+        except Exception as e:
+            print(f"Warm-up: failed to import CrewAI: {e}")
+            errors["crew"] = str(e)
+    finally:
+        warmup_state["running"] = False
+        warmup_state["finished"] = True
+    print(f"Warm-up finished in {time.time() - started:.1f}s: {component_status()}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 启动时加载引擎
     print("正在加载 AI 引擎...")
-    global engine, query_engine
+    global engine, query_engine, query_executor, webpage_executor
     engine = IngestionEngine()
     # 共享向量存储实例以确保一致性
-    query_engine = QueryEngine(vector_store=engine.vector_store)
+    query_engine = QueryEngine(vector_store=engine.vector_store, ingestor=engine)
     
+    # LLM 问答与网页索引在各自的线程池中执行，不阻塞事件循环
+    query_executor = EndpointExecutor("query")
+    webpage_executor = EndpointExecutor("ingest_webpage")
+
     # 保证 scheduler 使用全局引擎，正确同步 busy_jobs 和 last_update_time
     scheduler.set_engine(engine)
     
@@ -52,11 +117,20 @@ async def lifespan(app: FastAPI):
     global_monitor.start() # 启动监控
     await scheduler.start() # 启动调度器
     
+    # 模型等在后台加载，服务立即可用; 加载进度见 /ready
+    if config_manager.get("warmup_on_start", True):
+        warmup_state["running"] = True
+        threading.Thread(target=warm_up, name="docbrain-warmup", daemon=True).start()
+
     print("AI 引擎及服务加载成功。")
     yield
     # 清理
     await scheduler.stop()
     global_monitor.stop()
+    query_executor.shutdown()
+    webpage_executor.shutdown()
+    query_engine.close()
+    engine.close()
 
 app = FastAPI(title="docBrain API", description="浏览器扩展集成 API", lifespan=lifespan)
 
@@ -89,11 +163,41 @@ class ConfigPayload(BaseModel):
     deepseek_api_key: Optional[str] = None
     active_provider: Optional[str] = None
     llm_providers: Optional[Dict[str, Any]] = None
+    priority_keywords: Optional[str] = None
 
 class QueryPayload(BaseModel):
     query: str
     quality_mode: Optional[bool] = False
     force_crew: Optional[bool] = False
+    bypass_cache: Optional[bool] = False
+    # 检索过滤条件 (均可选): 类型 file/webpage、扩展名、监控目录、目录前缀、修改时间范围
+    # 时间可为时间戳、YYYY-MM-DD 或相对时间 (如 7d)
+    doc_type: Optional[str] = None
+    extensions: Optional[List[str]] = None
+    watch_root: Optional[str] = None
+    path_prefix: Optional[str] = None
+    modified_after: Optional[Union[float, str]] = None
+    modified_before: Optional[Union[float, str]] = None
+
+    def where(self) -> Optional[dict]:
+        """转换为 Chroma where 条件，条件无效时返回 400。"""
+        try:
+            return build_where(
+                doc_type=self.doc_type,
+                extension=self.extensions,
+                root=self.watch_root,
+                path_prefix=self.path_prefix,
+                modified_after=self.modified_after,
+                modified_before=self.modified_before
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    def filter_key(self) -> Optional[str]:
+        return build_filter_key(
+            doc_type=self.doc_type, extensions=self.extensions, watch_root=self.watch_root,
+            path_prefix=self.path_prefix, modified_after=self.modified_after, modified_before=self.modified_before
+        )
 
 def verify_token(authorization: Optional[str] = Header(None)):
     current_key = get_api_key()
@@ -105,6 +209,23 @@ def verify_token(authorization: Optional[str] = Header(None)):
 def health_check():
     return {"status": "ok"}
 
+@app.get("/ready")
+def readiness_check():
+    components = component_status()
+    required = [loaded for name, loaded in components.items() if name not in OPTIONAL_COMPONENTS]
+    # 未启用预热时组件在第一次使用时加载，服务本身已可用
+    ready = all(required) or not warmup_state["running"]
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "warming_up",
+            "components": components,
+            "optional": list(OPTIONAL_COMPONENTS),
+            "warmup": "running" if warmup_state["running"] else ("finished" if warmup_state["finished"] else "disabled"),
+            "errors": warmup_state["errors"]
+        }
+    )
+
 @app.get("/config")
 def get_config(authorized: bool = Depends(verify_token)):
     return config_manager.config
@@ -112,6 +233,7 @@ def get_config(authorized: bool = Depends(verify_token)):
 @app.post("/config")
 def set_config(payload: ConfigPayload, background_tasks: BackgroundTasks, authorized: bool = Depends(verify_token)):
     old_paths = set(config_manager.get("watch_paths", []))
+    old_keywords = keywords_signature()
     
     update_data = {}
     if payload.watch_paths is not None:
@@ -124,6 +246,8 @@ def set_config(payload: ConfigPayload, background_tasks: BackgroundTasks, author
         update_data["enable_scheduler"] = payload.enable_scheduler
     if payload.api_key is not None:
         update_data["api_key"] = payload.api_key
+    if payload.priority_keywords is not None:
+        update_data["priority_keywords"] = payload.priority_keywords
     
     # 处理 LLM 配置
     if payload.active_provider is not None:
@@ -157,6 +281,11 @@ def set_config(payload: ConfigPayload, background_tasks: BackgroundTasks, author
                 engine.start_job()
                 background_tasks.add_task(scheduler.run_ingestion, list(added_paths), is_prestarted=True)
 
+        # 优先关键字变化: 重新计算已索引分块的路径特征 (只更新元数据)
+        if keywords_signature() != old_keywords:
+            print("配置: 优先关键字已变更. 更新排序特征...")
+            background_tasks.add_task(engine.ensure_ranking_features)
+
         # 如果需要重启监控器
         if "watch_paths" in update_data or "enable_watchdog" in update_data:
             print("配置已更新: 重启监控器...")
@@ -307,7 +436,8 @@ def get_system_status(authorized: bool = Depends(verify_token)):
     # 同时检查本地 API 引擎 (如网页索引)
     api_jobs = engine.busy_jobs if engine else 0
     
-    total_jobs = monitor_jobs + api_jobs
+    # 尚在合并窗口中的文件事件也算作索引中
+    total_jobs = monitor_jobs + api_jobs + global_monitor.pending_events()
     
     # 获取全局版本号
     docs_version = engine.docs_version if engine else 1
@@ -316,28 +446,45 @@ def get_system_status(authorized: bool = Depends(verify_token)):
         "status": "success",
         "is_indexing": total_jobs > 0,
         "pending_jobs": total_jobs,
-        "docs_version": docs_version
+        "pending_events": global_monitor.pending_events(),
+        "docs_version": docs_version,
+        "embedding_cache": get_embedding_stats(engine.embedding_model) if engine else {},
+        "query_embedding": query_engine.embedding_service.stats() if query_engine else {},
+        "query_embedding_cache": query_engine.query_cache.stats() if query_engine else {},
+        "answer_cache": query_engine.answer_cache.stats() if query_engine and query_engine.answer_cache else {},
+        "router": query_engine.router.stats() if query_engine and query_engine.router else {},
+        "lexical_index": engine.lexical_index.stats() if engine else {},
+        "endpoints": {
+            "query": query_executor.stats() if query_executor else {},
+            "ingest_webpage": webpage_executor.stats() if webpage_executor else {}
+        }
     }
 
 @app.post("/ingest/webpage")
 async def ingest_webpage(payload: WebpagePayload, authorized: bool = Depends(verify_token)):
-    try:
+    def index_page():
         content = payload.content
         if payload.is_html:
             content = md(payload.content, heading_style="ATX")
-        
-        chunks_count = engine.ingest_webpage(
+
+        return engine.ingest_webpage(
             url=payload.url,
             title=payload.title,
             content=content,
             additional_duration=payload.duration
         )
-        
+
+    try:
+        # HTML 转换与嵌入都是阻塞操作，交给有界线程池
+        chunks_count = await webpage_executor.run(index_page)
+
         return {
             "status": "success",
             "message": f"Webpage indexed with {chunks_count} chunks.",
             "url": payload.url
         }
+    except EndpointBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -367,7 +514,9 @@ def get_session_messages(session_id: str, authorized: bool = Depends(verify_toke
 
 @app.post("/query")
 async def query_kb(payload: QueryPayload, session_id: Optional[str] = Query(None), authorized: bool = Depends(verify_token)):
-    try:
+    where = payload.where()
+
+    def answer():
         # 1. 记录用户提问
         if session_id:
             history_manager.add_message(session_id, "user", payload.query)
@@ -375,7 +524,10 @@ async def query_kb(payload: QueryPayload, session_id: Optional[str] = Query(None
         response = query_engine.ask(
             payload.query, 
             quality_mode=payload.quality_mode, 
-            force_crew=payload.force_crew
+            force_crew=payload.force_crew,
+            bypass_cache=payload.bypass_cache,
+            where=where,
+            filter_key=payload.filter_key()
         )
         
         if hasattr(response, 'raw'):
@@ -386,11 +538,77 @@ async def query_kb(payload: QueryPayload, session_id: Optional[str] = Query(None
         # 2. 记录 AI 回复
         if session_id:
              history_manager.add_message(session_id, "assistant", response)
+        return response
 
+    try:
+        # LLM 调用是阻塞的，交给有界线程池
+        response = await query_executor.run(answer)
         return {"status": "success", "response": response}
+    except EndpointBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/query/stream")
+def query_kb_stream(payload: QueryPayload, session_id: Optional[str] = Query(None), authorized: bool = Depends(verify_token)):
+    """
+    /query 的流式版本 (Server-Sent Events)。
+    每个片段发送一条 {"token": ...}，结束时发送 event: done (含完整答案)，出错时发送 event: error。
+    完整答案在流结束后写入会话历史。生成过程与 /query 共用同一个有界线程池。
+    """
+    where = payload.where()
+    try:
+        tokens = query_executor.stream(lambda: query_engine.ask_stream(
+            payload.query,
+            quality_mode=payload.quality_mode,
+            force_crew=payload.force_crew,
+            bypass_cache=payload.bypass_cache,
+            where=where,
+            filter_key=payload.filter_key()
+        ))
+    except EndpointBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    async def save_message(role: str, content: str):
+        # 会话历史是阻塞的文件写入，放到线程池执行; 失败只记录日志，不能中断已开始的流
+        try:
+            await run_in_threadpool(history_manager.add_message, session_id, role, content)
+        except Exception as e:
+            print(f"Error saving message: {e}")
+
+    async def event_stream():
+        # 1. 记录用户提问
+        if session_id:
+            await save_message("user", payload.query)
+
+        parts = []
+        try:
+            async for token in tokens:
+                parts.append(token)
+                yield sse_event({"token": token})
+        except Exception as e:
+            yield sse_event({"detail": str(e)}, event="error")
+            return
+        finally:
+            # 客户端断开时立即关闭，归还名额并停止生成
+            await tokens.aclose()
+
+        response = "".join(parts)
+        # 2. 记录 AI 回复
+        if session_id:
+            await save_message("assistant", response)
+        yield sse_event({"status": "success", "response": response}, event="done")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/documents")
 def list_documents(authorized: bool = Depends(verify_token)):
     try:
@@ -11,6 +11,61 @@ DEFAULT_CONFIG = {
     "enable_scheduler": True,
     "api_key": "docbrain_default_key",
     "embedding_model_path": "./models/all-MiniLM-L6-v2",
+    # Number of parser processes for directory ingestion (0 = auto, 1 = sequential)
+    "ingest_workers": 0,
+    # Chunks per embedding batch, collected across files during ingestion
+    "embed_batch_size": 256,
+    # Files at least this large are parsed as a stream in the writer process instead of the pool
+    "streaming_parse_threshold_mb": 20,
+    # Watchdog events for a path are coalesced until it has been quiet this long
+    "watchdog_settle_seconds": 2.0,
+    "watchdog_workers": 2,
+    # Chroma writes are committed by one writer thread as soon as its queue drains (max rows per group, max wait while writes keep arriving)
+    "writer_group_max_rows": 2000,
+    "writer_group_max_wait_ms": 50,
+    # Persistent embedding cache keyed by model + chunk text hash (LRU evicted)
+    "embedding_cache_enabled": True,
+    "embedding_cache_max_entries": 200000,
+    # Embedding backend: "torch" (sentence-transformers), "onnx" or "onnx-int8" (see scripts/export_onnx.py)
+    "embedding_backend": "torch",
+    # CPU threads for the embedding model (0 = library default)
+    "embedding_threads": 0,
+    # Concurrent query embeddings are micro-batched: max batch size and max wait before a batch runs
+    "query_embed_max_batch": 32,
+    "query_embed_max_wait_ms": 5,
+    # In-memory LRU of query embeddings (0 disables)
+    "query_embedding_cache_size": 1024,
+    # Semantic answer cache: reuse an answer for a near-identical question while its sources are unchanged
+    "answer_cache_enabled": True,
+    "answer_cache_threshold": 0.95,
+    "answer_cache_ttl_seconds": 3600,
+    "answer_cache_max_entries": 256,
+    # Local complexity router; ambiguous queries (confidence below threshold) still go to the LLM classifier
+    "router_enabled": True,
+    "router_confidence_threshold": 0.3,
+    "router_centroid_weight": 0.6,
+    # Start retrieval while the complexity classifier runs; the result is reused by RAG or handed to CrewAI
+    "speculative_retrieval": True,
+    "speculative_retrieval_workers": 4,
+    # Per-endpoint worker threads and waiting requests; beyond that /query (and /query/stream) and /ingest/webpage answer 503
+    "query_max_concurrency": 4,
+    "query_max_queue": 32,
+    "ingest_webpage_max_concurrency": 2,
+    "ingest_webpage_max_queue": 64,
+    # Retrieval: "vector" (embeddings only) or "hybrid" (embeddings + BM25 fused by reciprocal rank)
+    "retrieval_mode": "hybrid",
+    # Quality mode: candidate pool size and rerank boosts (priority path, file-name match, recency, effort)
+    "quality_fetch_k": 100,
+    # Comma-separated path keywords boosted in quality mode (empty = PRIORITY_KEYWORDS env var)
+    "priority_keywords": "",
+    "rank_priority_weight": 0.5,
+    "rank_path_tier_weight": 0.1,
+    "rank_recency_weight": 0.2,
+    "rank_recency_days": 30,
+    "rank_effort_weight": 0.1,
+    "rank_effort_full_seconds": 3600,
+    # Load the embedding model, LLM client and CrewAI in the background when the API starts
+    "warmup_on_start": True,
     # Legacy field - kept for backward compatibility but deprecated
     "deepseek_api_key": "",
     # New Provider Configuration
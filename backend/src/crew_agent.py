@@ -5,11 +5,15 @@ from src.config_manager import config_manager
 from crewai.tools import tool
 
 class DocBrainCrew:
-    def __init__(self, query_engine):
+    def __init__(self, query_engine, where=None):
         """
         Initialize the Crew with a reference to the QueryEngine.
+        where: 请求的元数据过滤条件，研究员的每次检索都限定在该范围内。
         """
         self.query_engine = query_engine
+        self.where = where
+        # 研究员检索到的来源，供答案缓存判断答案何时失效
+        self.retrieved_sources = set()
         
         # Initialize LLM using Factory
         try:
@@ -18,9 +22,19 @@ class DocBrainCrew:
              print(f"Error initializing Crew LLM: {e}")
              self.llm = None
 
-    def run_crew(self, query: str) -> str:
+    @staticmethod
+    def format_docs(docs) -> str:
+        results = []
+        for doc in docs:
+            source = doc.metadata.get("source", "Unknown")
+            content = doc.page_content
+            results.append(f"Source: {source}\nContent: {content}")
+        return "\n\n---\n\n".join(results)
+
+    def run_crew(self, query: str, prefetched_docs=None) -> str:
         """
         Run the CrewAI process for a complex query.
+        prefetched_docs: 分类期间已为完整请求检索到的分块，作为研究员的第一条观察。
         """
         print(f"Spawning CrewAI agents for query: {query}")
 
@@ -33,17 +47,11 @@ class DocBrainCrew:
             """
             try:
                 # We reuse the existing retrieval logic
-                docs = self.query_engine.retrieve_context(search_query, k=5, quality_mode=True)
+                docs = self.query_engine.retrieve_context(search_query, k=5, quality_mode=True, where=self.where)
                 if not docs:
                     return "No relevant documents found."
-                
-                results = []
-                for doc in docs:
-                    source = doc.metadata.get("source", "Unknown")
-                    content = doc.page_content
-                    results.append(f"Source: {source}\nContent: {content}")
-                
-                return "\n\n---\n\n".join(results)
+                self.retrieved_sources.update(doc.metadata.get("source", "Unknown") for doc in docs)
+                return self.format_docs(docs)
             except Exception as e:
                 return f"Error searching knowledge base: {str(e)}"
 
@@ -72,6 +80,16 @@ class DocBrainCrew:
         )
 
         # 3. Define Tasks
+        initial_observation = ""
+        if prefetched_docs:
+            self.retrieved_sources.update(doc.metadata.get("source", "Unknown") for doc in prefetched_docs)
+            initial_observation = f"""
+            The knowledge base has already been searched with the full request. Treat these results as your
+            first observation and only search again for components they do not cover:
+
+            {self.format_docs(prefetched_docs)}
+            """
+
         task_research = Task(
             description=f"""
             Analyze the user's request: "{query}"
@@ -79,7 +97,7 @@ class DocBrainCrew:
             2. Use the 'Search Local Knowledge Base' tool to gather information for each component. 
             3. You may need to search multiple times with different keywords to get a complete picture.
             4. Compile all relevant findings, ensuring source paths are preserved.
-            """,
+            {initial_observation}""",
             expected_output="A comprehensive collection of relevant information from the knowledge base, with sources.",
             agent=researcher
         )
@@ -0,0 +1,226 @@
+import sqlite3
+import hashlib
+import os
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import List, Dict, Optional, Any
+
+from langchain_core.embeddings import Embeddings
+
+CACHE_FILE = "embedding_cache.db"
+
+class EmbeddingCache:
+    """
+    磁盘嵌入缓存 (SQLite)。键为 模型标识 + 分块文本哈希，值为 float32 向量。
+    超过容量上限时按最近使用时间 (LRU) 淘汰。
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 200000):
+        self.db_path = db_path
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _get_conn(self):
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def _init_db(self):
+        """初始化数据库表结构"""
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+            # 条目数保存在 meta 中并与写入在同一事务内更新: 进程池的子进程与 API 进程共用同一个文件
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+            cursor.execute(
+                "INSERT OR IGNORE INTO meta (key, value) SELECT 'count', COUNT(*) FROM embeddings"
+            )
+            conn.commit()
+
+    @staticmethod
+    def _read_count(conn) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'count'").fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def make_key(model_id: str, text: str) -> str:
+        return hashlib.sha256(f"{model_id}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """批量读取，命中的条目同时刷新最近使用时间。"""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock, self._get_conn() as conn:
+            cursor = conn.cursor()
+            # SQLite 对参数个数有限制，分批查询
+            for i in range(0, len(unique_keys), 500):
+                part = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                cursor.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part)
+                for key, blob in cursor.fetchall():
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+            if found:
+                now = time.time()
+                cursor.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+            conn.commit()
+            hits = sum(1 for k in keys if k in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, array("f", vector).tobytes(), now) for key, vector in items.items()]
+        with self._lock, self._get_conn() as conn:
+            cursor = conn.cursor()
+            # 写锁从事务开始持有，其他进程的写入不会插在计数与插入之间
+            cursor.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            cursor.executemany("INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows)
+            count = self._read_count(conn) + conn.total_changes - before
+            if count > self.max_entries:
+                # 一次淘汰到容量的 90%，避免每次写入都触发淘汰
+                evict = count - int(self.max_entries * 0.9)
+                cursor.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (evict,)
+                )
+                count -= cursor.rowcount
+            cursor.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('count', ?)", (count,))
+            conn.commit()
+
+    def count(self) -> int:
+        with self._get_conn() as conn:
+            return self._read_count(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": self.count(),
+            "max_entries": self.max_entries
+        }
+
+class CachedEmbeddings(Embeddings):
+    """
+    在嵌入函数前加一层持久缓存: 只有未命中的文本才交给底层模型计算。
+    """
+
+    def __init__(self, base: Embeddings, cache: EmbeddingCache, model_id: str):
+        self.base = base
+        self.cache = cache
+        self.model_id = model_id
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [EmbeddingCache.make_key(self.model_id, text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.base.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(computed)
+            found.update(computed)
+
+        return [list(found[key]) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        # 查询不写入持久缓存 (见 QueryEmbeddingCache)
+        return self.base.embed_query(text)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+class QueryEmbeddingCache:
+    """
+    查询向量的内存 LRU 缓存。键为 模型标识 + 规范化后的查询文本，
+    模型 (或后端) 变化后旧条目自然不再命中。
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max(0, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """NFKC 规范化 (全角/半角统一) 并合并空白。"""
+        return " ".join(unicodedata.normalize("NFKC", text).split())
+
+    def get(self, model_id: str, text: str) -> Optional[List[float]]:
+        key = (model_id, self.normalize(text))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(vector)
+
+    def put(self, model_id: str, text: str, vector: List[float]):
+        if self.max_entries == 0:
+            return
+        key = (model_id, self.normalize(text))
+        with self._lock:
+            self._entries[key] = tuple(vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries
+        }
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache(db_path: str, max_entries: int = 200000) -> EmbeddingCache:
+    """同一缓存文件在进程内共享一个实例，命中计数也随之共享。"""
+    db_path = os.path.abspath(db_path)
+    with _caches_lock:
+        if db_path not in _caches:
+            _caches[db_path] = EmbeddingCache(db_path, max_entries=max_entries)
+        return _caches[db_path]
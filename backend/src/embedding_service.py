@@ -0,0 +1,95 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+from src.config_manager import config_manager
+
+class QueryEmbeddingService:
+    """
+    查询向量的微批处理服务。并发请求的查询文本进入同一个队列，由后台线程在
+    max_wait_ms 内凑成至多 max_batch 条的一批，一次前向计算后把结果分发给各调用方。
+    """
+
+    def __init__(self, embedding_model, max_batch: Optional[int] = None, max_wait_ms: Optional[float] = None):
+        self.embedding_model = embedding_model
+        if max_batch is None:
+            max_batch = config_manager.get("query_embed_max_batch", 32)
+        if max_wait_ms is None:
+            max_wait_ms = config_manager.get("query_embed_max_wait_ms", 5)
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms) / 1000.0)
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="docbrain-query-embed", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        if not self._thread.is_alive():
+            raise RuntimeError("QueryEmbeddingService has been stopped.")
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    nxt = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stopping = True
+                    break
+                batch.append(nxt)
+            self._embed_batch(batch)
+
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        # 查询向量不进入持久的文档嵌入缓存 (由 QueryEmbeddingCache 在内存中缓存)
+        embed_queries = getattr(self.embedding_model, "embed_queries", None)
+        if embed_queries is not None:
+            return embed_queries(texts)
+        return self.embedding_model.embed_documents(texts)
+
+    def _embed_batch(self, batch):
+        # 同一批内的相同文本只计算一次
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = dict(zip(texts, self._embed_texts(texts)))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.requests += len(batch)
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for text, future in batch:
+            future.set_result(list(vectors[text]))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "pending": self._queue.qsize()
+        }
+
+    def stop(self):
+        """处理完队列中已有的请求后停止。"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
@@ -0,0 +1,173 @@
+import os
+import threading
+from typing import Dict, List, Tuple
+from langchain_core.embeddings import Embeddings
+from src.config_manager import config_manager
+from src.embedding_cache import CachedEmbeddings, get_embedding_cache, CACHE_FILE
+
+# embeddings.py is in backend/src
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(BACKEND_DIR)
+
+def resolve_model_path(model_name: str) -> str:
+    """
+    优先使用 backend/models 下的本地模型。
+    """
+    local_model_path = os.path.join(BACKEND_DIR, "models", model_name)
+    if os.path.exists(local_model_path):
+        print(f"Found local model at: {local_model_path}")
+        return local_model_path
+    return model_name
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+def get_embedding_backend() -> str:
+    backend = str(config_manager.get("embedding_backend", "torch") or "torch").lower()
+    if backend not in EMBEDDING_BACKENDS:
+        print(f"Unknown embedding backend '{backend}', falling back to torch.")
+        backend = "torch"
+    return backend
+
+def embedding_model_id(model_name: str, backend: str = "torch") -> str:
+    """模型标识: 模型名 + 影响向量结果的编码参数 (嵌入缓存的键包含它)。"""
+    model_id = f"{os.path.basename(os.path.normpath(model_name))}:normalize=False"
+    if backend != "torch":
+        model_id += f":backend={backend}"
+    return model_id
+
+def create_base_embeddings(model_name: str = "all-MiniLM-L6-v2", backend: str = "torch") -> Embeddings:
+    """创建不带缓存的嵌入模型。backend 为 torch (sentence-transformers) / onnx / onnx-int8。"""
+    model_path = resolve_model_path(model_name)
+
+    if backend in ("onnx", "onnx-int8"):
+        from src.onnx_embeddings import OnnxEmbeddings
+        print(f"Loading embedding model ({backend}): {model_path}...")
+        return OnnxEmbeddings(
+            model_path,
+            quantized=(backend == "onnx-int8"),
+            threads=int(config_manager.get("embedding_threads", 0) or 0)
+        )
+
+    # sentence-transformers / torch 只在真正加载模型时导入
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    apply_thread_settings()
+
+    print(f"Loading embedding model: {model_path}...")
+    # Force CPU to avoid iGPU spikes on some Windows configs
+    model_kwargs = {'device': 'cpu'}
+    encode_kwargs = {'normalize_embeddings': False}
+
+    return HuggingFaceEmbeddings(
+        model_name=model_path,
+        model_kwargs=model_kwargs,
+        encode_kwargs=encode_kwargs
+    )
+
+def create_embedding_model(model_name: str = "all-MiniLM-L6-v2"):
+    """
+    按 embedding_backend 创建嵌入模型。启用缓存时 (embedding_cache_enabled)，外面包一层按文本哈希命中的磁盘缓存。
+    ONNX 模型不可用时回退到 torch 后端。
+    """
+    return load_embedding_model(model_name)[0]
+
+def load_embedding_model(model_name: str = "all-MiniLM-L6-v2") -> Tuple[Embeddings, str]:
+    """同 create_embedding_model，同时返回实际生效的模型标识 (含回退后的后端)。"""
+    backend = get_embedding_backend()
+    try:
+        embedding_model = create_base_embeddings(model_name, backend)
+    except Exception as e:
+        if backend == "torch":
+            raise
+        print(f"Error loading {backend} embedding backend: {e}. Falling back to torch.")
+        backend = "torch"
+        embedding_model = create_base_embeddings(model_name, backend)
+
+    model_id = embedding_model_id(model_name, backend)
+    if not config_manager.get("embedding_cache_enabled", True):
+        return embedding_model, model_id
+
+    cache = get_embedding_cache(
+        os.path.join(PROJECT_ROOT, CACHE_FILE),
+        max_entries=config_manager.get("embedding_cache_max_entries", 200000)
+    )
+    return CachedEmbeddings(embedding_model, cache, model_id), model_id
+
+_threads_applied = False
+
+def apply_thread_settings():
+    """按 embedding_threads 设置 torch 的 CPU 线程数 (0 表示使用默认值)，进程内只生效一次。"""
+    global _threads_applied
+    if _threads_applied:
+        return
+    _threads_applied = True
+    threads = int(config_manager.get("embedding_threads", 0) or 0)
+    if threads > 0:
+        import torch
+        torch.set_num_threads(threads)
+        print(f"Embedding threads: {threads}")
+
+class SharedEmbeddings(Embeddings):
+    """
+    进程内共享的嵌入模型句柄。第一次真正需要向量时才加载模型，
+    因此只读取元数据的命令 (list、peek_db) 不会加载模型。
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = None
+        self._model_id = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self) -> Embeddings:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model, self._model_id = load_embedding_model(self.model_name)
+        return self._model
+
+    @property
+    def model_id(self) -> str:
+        """实际加载的模型标识 (模型名 + 后端 + 编码参数)，用于缓存键。"""
+        self.model
+        return self._model_id
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量计算查询向量，跳过持久的文档嵌入缓存:
+        查询由 QueryEmbeddingCache 在内存中缓存，写入磁盘只会挤掉文档向量。
+        """
+        model = self.model
+        if isinstance(model, CachedEmbeddings):
+            model = model.base
+        return model.embed_documents(texts)
+
+_registry: Dict[str, SharedEmbeddings] = {}
+_registry_lock = threading.Lock()
+
+def get_embedding_model(model_name: str = "all-MiniLM-L6-v2") -> SharedEmbeddings:
+    """返回该模型在进程内唯一的共享实例 (IngestionEngine、QueryEngine、调度器与监控共用)。"""
+    with _registry_lock:
+        if model_name not in _registry:
+            _registry[model_name] = SharedEmbeddings(model_name)
+        return _registry[model_name]
+
+def get_embedding_stats(embedding_model) -> dict:
+    """返回嵌入缓存的命中统计，未启用缓存或模型尚未加载时返回空字典。"""
+    if isinstance(embedding_model, SharedEmbeddings):
+        if not embedding_model.loaded:
+            return {}
+        embedding_model = embedding_model.model
+    if isinstance(embedding_model, CachedEmbeddings):
+        return embedding_model.stats()
+    return {}
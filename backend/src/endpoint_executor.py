@@ -0,0 +1,145 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional
+
+from src.config_manager import config_manager
+
+class EndpointBusy(RuntimeError):
+    """端点的并发与排队都已满，请求被拒绝 (API 返回 503)。"""
+
+class EndpointExecutor:
+    """
+    单个端点的有界执行器。阻塞调用 (LLM、嵌入) 在专属线程池中执行，不占用 asyncio 事件循环;
+    同时运行的请求数不超过 max_concurrency，排队数超过 max_queue 时直接拒绝，
+    因此一个慢调用方无法拖垮整个服务 (/health、/system/status 等始终可用)。
+    """
+
+    def __init__(self, name: str, max_concurrency: Optional[int] = None, max_queue: Optional[int] = None):
+        self.name = name
+        if max_concurrency is None:
+            max_concurrency = config_manager.get(f"{name}_max_concurrency", 4)
+        if max_queue is None:
+            max_queue = config_manager.get(f"{name}_max_queue", 32)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix=f"docbrain-{name}")
+
+    def _check_capacity(self):
+        # 调用方需持有 self._lock
+        if self.running + self.queued >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            raise EndpointBusy(f"Endpoint '{self.name}' is busy, please retry later.")
+
+    def _reserve(self):
+        with self._lock:
+            self._check_capacity()
+            self.queued += 1
+
+    def _unreserve(self):
+        # 任务在开始执行前被取消: 归还排队名额
+        with self._lock:
+            self.queued -= 1
+
+    def _start(self):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+
+    def _finish(self):
+        with self._lock:
+            self.running -= 1
+            self.completed += 1
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """在线程池中执行 fn 并等待结果。队列已满时抛出 EndpointBusy。"""
+        self._reserve()
+
+        def task():
+            self._start()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._finish()
+
+        future = self._executor.submit(task)
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            # 等待方被取消 (客户端断开) 且任务尚未开始时，任务不会再执行
+            if future.cancel():
+                self._unreserve()
+
+    def stream(self, fn: Callable[[], Iterable[Any]]) -> AsyncIterator[Any]:
+        """
+        在线程池中迭代 fn() 返回的阻塞生成器，结果以异步生成器的形式产出。
+        调用时只检查容量 (队列已满时立即抛出 EndpointBusy，调用方仍能返回正常的错误响应);
+        名额在开始迭代时才占用，在迭代结束、出错或 aclose() 时归还，
+        因此从未被迭代的流不会占用名额。
+        """
+        with self._lock:
+            self._check_capacity()
+        return self._stream(fn)
+
+    async def _stream(self, fn: Callable[[], Iterable[Any]]) -> AsyncIterator[Any]:
+        self._reserve()
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        done = object()
+        # 消费方提前关闭时置位，生产线程在两个片段之间检查并停止生成
+        cancelled = threading.Event()
+
+        def emit(value):
+            if not cancelled.is_set():
+                loop.call_soon_threadsafe(items.put_nowait, value)
+
+        def produce():
+            self._start()
+            try:
+                iterator = iter(fn())
+                try:
+                    for item in iterator:
+                        if cancelled.is_set():
+                            break
+                        emit((item, None))
+                finally:
+                    close = getattr(iterator, "close", None)
+                    if close is not None:
+                        close()
+            except Exception as e:
+                emit((None, e))
+            finally:
+                self._finish()
+                emit((done, None))
+
+        future = self._executor.submit(produce)
+        try:
+            while True:
+                item, error = await items.get()
+                if error is not None:
+                    raise error
+                if item is done:
+                    break
+                yield item
+        finally:
+            cancelled.set()
+            if future.cancel():
+                self._unreserve()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queue_depth": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
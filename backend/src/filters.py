@@ -0,0 +1,113 @@
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import List, Optional, Union
+
+from src.config_manager import config_manager
+from src.ingest import root_filter
+
+# filters.py is in backend/src
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DOCUMENT_TYPES = ("file", "webpage")
+RELATIVE_TIME = re.compile(r"^(\d+(?:\.\d+)?)\s*([mhdw])$")
+RELATIVE_UNITS = {"m": 60, "h": 3600, "d": 24 * 3600, "w": 7 * 24 * 3600}
+
+def parse_time(value: Union[float, int, str, None], end_of_day: bool = False) -> Optional[float]:
+    """
+    解析时间过滤条件: 时间戳 (秒)、ISO 日期/时间 (本地时区，例如 2024-05-01 或 2024-05-01T09:00)，
+    或相对时间 (30m / 12h / 7d / 2w，表示距今多久以前)。
+    end_of_day: 只给出日期时取当天结束时刻 (用于区间上限)。
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().lower()
+    match = RELATIVE_TIME.match(text)
+    if match:
+        return time.time() - float(match.group(1)) * RELATIVE_UNITS[match.group(2)]
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(text.upper())
+    except ValueError:
+        raise ValueError(f"Invalid time filter: {value!r} (use a timestamp, YYYY-MM-DD or e.g. 7d)")
+    if end_of_day and len(text) == 10:
+        return parsed.timestamp() + 24 * 3600 - 0.001
+    return parsed.timestamp()
+
+def resolve_watch_path(directory: str) -> str:
+    """与监控器相同的解析规则: 相对路径先按当前目录，不存在时按 backend 目录。"""
+    if not os.path.isabs(directory) and not os.path.exists(directory):
+        potential_path = os.path.join(BACKEND_DIR, directory)
+        if os.path.exists(potential_path):
+            directory = potential_path
+    return os.path.normpath(os.path.abspath(directory))
+
+def directory_filter(directory: str) -> dict:
+    where = root_filter(os.path.abspath(directory))
+    if where is None:
+        raise ValueError(f"Directory is nested too deeply to filter on: {directory}")
+    return where
+
+def filter_key(**spec) -> Optional[str]:
+    """
+    过滤条件的缓存键，由未解析的原始写法生成 (相对时间 "7d" 每次请求解析出的时间戳都不同，
+    按解析结果作键时带相对时间的查询永远无法命中答案缓存)。没有条件时返回 None。
+    """
+    spec = {key: value for key, value in spec.items() if value not in (None, "", [])}
+    return json.dumps(spec, sort_keys=True, ensure_ascii=False) if spec else None
+
+def build_where(doc_type: Optional[str] = None, extension: Union[str, List[str], None] = None,
+                root: Optional[str] = None, path_prefix: Optional[str] = None,
+                modified_after: Union[float, str, None] = None,
+                modified_before: Union[float, str, None] = None) -> Optional[dict]:
+    """
+    把检索过滤条件转换为 Chroma 的 where 子句，使近邻搜索只访问匹配的分块。没有条件时返回 None。
+    root: 配置中的监控目录 (watch_paths 中的原始写法或解析后的路径); path_prefix: 任意目录。
+    两者都通过上级目录元数据 (dir_N) 做等值匹配。条件无效时抛出 ValueError。
+    """
+    conditions = []
+    if doc_type:
+        if doc_type not in DOCUMENT_TYPES:
+            raise ValueError(f"Invalid document type: {doc_type!r} (expected one of {', '.join(DOCUMENT_TYPES)})")
+        conditions.append({"type": doc_type})
+
+    if extension:
+        extensions = [extension] if isinstance(extension, str) else list(extension)
+        extensions = [e.strip().lower() for item in extensions for e in item.split(",") if e.strip()]
+        extensions = sorted({e if e.startswith(".") else f".{e}" for e in extensions})
+        if len(extensions) == 1:
+            conditions.append({"extension": extensions[0]})
+        elif extensions:
+            conditions.append({"extension": {"$in": extensions}})
+
+    if root:
+        watch_paths = {resolve_watch_path(p): p for p in config_manager.get("watch_paths", [])}
+        resolved = resolve_watch_path(root)
+        if resolved not in watch_paths and root not in watch_paths.values():
+            raise ValueError(f"Not a configured watch root: {root}")
+        conditions.append(directory_filter(resolved))
+
+    if path_prefix:
+        conditions.append(directory_filter(path_prefix))
+
+    after = parse_time(modified_after)
+    before = parse_time(modified_before, end_of_day=True)
+    if after is not None:
+        conditions.append({"mtime": {"$gte": after}})
+    if before is not None:
+        conditions.append({"mtime": {"$lte": before}})
+
+    # 文件系统根目录对应空条件 (匹配全部)
+    conditions = [c for c in conditions if c]
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
@@ -1,17 +1,444 @@
 import os
+import re
 import glob
-from typing import List, Optional
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 from langchain_community.vectorstores import Chroma
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
-# Loaders
-import pypdf
-import docx
-import openpyxl
-from pptx import Presentation
+# 各格式的解析库在 iter_file_segments 中按需导入，避免拖慢启动
 from src.config_manager import config_manager
+from src.embeddings import get_embedding_model
+from src.writer import IngestWriter
+from src.lexical_index import get_lexical_index, LEXICAL_INDEX_FILE
+from src.manifest import FileManifest, MANIFEST_FILE, hash_file, hash_text
+from src.ranking import ranking_metadata, path_ranking_metadata, keywords_signature
+
+# 流式解析: 每次按页 / 行组产出文本段，避免整份文件常驻内存
+STREAM_ROW_GROUP = 500
+STREAM_BUFFER_CHARS = 1500 * 8
+
+TEXT_EXTENSIONS = (".txt", ".md")
+
+def iter_file_segments(file_path: str) -> Iterator[str]:
+    """
+    根据文件扩展名逐段产出文本 (PDF 按页、xlsx 按行组、pptx 按幻灯片)。
+    每段自带结尾的换行 (文本文件保留原有换行，其他格式每段后补一个换行)，
+    直接拼接即得到完整文本，流式与整体解析的分块边界因此一致。
+    解析失败时抛出异常，由调用方决定如何处理。
+    """
+    if os.path.splitext(file_path)[1].lower() in TEXT_EXTENSIONS:
+        yield from _iter_raw_segments(file_path)
+        return
+    for segment in _iter_raw_segments(file_path):
+        yield f"{segment}\n"
+
+def _iter_raw_segments(file_path: str) -> Iterator[str]:
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in TEXT_EXTENSIONS:
+        with open(file_path, "r", encoding="utf-8") as f:
+            lines = []
+            for line in f:
+                lines.append(line)
+                if len(lines) >= STREAM_ROW_GROUP:
+                    yield "".join(lines)
+                    lines = []
+            if lines:
+                yield "".join(lines)
+    elif ext == ".pdf":
+        import pypdf
+        reader = pypdf.PdfReader(file_path)
+        for page in reader.pages:
+            yield page.extract_text() or ""
+    elif ext == ".docx":
+        import docx
+        doc = docx.Document(file_path)
+        paragraphs = doc.paragraphs
+        for i in range(0, len(paragraphs), STREAM_ROW_GROUP):
+            yield "\n".join([p.text for p in paragraphs[i:i + STREAM_ROW_GROUP]])
+    elif ext == ".doc":
+        # Using unstructured for legacy .doc
+        from unstructured.partition.auto import partition
+        elements = partition(filename=file_path)
+        yield "\n".join([str(el) for el in elements])
+    elif ext == ".xlsx":
+        import openpyxl
+        # read_only 模式按需读取行，内存占用与表格大小无关
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                rows = []
+                for row in ws.iter_rows(values_only=True):
+                    row_text = " ".join([str(cell) for cell in row if cell is not None])
+                    if row_text:
+                        rows.append(row_text)
+                    if len(rows) >= STREAM_ROW_GROUP:
+                        yield "\n".join(rows)
+                        rows = []
+                if rows:
+                    yield "\n".join(rows)
+        finally:
+            wb.close()
+    elif ext == ".xls":
+        # Using pandas with xlrd for legacy .xls
+        import pandas as pd
+        df_dict = pd.read_excel(file_path, sheet_name=None, engine='xlrd')
+        for sheet_name, df in df_dict.items():
+            yield f"Sheet: {sheet_name}\n{df.to_string(index=False)}"
+    elif ext == ".pptx":
+        from pptx import Presentation
+        prs = Presentation(file_path)
+        for slide in prs.slides:
+            text_list = []
+            for shape in slide.shapes:
+                if hasattr(shape, "text"):
+                    text_list.append(shape.text)
+            yield "\n".join(text_list)
+    elif ext == ".ppt":
+        # Using unstructured for legacy .ppt
+        from unstructured.partition.auto import partition
+        elements = partition(filename=file_path)
+        yield "\n".join([str(el) for el in elements])
+    else:
+        print(f"Unsupported file format: {file_path}")
+
+URL_SCHEME = re.compile(r"^[a-z][a-z0-9+.\-]*://", re.IGNORECASE)
+
+def source_key(source: str) -> str:
+    """分块 source 元数据与清单使用的键: 网页为原始 URL，文件为绝对路径。"""
+    return source if URL_SCHEME.match(source) else os.path.abspath(source)
+
+# 路径前缀索引: 每个分块记录其所有上级目录 (dir_1 = 最顶层目录，dir_N = 所在目录)，
+# 使 "某目录下的所有分块" 成为 Chroma 的等值查询，而不必扫描整个集合
+MAX_DIR_DEPTH = 32
+
+def ancestor_dirs(path: str) -> List[str]:
+    """返回 path 的上级目录列表 (自顶向下，不含文件系统根)。"""
+    dirs = []
+    parent = os.path.dirname(path)
+    while parent and parent != os.path.dirname(parent):
+        dirs.append(parent)
+        parent = os.path.dirname(parent)
+    dirs.reverse()
+    return dirs
+
+def path_metadata(file_path: str) -> dict:
+    return {f"dir_{i}": d for i, d in enumerate(ancestor_dirs(file_path)[:MAX_DIR_DEPTH], 1)}
+
+def root_filter(root_path: str) -> Optional[dict]:
+    """
+    目录 root_path 对应的 Chroma where 条件。根目录返回空字典 (匹配全部)，
+    超出索引深度时返回 None。
+    """
+    depth = len(ancestor_dirs(os.path.join(root_path, "_")))
+    if depth == 0:
+        return {}
+    if depth > MAX_DIR_DEPTH:
+        return None
+    return {f"dir_{depth}": os.path.normpath(root_path)}
+
+def file_metadata(file_path: str) -> dict:
+    # Get file stats for metadata
+    stats = os.stat(file_path)
+    metadata = {
+        "source": file_path,
+        "title": os.path.basename(file_path),
+        "type": "file",
+        "extension": os.path.splitext(file_path)[1].lower(),
+        "file_size": stats.st_size,
+        "mtime": stats.st_mtime
+    }
+    metadata.update(path_metadata(file_path))
+    metadata.update(ranking_metadata(file_path, stats.st_mtime))
+    return metadata
+
+def make_chunk_id(source: str, chunk_hash: str, ordinal: int = 0) -> str:
+    """
+    确定性分块 ID: 同一来源、同一内容的第 ordinal 次出现总是得到同一个 ID，
+    重复写入 (中断后重跑、并发重复索引) 因此是幂等的 upsert，不会产生重复分块。
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}\x00{chunk_hash}\x00{ordinal}"))
+
+# 移动只改写元数据、保留分块 ID，因此某个 ID 可能已被另一个来源 (移动后的文件) 占用。
+# 写入或沿用 ID 之前都要核对其 source，被占用的确定性 ID 换成随机 ID，避免覆盖别的文件的分块。
+
+def parse_file(file_path: str) -> List[Document]:
+    """
+    根据文件扩展名解析单个文件并返回 Document 对象列表。
+    """
+    try:
+        content = "".join(iter_file_segments(file_path))
+        if not content.strip():
+            return []
+        # Return as a single document (splitter will handle chunking)
+        return [Document(page_content=content, metadata=file_metadata(file_path))]
+    except Exception as e:
+        print(f"Error parsing {file_path}: {e}")
+        return []
+
+def get_text_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=1500,
+        chunk_overlap=300,
+        separators=["\n\n", "\n", " ", ""]
+    )
+
+def split_documents(documents: List[Document]) -> List[Document]:
+    return get_text_splitter().split_documents(documents)
+
+def iter_chunks(file_path: str) -> Iterator[Document]:
+    """
+    流式解析并切分: 文本段累积到一定长度就切分并产出分块，
+    最后一块留作下一轮的开头，使分块边界与整体切分基本一致。
+    峰值内存只与缓冲区大小有关，与文件大小无关。
+    """
+    metadata = file_metadata(file_path)
+    splitter = get_text_splitter()
+    buffer = ""
+    for segment in iter_file_segments(file_path):
+        buffer += segment
+        if len(buffer) >= STREAM_BUFFER_CHARS:
+            pieces = splitter.split_text(buffer)
+            for piece in pieces[:-1]:
+                yield Document(page_content=piece, metadata=dict(metadata))
+            # 保留最后一块在缓冲区中的原文 (含结尾换行)，切分器产出的分块已去掉首尾空白
+            buffer = buffer[buffer.rfind(pieces[-1]):] if pieces else ""
+    if buffer.strip():
+        for piece in splitter.split_text(buffer):
+            yield Document(page_content=piece, metadata=dict(metadata))
+
+def interleave(chunks: Iterable[Document], poll: Callable[[], None], every: int = 16) -> Iterator[Document]:
+    """每产出 every 个分块调用一次 poll (用于在流式处理大文件时收取进程池的结果)。"""
+    for n, chunk in enumerate(chunks, 1):
+        yield chunk
+        if n % every == 0:
+            poll()
+
+def parse_and_split(file_path: str) -> List[Document]:
+    """
+    解析并切分单个文件。定义在模块级别，以便在进程池的子进程中执行。
+    """
+    return list(iter_chunks(file_path))
+
+def timed_parse_and_split(file_path: str) -> Tuple[List[Document], float]:
+    """返回分块及解析耗时 (秒)，供流水线统计吞吐量。"""
+    started = time.perf_counter()
+    chunks = parse_and_split(file_path)
+    return chunks, time.perf_counter() - started
+
+
+class IngestPipeline:
+    """
+    分阶段的摄入流水线: 解析 -> 嵌入 -> 写入。
+    跨文件收集分块，凑满固定大小的批次后一次性嵌入，
+    再连同各自的 source 元数据写回向量库。
+    """
+
+    STAGES = ("parse", "embed", "write")
+
+    def __init__(self, engine: "IngestionEngine", batch_size: Optional[int] = None):
+        self.engine = engine
+        if batch_size is None:
+            batch_size = config_manager.get("embed_batch_size", 256)
+        self.batch_size = max(1, int(batch_size))
+        # [(chunk_id, source, chunk)]
+        self.buffer: List[Tuple[str, str, Document]] = []
+        # { source: {"remaining", "ids", "hashes", "flushed", "state", "done"} }
+        self.pending = {}
+        self.files = 0
+        # { stage: [chunks, seconds] }
+        self.stats = {stage: [0, 0.0] for stage in self.STAGES}
+        self.started = time.perf_counter()
+
+    def record(self, stage: str, chunks: int, seconds: float):
+        self.stats[stage][0] += chunks
+        self.stats[stage][1] += seconds
+
+    def add_file(self, abs_path: str, chunks: Iterable[Document], state: dict, parse_seconds: float = 0.0):
+        """
+        登记一个来源的分块 (列表或流式生成器)，按内容哈希与旧分块对比:
+        未变化的分块保留原向量 (只刷新元数据)，消失的分块被删除，只有新分块进入嵌入缓冲区，
+        以确定性 ID upsert 写入。
+        缓冲区满即嵌入写入，因此流式输入时内存占用保持有界。
+        state: _check_existing 返回的文件状态 (duration / size / mtime / content_hash / 旧分块)。
+        """
+        total_duration = state["duration"]
+        old_ids = state.get("chunk_ids") or []
+        old_hashes = state.get("chunk_hashes") or []
+
+        # { chunk_hash: [chunk_id, ...] }，同一内容可能出现多次
+        reusable = None
+        replaced_ids = []
+        # 旧 ID 若已属于其他来源 (该文件被移走后在原路径新建)，既不能沿用也不能当作过时分块删除
+        foreign = self.engine._foreign_ids(list(old_ids), abs_path) if old_ids else set()
+        if foreign:
+            old_ids, old_hashes = [], []
+        if old_ids and len(old_ids) == len(old_hashes):
+            reusable = {}
+            for chunk_id, chunk_hash in zip(old_ids, old_hashes):
+                reusable.setdefault(chunk_hash, []).append(chunk_id)
+        else:
+            # 没有分块哈希记录的旧数据整体替换; 新文件没有需要删除的分块
+            replaced_ids = list(old_ids or state.get("legacy_ids") or [])
+
+        # 该来源的所有新分块写入后才登记清单并删除过时分块，避免中断或失败时丢失旧数据
+        pending = {"remaining": 0, "ids": [], "hashes": [], "flushed": [], "stale": [], "state": state, "done": False}
+        self.pending[abs_path] = pending
+        kept_ids, kept_metadatas = [], []
+        kept_total = new_total = 0
+        # 每个内容哈希在本来源中已出现的次数，用于生成确定性 ID
+        occurrences = {}
+        assigned = set()
+
+        iterator = iter(chunks)
+        try:
+            while True:
+                started = time.perf_counter()
+                chunk = next(iterator, None)
+                parse_seconds += time.perf_counter() - started
+                if chunk is None:
+                    break
+
+                # Inject total duration into metadata
+                chunk.metadata["duration"] = total_duration
+                chunk_hash = hash_text(chunk.page_content)
+                ordinal = occurrences.get(chunk_hash, 0)
+                candidate = make_chunk_id(abs_path, chunk_hash, ordinal)
+                same_content = reusable.get(chunk_hash) if reusable is not None else None
+                if same_content:
+                    # 优先沿用与确定性 ID 相同的旧分块; 旧数据或移动过的文件沿用任意同内容分块
+                    chunk_id = candidate if candidate in same_content else same_content[0]
+                    same_content.remove(chunk_id)
+                    kept_ids.append(chunk_id)
+                    kept_metadatas.append(chunk.metadata)
+                    kept_total += 1
+                    if len(kept_ids) >= self.batch_size:
+                        self.engine._update_chunks(kept_ids, kept_metadatas, [])
+                        kept_ids, kept_metadatas = [], []
+                else:
+                    chunk_id = candidate
+                    # 沿用的旧 ID 可能恰好占用了这个序号，顺延到未使用的序号
+                    while chunk_id in assigned:
+                        ordinal += 1
+                        chunk_id = make_chunk_id(abs_path, chunk_hash, ordinal)
+                    pending["remaining"] += 1
+                    new_total += 1
+                    self.buffer.append((chunk_id, abs_path, chunk))
+                occurrences[chunk_hash] = ordinal + 1
+                assigned.add(chunk_id)
+                pending["ids"].append(chunk_id)
+                pending["hashes"].append(chunk_hash)
+
+                while len(self.buffer) >= self.batch_size:
+                    self._flush_batch()
+        except Exception as e:
+            print(f"Error parsing {abs_path}: {e}")
+            self._abort(abs_path)
+            self.record("parse", 0, parse_seconds)
+            return
+
+        self.record("parse", kept_total + new_total, parse_seconds)
+        self.engine._update_chunks(kept_ids, kept_metadatas, [])
+        pending["stale"] = [chunk_id for id_list in reusable.values() for chunk_id in id_list] if reusable else replaced_ids
+
+        if new_total:
+            self.files += 1
+            print(f"已解析 {kept_total + new_total} 个分块 (新增 {new_total}，复用 {kept_total}): {abs_path}。总时长: {total_duration}秒")
+        elif kept_total:
+            print(f"[{abs_path}] 分块内容未变化，仅更新元数据 ({kept_total} 个分块)")
+
+        pending["done"] = True
+        self._maybe_record(abs_path)
+
+    def _maybe_record(self, source: str):
+        pending = self.pending.get(source)
+        if pending and pending["done"] and pending["remaining"] == 0:
+            del self.pending[source]
+            # 新分块已全部写入，此时再删除过时分块 (沿用同一 ID 的分块已被覆盖，不能删除)
+            current = set(pending["ids"])
+            stale_ids = [chunk_id for chunk_id in pending["stale"] if chunk_id not in current]
+            self.engine._update_chunks([], [], stale_ids)
+            self.engine._record_manifest(source, pending["state"], pending["ids"], pending["hashes"])
+
+    def _abort(self, source: str):
+        """解析中途失败: 丢弃该来源未写入的分块，并删除已写入的新分块，保留旧数据。"""
+        pending = self.pending.pop(source, None)
+        self.buffer = [item for item in self.buffer if item[1] != source]
+        self.engine._bump_source(source)
+        if pending and pending["flushed"]:
+            self.engine._update_chunks([], [], pending["flushed"])
+
+    def _claim_ids(self, batch: List[Tuple[str, str, Document]]) -> List[Tuple[str, str, Document]]:
+        """确定性 ID 已被其他来源的分块占用时换成随机 ID，并同步该来源待登记的 ID 列表。"""
+        taken = self.engine._foreign_ids([chunk_id for chunk_id, _, _ in batch], sources=[s for _, s, _ in batch])
+        if not taken:
+            return batch
+        claimed = []
+        for chunk_id, source, chunk in batch:
+            if chunk_id in taken:
+                new_id = str(uuid.uuid4())
+                ids = self.pending[source]["ids"]
+                ids[ids.index(chunk_id)] = new_id
+                chunk_id = new_id
+            claimed.append((chunk_id, source, chunk))
+        return claimed
+
+    def flush(self):
+        while self.buffer:
+            self._flush_batch()
+
+    def _flush_batch(self):
+        batch = self.buffer[:self.batch_size]
+        del self.buffer[:self.batch_size]
+        batch = self._claim_ids(batch)
+
+        texts = [chunk.page_content for _, _, chunk in batch]
+        started = time.perf_counter()
+        embeddings = self.engine.embedding_model.embed_documents(texts)
+        self.record("embed", len(batch), time.perf_counter() - started)
+
+        started = time.perf_counter()
+        # upsert: 同一 ID 已存在时覆盖而不是报错或重复
+        self.engine.writer.upsert(
+            ids=[chunk_id for chunk_id, _, _ in batch],
+            embeddings=embeddings,
+            metadatas=[chunk.metadata for _, _, chunk in batch],
+            documents=texts
+        )
+        self.record("write", len(batch), time.perf_counter() - started)
+
+        for chunk_id, source, _ in batch:
+            pending = self.pending[source]
+            pending["remaining"] -= 1
+            pending["flushed"].append(chunk_id)
+        for source in {source for _, source, _ in batch}:
+            self._maybe_record(source)
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        result = {"files": self.files, "elapsed": round(elapsed, 3)}
+        for stage, (chunks, seconds) in self.stats.items():
+            result[stage] = {
+                "chunks": chunks,
+                "seconds": round(seconds, 3),
+                "chunks_per_sec": round(chunks / seconds, 1) if seconds > 0 else 0.0
+            }
+        return result
+
+    def report(self) -> dict:
+        summary = self.summary()
+        if summary["files"]:
+            stages = " | ".join(
+                f"{stage} {summary[stage]['chunks_per_sec']} chunks/s"
+                for stage in self.STAGES
+            )
+            print(f"Pipeline throughput ({summary['files']} files, {summary['elapsed']}s): {stages}")
+        return summary
+
 
 class IngestionEngine:
     def __init__(self, persist_directory: str = None, model_name: str = "all-MiniLM-L6-v2"):
@@ -28,32 +455,27 @@ class IngestionEngine:
             
         self.persist_directory = persist_directory
 
-        # Check for local model
-        # Models are in backend/models
-        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        local_model_path = os.path.join(backend_dir, "models", model_name)
-        if os.path.exists(local_model_path):
-            print(f"Found local model at: {local_model_path}")
-            model_name = local_model_path
-        
-        print(f"Loading embedding model: {model_name}...")
-        # Force CPU to avoid iGPU spikes on some Windows configs
-        model_kwargs = {'device': 'cpu'}
-        encode_kwargs = {'normalize_embeddings': False}
-        
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name=model_name,
-            model_kwargs=model_kwargs,
-            encode_kwargs=encode_kwargs
-        )
+        self.embedding_model = get_embedding_model(model_name)
         self.vector_store = Chroma(
             persist_directory=self.persist_directory,
             embedding_function=self.embedding_model
         )
+        self.manifest = FileManifest(os.path.join(self.persist_directory, MANIFEST_FILE))
+        # 词法 (BM25) 索引随每次写入增量更新，供混合检索使用
+        self.lexical_index = get_lexical_index(os.path.join(self.persist_directory, LEXICAL_INDEX_FILE))
+        # 所有写操作都经由唯一的写入线程，按组提交
+        self.writer = IngestWriter(self.vector_store, listeners=[self.lexical_index.on_write])
         self.busy_jobs = 0
         import time
         self.last_update_time = time.time()
         self.docs_version = 1
+        self.last_ingest_stats = {}
+        # 来源级版本号 (供答案缓存判断引用的来源是否变化):
+        # source_versions 按来源递增; corpus_generation 在新增来源或批量删除时递增
+        self.source_versions = {}
+        self.corpus_generation = 0
+        self.change_count = 0
+        self._versions_lock = threading.Lock()
 
     def start_job(self):
         self.busy_jobs += 1
@@ -65,98 +487,139 @@ class IngestionEngine:
         self.last_update_time = time.time()
         self.docs_version += 1
 
+    def close(self):
+        """等待已提交的写操作完成并停止写入线程。"""
+        self.writer.stop()
+
+    def _bump_source(self, source: Optional[str] = None, new: bool = False):
+        """记录一次来源变更。source 为 None 表示无法归属到单个来源的批量变更。"""
+        with self._versions_lock:
+            self.change_count += 1
+            if source is not None:
+                self.source_versions[source] = self.source_versions.get(source, 0) + 1
+            if new or source is None:
+                self.corpus_generation += 1
+
+    def source_version(self, source: str) -> int:
+        return self.source_versions.get(source, 0)
+
     def parse_file(self, file_path: str) -> List[Document]:
         """
         根据文件扩展名解析单个文件并返回 Document 对象列表。
         """
-        ext = os.path.splitext(file_path)[1].lower()
-        content = ""
+        return parse_file(file_path)
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        return split_documents(documents)
+
+    def _get_chroma_state(self, source: str) -> Tuple[int, float, List[str]]:
+        """
+        从向量库读取来源的现有状态 (duration, mtime, ids)。
+        仅用于清单中尚无记录的来源 (例如清单建立之前索引的数据)。
+        """
+        # 同时查找早期以相对路径记录的来源
+        sources = [source]
+        if os.path.isabs(source) and os.path.relpath(source) != source:
+            sources.append(os.path.relpath(source))
         try:
-            if ext in [".txt", ".md"]:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-            elif ext == ".pdf":
-                reader = pypdf.PdfReader(file_path)
-                text_list = []
-                for page in reader.pages:
-                    text_list.append(page.extract_text())
-                content = "\n".join(text_list)
-            elif ext == ".docx":
-                doc = docx.Document(file_path)
-                content = "\n".join([p.text for p in doc.paragraphs])
-            elif ext == ".doc":
-                # Using unstructured for legacy .doc
-                from unstructured.partition.auto import partition
-                elements = partition(filename=file_path)
-                content = "\n".join([str(el) for el in elements])
-            elif ext == ".xlsx":
-                wb = openpyxl.load_workbook(file_path, data_only=True)
-                text_list = []
-                for sheet in wb.sheetnames:
-                    ws = wb[sheet]
-                    for row in ws.iter_rows(values_only=True):
-                        row_text = " ".join([str(cell) for cell in row if cell is not None])
-                        if row_text:
-                            text_list.append(row_text)
-                content = "\n".join(text_list)
-            elif ext == ".xls":
-                # Using pandas with xlrd for legacy .xls
-                import pandas as pd
-                df_dict = pd.read_excel(file_path, sheet_name=None, engine='xlrd')
-                text_list = []
-                for sheet_name, df in df_dict.items():
-                    text_list.append(f"Sheet: {sheet_name}")
-                    text_list.append(df.to_string(index=False))
-                content = "\n".join(text_list)
-            elif ext == ".pptx":
-                prs = Presentation(file_path)
-                text_list = []
-                for slide in prs.slides:
-                    for shape in slide.shapes:
-                        if hasattr(shape, "text"):
-                            text_list.append(shape.text)
-                content = "\n".join(text_list)
-            elif ext == ".ppt":
-                # Using unstructured for legacy .ppt
-                from unstructured.partition.auto import partition
-                elements = partition(filename=file_path)
-                content = "\n".join([str(el) for el in elements])
-            else:
-                print(f"Unsupported file format: {file_path}")
-                return []
+            # 提取已有的 metadatas 第一条作为参考
+            where = {"source": source} if len(sources) == 1 else {"source": {"$in": sources}}
+            results = self.vector_store._collection.get(where=where, include=["metadatas"])
+            if results and results.get("metadatas") and len(results["metadatas"]) > 0:
+                first_metadata = results["metadatas"][0]
+                return first_metadata.get("duration", 0), first_metadata.get("mtime", 0), results["ids"]
+        except Exception:
+            pass
+        return 0, 0, []
 
-            if not content.strip():
-                return []
-            
-            # Get file stats for metadata
-            stats = os.stat(file_path)
-            metadata = {
-                "source": file_path,
-                "title": os.path.basename(file_path),
-                "type": "file",
-                "extension": os.path.splitext(file_path)[1].lower(),
-                "file_size": stats.st_size,
-                "mtime": stats.st_mtime
-            }
-            
-            # Return as a single document (splitter will handle chunking)
-            return [Document(page_content=content, metadata=metadata)]
+    def _check_existing(self, abs_path: str, additional_duration: int = 0, entries: Optional[dict] = None) -> Optional[dict]:
+        """
+        检查文件是否需要重新索引。优先查询本地清单，只需 stat 即可判断未修改的文件。
+        文件未修改时返回 None，否则返回文件状态 (duration / size / mtime / content_hash)。
+        entries: 预先加载的清单条目，批量扫描时避免逐个查询。
+        """
+        try:
+            stats = os.stat(abs_path)
+        except OSError as e:
+            print(f"检查文件信息失败 {abs_path}: {e}")
+            return None
+
+        entry = entries.get(abs_path) if entries is not None else self.manifest.get(abs_path)
+        content_hash = None
+        # 清单建立之前索引的分块，重新索引成功后删除
+        legacy_ids = []
+        if entry:
+            existing_duration = entry["duration"]
+            if additional_duration == 0:
+                # 考虑到浮点数精度截断问题，这里设置一定容差
+                if entry["size"] == stats.st_size and abs(stats.st_mtime - entry["mtime"]) < 1.0:
+                    print(f"[{abs_path}] 文件未修改，跳过重构向量 (Skipping unmodified file)")
+                    return None
+                # mtime 变化但内容相同 (例如重新保存或复制)，只刷新清单
+                content_hash = hash_file(abs_path)
+                if content_hash == entry["content_hash"]:
+                    self.manifest.touch(abs_path, stats.st_size, stats.st_mtime)
+                    print(f"[{abs_path}] 文件内容未变化，跳过重构向量 (Skipping unchanged content)")
+                    return None
+        else:
+            existing_duration, existing_mtime, ids = self._get_chroma_state(abs_path)
+            legacy_ids = ids
+            if existing_mtime > 0 and abs(stats.st_mtime - existing_mtime) < 1.0 and additional_duration == 0:
+                # 补录清单，下次扫描无需再查询 Chroma
+                self.manifest.upsert(abs_path, stats.st_size, stats.st_mtime, hash_file(abs_path), ids, existing_duration)
+                print(f"[{abs_path}] 文件未修改，跳过重构向量 (Skipping unmodified file)")
+                return None
+
+        if content_hash is None:
+            content_hash = hash_file(abs_path)
 
+        return {
+            "duration": int(existing_duration + additional_duration),
+            "size": stats.st_size,
+            "mtime": stats.st_mtime,
+            "content_hash": content_hash,
+            "chunk_ids": entry["chunk_ids"] if entry else [],
+            "chunk_hashes": entry["chunk_hashes"] if entry else [],
+            "legacy_ids": legacy_ids
+        }
+
+    def _record_manifest(self, source: str, state: dict, chunk_ids: List[str], chunk_hashes: Optional[List[str]] = None):
+        self._bump_source(source, new=not state.get("chunk_ids"))
+        try:
+            self.manifest.upsert(
+                source, state["size"], state["mtime"], state["content_hash"], chunk_ids, state["duration"],
+                chunk_hashes=chunk_hashes
+            )
         except Exception as e:
-            print(f"Error parsing {file_path}: {e}")
-            return []
+            print(f"Error updating manifest for {source}: {e}")
 
-    def split_documents(self, documents: List[Document]) -> List[Document]:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1500,
-            chunk_overlap=300,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        return text_splitter.split_documents(documents)
+    def _foreign_ids(self, ids: List[str], source: Optional[str] = None,
+                     sources: Optional[List[str]] = None) -> set:
+        """
+        返回 ids 中已存在、但 source 不是对应来源的分块 ID。
+        source: 所有 ID 的预期来源; sources: 与 ids 一一对应的预期来源。
+        """
+        expected = dict(zip(ids, sources)) if sources is not None else dict.fromkeys(ids, source)
+        foreign = set()
+        for i in range(0, len(ids), 5000):
+            result = self.vector_store._collection.get(ids=ids[i:i + 5000], include=["metadatas"])
+            for chunk_id, metadata in zip(result.get("ids") or [], result.get("metadatas") or []):
+                if (metadata or {}).get("source") != expected[chunk_id]:
+                    foreign.add(chunk_id)
+        return foreign
+
+    def _update_chunks(self, kept_ids: List[str], kept_metadatas: List[dict], stale_ids: List[str]):
+        """
+        增量更新: 保留的分块只刷新元数据 (不重新嵌入)，消失的分块按 ID 删除。
+        """
+        if stale_ids:
+            self.writer.delete(ids=stale_ids)
+        if kept_ids:
+            self.writer.update(ids=kept_ids, metadatas=kept_metadatas)
 
     def process_file(self, file_path: str, additional_duration: int = 0):
         """
-        索引单个文件: 删除旧向量 -> 解析 -> 切分 -> 添加新向量。
+        索引单个文件: 解析 -> 切分 -> 写入新向量 -> 删除过时的旧向量。
         additional_duration: 需要添加到现有文件时长的秒数。
         """
         self.start_job()
@@ -164,116 +627,331 @@ class IngestionEngine:
             abs_path = os.path.abspath(file_path)
             print(f"正在处理文件: {abs_path}")
             
-            # 1.获取现有状态 (duration 和 mtime)
-            existing_duration = 0
-            existing_mtime = 0
-            try:
-                # 提取已有的 metadatas 第一条作为参考
-                results = self.vector_store._collection.get(where={"source": abs_path})
-                if results and results.get("metadatas") and len(results["metadatas"]) > 0:
-                    first_metadata = results["metadatas"][0]
-                    existing_duration = first_metadata.get("duration", 0)
-                    existing_mtime = first_metadata.get("mtime", 0)
-            except Exception:
-                pass
-
-            # 检查文件系统 mtime 对比是否变更
-            try:
-                current_mtime = os.stat(abs_path).st_mtime
-                # 考虑到浮点数精度截断问题，这里用整数对比并设置一定容差 (例如未改变)
-                if existing_mtime > 0 and abs(current_mtime - existing_mtime) < 1.0 and additional_duration == 0:
-                    print(f"[{abs_path}] 文件未修改，跳过重构向量 (Skipping unmodified file)")
+            # 1. 获取现有状态，未修改则跳过
+            state = self._check_existing(abs_path, additional_duration)
+            if state is None:
+                return
+
+            # 2. 流式解析并切分，边切分边嵌入写入 (Parse & Split -> Embed)
+            pipeline = IngestPipeline(self)
+            pipeline.add_file(abs_path, iter_chunks(abs_path), state)
+            pipeline.flush()
+        finally:
+            self.end_job()
+
+    def _resolve_workers(self, workers: Optional[int] = None) -> int:
+        """
+        解析进程池大小。0 表示自动 (CPU 核数 - 1)，1 表示顺序处理。
+        """
+        if workers is None:
+            workers = config_manager.get("ingest_workers", 0)
+        try:
+            workers = int(workers)
+        except (TypeError, ValueError):
+            workers = 0
+        if workers <= 0:
+            workers = max(1, (os.cpu_count() or 1) - 1)
+        return workers
+
+    def _ingest_sequential(self, jobs: List[Tuple[str, dict]], pipeline: IngestPipeline):
+        for abs_path, state in jobs:
+            print(f"正在处理文件: {abs_path}")
+            pipeline.add_file(abs_path, iter_chunks(abs_path), state)
+
+    def _is_large_file(self, state: dict) -> bool:
+        threshold_mb = config_manager.get("streaming_parse_threshold_mb", 20)
+        return state["size"] >= threshold_mb * 1024 * 1024
+
+    def _ingest_parallel(self, jobs: List[Tuple[str, dict]], pipeline: IngestPipeline, workers: int,
+                         large_jobs: List[Tuple[str, dict]] = ()):
+        """
+        在有界进程池中并行执行 parse_file 和 split_documents，
+        结果回到当前线程后再统一写入 Chroma (单一写入者)。
+        large_jobs: 在当前线程流式处理的大文件; 先把池任务提交出去，
+        流式处理期间每隔若干分块收取已完成的池结果并补充新任务，进程池不会空闲。
+        """
+        if not jobs:
+            self._ingest_sequential(list(large_jobs), pipeline)
+            return
+        print(f"Parsing {len(jobs)} files with {workers} worker processes...")
+        job_iter = iter(jobs)
+        # 限制同时在途的任务数，避免解析结果在内存中堆积
+        max_in_flight = workers * 2
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = {}
+
+            def submit_next():
+                job = next(job_iter, None)
+                if job is not None:
+                    pending[pool.submit(timed_parse_and_split, job[0])] = job
+
+            def collect(block: bool):
+                if not pending:
                     return
-            except Exception as e:
-                print(f"检查文件信息失败 {abs_path}: {e}")
+                done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    abs_path, state = pending.pop(future)
+                    submit_next()
+                    try:
+                        chunks, parse_seconds = future.result()
+                    except Exception as e:
+                        print(f"Error parsing {abs_path}: {e}")
+                        continue
+                    pipeline.add_file(abs_path, chunks, state, parse_seconds)
 
-            total_duration = int(existing_duration + additional_duration)
+            for _ in range(max_in_flight):
+                submit_next()
 
-            # 2. 删除此文件的现有向量以避免重复/更新
-            try:
-                self.vector_store._collection.delete(where={"source": abs_path})
-                # 清理潜在的旧路径格式
-                rel_path = os.path.relpath(abs_path)
-                if rel_path != abs_path:
-                     self.vector_store._collection.delete(where={"source": rel_path})
-            except Exception:
-                pass
-
-            # 3. Parse
-            documents = self.parse_file(abs_path)
-            if not documents:
-                return
+            for abs_path, state in large_jobs:
+                print(f"正在处理文件: {abs_path}")
+                pipeline.add_file(abs_path, interleave(iter_chunks(abs_path), lambda: collect(False)), state)
 
-            # Inject total duration into metadata
-            for doc in documents:
-                doc.metadata["duration"] = total_duration
+            while pending:
+                collect(True)
 
-            # 4. 切分 (Split)
-            chunks = self.split_documents(documents)
-            
-            # 5. 添加 (Add)
-            if chunks:
-                self.vector_store.add_documents(chunks)
-                self.vector_store.persist()
-                print(f"已索引 {len(chunks)} 个分块。总时长: {total_duration}秒")
+    def add_effort(self, source: str, additional_duration: int) -> Optional[int]:
+        """
+        只累加来源的投入时长 (duration)，原地更新分块元数据，不重新解析或嵌入。
+        来源尚未索引时返回 None，否则返回新的总时长。
+        """
+        entry = self.manifest.get(source)
+        if entry:
+            ids = entry["chunk_ids"]
+            existing_duration = entry["duration"]
+        else:
+            existing_duration, _, ids = self._get_chroma_state(source)
+            if not ids:
+                return None
+
+        total_duration = int(existing_duration + additional_duration)
+        self.start_job()
+        try:
+            if ids:
+                # Chroma 的 update 只合并传入的元数据键，不会触碰向量和其余元数据
+                self.writer.update(
+                    ids=ids,
+                    metadatas=[{"duration": total_duration} for _ in ids]
+                )
+            if entry:
+                self.manifest.set_duration(source, total_duration)
+            self._bump_source(source)
+            print(f"[{source}] 投入时长 +{int(additional_duration)}秒，总时长: {total_duration}秒")
+            return total_duration
+        except Exception as e:
+            print(f"Error updating effort for {source}: {e}")
+            return None
+        finally:
+            self.end_job()
+
+    def _rewrite_source(self, ids: List[str], src_path: str, dest_path: str) -> List[Future]:
+        """
+        改写分块的 source/title 及上级目录元数据，向量保持不变。
+        只提交写入并返回 Future，调用方可以批量提交后统一等待。
+        """
+        metadata = {"source": dest_path, "title": os.path.basename(dest_path)}
+        metadata.update(path_ranking_metadata(dest_path))
+        dest_dirs = path_metadata(dest_path)
+        metadata.update(dest_dirs)
+        # 新路径层级更浅时，置 None 以删除多余的 dir_N 键
+        for i in range(len(dest_dirs) + 1, len(path_metadata(src_path)) + 1):
+            metadata[f"dir_{i}"] = None
+        # 分批更新，避免超出 Chroma 单次请求的上限
+        futures = []
+        for i in range(0, len(ids), 5000):
+            part = ids[i:i + 5000]
+            futures.append(self.writer.submit("update", ids=part, metadatas=[dict(metadata) for _ in part]))
+        return futures
+
+    def move_document(self, src_path: str, dest_path: str) -> bool:
+        """
+        处理文件重命名/移动: 只改写已有分块的 source 和 title，复用向量。
+        来源未索引或扩展名变化 (需要换解析器) 时返回 False，由调用方重新索引。
+        """
+        src_path = os.path.abspath(src_path)
+        dest_path = os.path.abspath(dest_path)
+        if os.path.splitext(src_path)[1].lower() != os.path.splitext(dest_path)[1].lower():
+            return False
+
+        entry = self.manifest.get(src_path)
+        ids = entry["chunk_ids"] if entry else self._get_chroma_state(src_path)[2]
+        if not ids:
+            return False
+
+        self.start_job()
+        try:
+            print(f"Moving documents: {src_path} -> {dest_path}")
+            # 目标路径上如有旧数据 (覆盖式移动)，先移除
+            if self.manifest.get(dest_path):
+                self.writer.delete(where={"source": dest_path})
+            for future in self._rewrite_source(ids, src_path, dest_path):
+                future.result()
+            if entry:
+                self.manifest.rename(src_path, dest_path)
+            self._bump_source(src_path)
+            self._bump_source(dest_path)
+            return True
+        except Exception as e:
+            print(f"Error moving {src_path}: {e}")
+            return False
         finally:
             self.end_job()
-        
+
+    def move_directory(self, src_dir: str, dest_dir: str) -> int:
+        """
+        处理目录重命名/移动: 按清单改写子树下所有分块的 source 和 title，不重新嵌入。
+        监控器会忽略子项的合成移动事件，因此清单未完整覆盖旧子树 (向量库中有清单以外的分块)
+        或改写失败时，回退为按上级目录删除旧子树并重新索引目标目录 (嵌入缓存命中，无需重新计算向量)。
+        返回移动 (或重新索引) 的文件数。
+        """
+        src_dir = os.path.abspath(src_dir)
+        dest_dir = os.path.abspath(dest_dir)
+        self.start_job()
+        try:
+            entries = self.manifest.list_prefix(src_dir)
+            covered = {chunk_id for entry in entries.values() for chunk_id in entry["chunk_ids"]}
+            uncovered = set(self.get_ids_by_root(src_dir)) - covered
+            if uncovered:
+                print(f"Moving directory: {src_dir} has {len(uncovered)} chunks outside the manifest")
+                return self._reindex_moved_directory(src_dir, dest_dir)
+
+            print(f"Moving directory: {src_dir} -> {dest_dir} ({len(entries)} files)")
+            try:
+                # 所有文件的元数据更新一起排队，由写入线程合并成少数几组提交
+                futures = []
+                for src_path, entry in entries.items():
+                    dest_path = dest_dir + src_path[len(src_dir):]
+                    if entry["chunk_ids"]:
+                        futures.extend(self._rewrite_source(entry["chunk_ids"], src_path, dest_path))
+                for future in futures:
+                    future.result()
+            except Exception as e:
+                print(f"Error moving directory {src_dir}: {e}")
+                return self._reindex_moved_directory(src_dir, dest_dir)
+
+            for src_path in entries:
+                dest_path = dest_dir + src_path[len(src_dir):]
+                self.manifest.rename(src_path, dest_path)
+                self._bump_source(src_path)
+                self._bump_source(dest_path)
+            return len(entries)
+        except Exception as e:
+            print(f"Error moving directory {src_dir}: {e}")
+            return 0
+        finally:
+            self.end_job()
+
+    def _reindex_moved_directory(self, src_dir: str, dest_dir: str) -> int:
+        print(f"Re-indexing moved directory: {src_dir} -> {dest_dir}")
+        self.remove_documents_by_root(src_dir)
+        if os.path.isdir(dest_dir):
+            self.ingest_directory(dest_dir)
+        return len(self.manifest.list_prefix(dest_dir))
+
     def remove_document(self, file_path: str):
         """
         Remove vectors associated with a file.
         """
         self.start_job()
         try:
-            file_path = os.path.abspath(file_path)
+            # 网页来源以原始 URL 记录，向量库与清单使用同一个键
+            file_path = source_key(file_path)
             print(f"Removing documents for: {file_path}")
-            self.vector_store._collection.delete(where={"source": file_path})
-            self.vector_store.persist()
+            self.writer.delete(where={"source": file_path})
+            self.manifest.remove(file_path)
+            self._bump_source(file_path)
         except Exception as e:
             print(f"Error removing {file_path}: {e}")
         finally:
             self.end_job()
 
+    def ensure_path_index(self):
+        """
+        一次性迁移: 为早期没有 dir_N 元数据的文件分块补充上级目录索引。
+        按目录过滤的检索与删除都依赖该索引，API 启动预热时调用。
+        """
+        if self.manifest.get_meta("path_index") == "1":
+            return
+        result = self.vector_store._collection.get(include=["metadatas"])
+        ids, metadatas = [], []
+        for chunk_id, metadata in zip(result.get("ids") or [], result.get("metadatas") or []):
+            if metadata and metadata.get("type", "file") == "file" and metadata.get("source") and "dir_1" not in metadata:
+                ids.append(chunk_id)
+                metadatas.append(path_metadata(os.path.abspath(metadata["source"])))
+        if ids:
+            print(f"Building path index for {len(ids)} existing chunks...")
+            for i in range(0, len(ids), 5000):
+                self.writer.update(ids=ids[i:i + 5000], metadatas=metadatas[i:i + 5000])
+        self.manifest.set_meta("path_index", "1")
+
+    def ensure_ranking_features(self):
+        """
+        为缺少排序特征的分块 (早期索引) 补充 priority / path_tier / mtime_bucket，
+        优先关键字变化后重新计算路径特征。只更新元数据，不重新嵌入。
+        签名未变化时只读一次 manifest，可以在每次索引或质量模式查询前调用。
+        """
+        signature = keywords_signature()
+        if self.manifest.get_meta("ranking_keywords") == signature:
+            return
+        result = self.vector_store._collection.get(include=["metadatas"])
+        ids, metadatas = [], []
+        for chunk_id, metadata in zip(result.get("ids") or [], result.get("metadatas") or []):
+            if not metadata or not metadata.get("source"):
+                continue
+            features = ranking_metadata(metadata["source"], metadata.get("mtime", 0))
+            if any(metadata.get(key) != value for key, value in features.items()):
+                ids.append(chunk_id)
+                metadatas.append(features)
+        if ids:
+            print(f"Updating ranking features for {len(ids)} chunks...")
+            for i in range(0, len(ids), 5000):
+                self.writer.update(ids=ids[i:i + 5000], metadatas=metadatas[i:i + 5000])
+        self.manifest.set_meta("ranking_keywords", signature)
+
+    def get_ids_by_root(self, root_path: str) -> List[str]:
+        """
+        返回 root_path 目录下所有分块的 ID。通过 dir_N 元数据做等值查询，只返回 ID。
+        """
+        root_path = os.path.abspath(root_path)
+        self.ensure_path_index()
+        where = root_filter(root_path)
+        ids = set()
+        if where is not None:
+            result = self.vector_store._collection.get(where=where or None, include=[])
+            ids.update(result.get("ids") or [])
+        # 超出索引深度的路径仍可由清单覆盖
+        for entry in self.manifest.list_prefix(root_path).values():
+            ids.update(entry["chunk_ids"])
+        return list(ids)
+
+    def list_documents_by_root(self, root_path: str) -> List[str]:
+        """返回 root_path 目录下已索引的文件路径 (来自清单)。"""
+        return sorted(self.manifest.list_prefix(os.path.abspath(root_path)))
+
     def remove_documents_by_root(self, root_path: str):
         """
         移除属于特定根目录的所有文档。
-        由于 Chroma 不支持方便的 'startswith' 删除查询，
-        所以我们获取所有元数据，在 Python 中过滤，然后按 ID 删除。
+        通过上级目录索引 (dir_N 元数据) 和文件清单查出分块 ID，再按 ID 删除，
+        无需读取整个集合。
         """
         self.start_job()
         try:
             root_path = os.path.abspath(root_path)
             print(f"Cleaning up documents from root: {root_path}")
-            
-            # 1. Get all documents
-            result = self.vector_store._collection.get()
-            if not result or not result['ids']:
-                return
 
-            ids_to_delete = []
-            sources = result['metadatas']
-            ids = result['ids']
+            # 1. Look up chunk ids under the root
+            ids_to_delete = self.get_ids_by_root(root_path)
 
-            # 2. Filter match
-            for i, metadata in enumerate(sources):
-                if metadata and 'source' in metadata:
-                    source = metadata['source']
-                    # Check if source starts with root_path
-                    # using commonpath is safer for path logic
-                    try:
-                        if os.path.commonpath([root_path, source]) == root_path:
-                            ids_to_delete.append(ids[i])
-                    except ValueError:
-                        continue # Different drivers
-
-            # 3. Delete
+            # 2. Delete
             if ids_to_delete:
                 print(f"Found {len(ids_to_delete)} chunks to remove.")
-                self.vector_store._collection.delete(ids=ids_to_delete)
-                self.vector_store.persist()
+                for i in range(0, len(ids_to_delete), 5000):
+                    self.writer.delete(ids=ids_to_delete[i:i + 5000])
                 print("Cleanup complete.")
             else:
                 print("No documents found for this root.")
+            self.manifest.remove_prefix(root_path)
+            self._bump_source(None)
 
         except Exception as e:
             print(f"Error cleaning root {root_path}: {e}")
@@ -290,51 +968,62 @@ class IngestionEngine:
             print(f"正在索引网页: {title} ({url})")
             
             # 1. Fetch existing duration if any
-            existing_duration = 0
-            try:
-                results = self.vector_store._collection.get(where={"source": url})
-                if results and results.get("metadatas"):
-                    existing_duration = results["metadatas"][0].get("duration", 0)
-            except Exception:
-                pass
+            entry = self.manifest.get(url)
+            if entry:
+                existing_duration = entry["duration"]
+                # 内容未变化: 只累加阅读时长，不重新嵌入
+                if entry["content_hash"] == hash_text(content) and entry["chunk_ids"]:
+                    if additional_duration:
+                        self.add_effort(url, additional_duration)
+                    else:
+                        print(f"[{url}] 网页内容未变化，跳过重构向量")
+                    return len(entry["chunk_ids"])
+                legacy_ids = []
+            else:
+                existing_duration, _, legacy_ids = self._get_chroma_state(url)
 
             total_duration = int(existing_duration + additional_duration)
 
-            # 2. Deduplication: Remove old entry for this URL
-            try:
-                self.vector_store._collection.delete(where={"source": url})
-                self.vector_store.persist()
-            except Exception:
-                pass
-                
-            # 3. Prepare metadata
-            import time
+            # 2. Prepare metadata
+            now = time.time()
             metadata = {
                 "source": url,
                 "title": title,
                 "type": "webpage",
                 "extension": ".html",
                 "duration": total_duration,
-                "mtime": time.time()
+                "mtime": now
+            }
+            metadata.update(ranking_metadata(url, now))
+            state = {
+                "duration": total_duration,
+                "size": len(content),
+                "mtime": now,
+                "content_hash": hash_text(content),
+                "chunk_ids": entry["chunk_ids"] if entry else [],
+                "chunk_hashes": entry["chunk_hashes"] if entry else [],
+                "legacy_ids": legacy_ids
             }
             
-            # 4. Create document and split
+            # 3. Create document and split
             doc = Document(page_content=content, metadata=metadata)
             chunks = self.split_documents([doc])
             
-            # 5. Add to store
+            # 4. Remove old entry for this URL and add to store
+            pipeline = IngestPipeline(self)
+            pipeline.add_file(url, chunks, state)
+            pipeline.flush()
             if chunks:
-                self.vector_store.add_documents(chunks)
-                self.vector_store.persist()
                 print(f"Webpage indexed: {len(chunks)} chunks. Total duration: {total_duration}s")
                 return len(chunks)
             return 0
         finally:
             self.end_job()
 
-    def ingest_directory(self, source_dir: str):
+    def ingest_directory(self, source_dir: str, workers: Optional[int] = None):
         """
         索引目录中的所有支持文件，跳过系统和临时文件夹。
+        workers: 解析进程数，默认读取配置 ingest_workers (0 为自动，1 为顺序处理)。
         """
         self.start_job()
         try:
@@ -372,9 +1061,27 @@ class IngestionEngine:
                         all_files.append(os.path.join(root, file))
             
             print(f"Found {len(all_files)} files to process.")
+
+            # 先通过清单过滤未修改的文件 (仅 stat)，避免无意义的解析
+            entries = self.manifest.list_prefix(os.path.abspath(source_dir))
+            jobs = []
             for file_path in all_files:
-                # process_file will handle abspath conversion
-                self.process_file(file_path)
+                abs_path = os.path.abspath(file_path)
+                state = self._check_existing(abs_path, entries=entries)
+                if state is not None:
+                    jobs.append((abs_path, state))
+
+            pipeline = IngestPipeline(self)
+            workers = self._resolve_workers(workers)
+            if workers > 1 and len(jobs) > 1:
+                # 大文件在当前进程中流式处理，避免子进程把整份解析结果一次性传回
+                large_jobs = [job for job in jobs if self._is_large_file(job[1])]
+                small_jobs = [job for job in jobs if not self._is_large_file(job[1])]
+                self._ingest_parallel(small_jobs, pipeline, workers, large_jobs)
+            else:
+                self._ingest_sequential(jobs, pipeline)
+            pipeline.flush()
+            self.last_ingest_stats = pipeline.report()
             
             print("Ingestion complete.")
         finally:
@@ -0,0 +1,495 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple, Any, Callable
+
+import numpy as np
+
+LEXICAL_INDEX_FILE = "lexical_index.db"
+
+# 标识符 (字母数字，可含 _ - . /)，例如 PROJECT_NEBULA、INV-2024-0042、v1.2
+IDENTIFIER_RE = re.compile(r"[a-z0-9][a-z0-9_\-./]*[a-z0-9]|[a-z0-9]")
+IDENTIFIER_PARTS_RE = re.compile(r"[_\-./]+")
+# 中日韩文字连续片段
+CJK_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]+")
+
+# 分词或存储格式变化时递增，已有索引会从 Chroma 重建
+INDEX_VERSION = "2"
+# 文档频率超过该比例的词 (例如 "的"、"the") 在查询还有其他词时跳过，避免遍历巨大的倒排表;
+# 分块较少时倒排表本身很小，不跳过
+MAX_DF_RATIO = 0.5
+MAX_DF_MIN_CHUNKS = 1000
+# 加载时预先生成 NumPy 数组的倒排表长度下限; 更短的倒排表在第一次查询时生成
+TERM_ARRAY_MIN_DF = 64
+# 两次检查 SQLite 中 generation 的最小间隔 (秒); 查询路径因此通常不连接数据库
+GENERATION_CHECK_SECONDS = 1.0
+
+def tokenize(text: str) -> List[str]:
+    """
+    CJK 感知的分词: 中日韩文字产出相邻二字组合 (单字片段产出单字)，
+    标识符整体保留 (同时产出按 _ - . / 拆开的部分)，其余按字母数字切分。
+    """
+    text = text.lower()
+    tokens = []
+    for run in CJK_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    for word in IDENTIFIER_RE.findall(CJK_RE.sub(" ", text)):
+        tokens.append(word)
+        parts = [p for p in IDENTIFIER_PARTS_RE.split(word) if p]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+class _Memory:
+    """
+    常驻内存的倒排表。每个分块占一个槽位，查询时用 NumPy 按槽位累加 BM25 得分;
+    每个词的 (槽位, 词频) 数组在第一次查询到该词时生成并缓存，倒排表变化时失效。
+    """
+
+    def __init__(self):
+        # term -> {chunk_id: tf}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        # chunk_id -> (source, length, terms)
+        self.chunks: Dict[str, Tuple[str, int, Dict[str, int]]] = {}
+        self.source_chunks: Dict[str, set] = {}
+        self.total_length = 0
+        self.slots: Dict[str, int] = {}
+        self.slot_ids: List[Optional[str]] = []
+        self.free_slots: List[int] = []
+        self.lengths = np.zeros(1024, dtype=np.float64)
+        self.term_arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def add(self, chunk_id: str, source: str, length: int, terms: Dict[str, int]):
+        if chunk_id in self.chunks:
+            self.remove(chunk_id)
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.slot_ids[slot] = chunk_id
+        else:
+            slot = len(self.slot_ids)
+            self.slot_ids.append(chunk_id)
+            if slot >= len(self.lengths):
+                self.lengths = np.concatenate([self.lengths, np.zeros(len(self.lengths))])
+        self.slots[chunk_id] = slot
+        self.lengths[slot] = length
+        self.chunks[chunk_id] = (source, length, terms)
+        self.source_chunks.setdefault(source, set()).add(chunk_id)
+        self.total_length += length
+        postings, term_arrays = self.postings, self.term_arrays
+        for term, tf in terms.items():
+            posting = postings.get(term)
+            if posting is None:
+                postings[term] = {chunk_id: tf}
+            else:
+                posting[chunk_id] = tf
+                if term_arrays:
+                    term_arrays.pop(term, None)
+
+    def remove(self, chunk_id: str):
+        entry = self.chunks.pop(chunk_id, None)
+        if entry is None:
+            return
+        source, length, terms = entry
+        self.total_length -= length
+        self._discard_source(source, chunk_id)
+        slot = self.slots.pop(chunk_id)
+        self.slot_ids[slot] = None
+        self.lengths[slot] = 0
+        self.free_slots.append(slot)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(chunk_id, None)
+                if not posting:
+                    del self.postings[term]
+            self.term_arrays.pop(term, None)
+
+    def set_source(self, chunk_id: str, source: str):
+        """只改来源 (移动)，倒排表与缓存的数组不变。"""
+        entry = self.chunks.get(chunk_id)
+        if entry is None or entry[0] == source:
+            return
+        self._discard_source(entry[0], chunk_id)
+        self.chunks[chunk_id] = (source, entry[1], entry[2])
+        self.source_chunks.setdefault(source, set()).add(chunk_id)
+
+    def _discard_source(self, source: str, chunk_id: str):
+        ids = self.source_chunks.get(source)
+        if ids is not None:
+            ids.discard(chunk_id)
+            if not ids:
+                del self.source_chunks[source]
+
+    def _term_array(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        arrays = self.term_arrays.get(term)
+        if arrays is None:
+            posting = self.postings[term]
+            slots = np.fromiter((self.slots[chunk_id] for chunk_id in posting), dtype=np.int64, count=len(posting))
+            tfs = np.fromiter(posting.values(), dtype=np.float64, count=len(posting))
+            arrays = self.term_arrays[term] = (slots, tfs)
+        return arrays
+
+    def build_term_arrays(self, min_df: int):
+        """预先生成较长倒排表的数组，避免第一次查询到常见词时的转换开销。"""
+        for term, posting in self.postings.items():
+            if len(posting) >= min_df:
+                self._term_array(term)
+
+    def search(self, terms, k: int, k1: float, b: float) -> List[Tuple[str, float]]:
+        n = len(self.chunks)
+        terms = [t for t in terms if t in self.postings]
+        if not n or not terms or k <= 0:
+            return []
+        # 查询中还有区分度更高的词时，跳过几乎每个分块都包含的词
+        if n >= MAX_DF_MIN_CHUNKS:
+            rare = [t for t in terms if len(self.postings[t]) <= n * MAX_DF_RATIO]
+            if rare:
+                terms = rare
+        avg_length = self.total_length / n or 1.0
+        scores = np.zeros(len(self.slot_ids))
+        for term in terms:
+            slots, tfs = self._term_array(term)
+            df = len(slots)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            norm = tfs + k1 * (1 - b + b * self.lengths[slots] / avg_length)
+            scores[slots] += idf * (k1 + 1) * tfs / norm
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(scores[hits], -k)[-k:]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(self.slot_ids[slot], float(scores[slot])) for slot in hits]
+
+class LexicalIndex:
+    """
+    BM25 倒排索引。倒排表常驻内存以保证查询在亚毫秒级，
+    每个分块的词频同时持久化到 SQLite，第一次查询时加载而无需重新分词。
+    由 IngestWriter 在每组写入提交后增量维护 (add / upsert / update / delete)。
+    每次写入都递增 meta 中的 generation; 查询前 (按 check_interval 节流) 比较该值，
+    其他进程 (例如 CLI 的 ingest) 写入后在后台重新加载，完成前继续使用旧的倒排表。
+    """
+
+    def __init__(self, db_path: str, k1: float = 1.5, b: float = 0.75):
+        self.db_path = db_path
+        self.k1 = k1
+        self.b = b
+        # 保护内存结构; 重新加载在锁外构建，只在替换时持锁
+        self._lock = threading.RLock()
+        # 同一时间只有一个加载
+        self._load_lock = threading.Lock()
+        self._memory = _Memory()
+        # 内存结构对应的 generation，未加载时为 None
+        self.generation: Optional[int] = None
+        # 加载期间本进程的写入 (写入前的 generation, 更新函数)，替换后重放到新的内存结构上
+        self._pending: Optional[List[Tuple[int, Callable[[_Memory], None]]]] = None
+        self._reload_thread: Optional[threading.Thread] = None
+        self.check_interval = GENERATION_CHECK_SECONDS
+        self._checked_at = 0.0
+        self._signature = None
+        self._init_db()
+
+    @property
+    def postings(self) -> Dict[str, Dict[str, int]]:
+        return self._memory.postings
+
+    @property
+    def chunks(self) -> Dict[str, Tuple[str, int, Dict[str, int]]]:
+        return self._memory.chunks
+
+    @property
+    def source_chunks(self) -> Dict[str, set]:
+        return self._memory.source_chunks
+
+    @property
+    def total_length(self) -> int:
+        return self._memory.total_length
+
+    def _get_conn(self):
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def _init_db(self):
+        """初始化数据库表结构"""
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id TEXT PRIMARY KEY,
+                    source TEXT,
+                    length INTEGER NOT NULL,
+                    terms TEXT NOT NULL
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source)")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            conn.commit()
+
+    @staticmethod
+    def _read_generation(conn) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    @staticmethod
+    def _read_chunks(conn):
+        for chunk_id, source, length, terms in conn.execute("SELECT id, source, length, terms FROM chunks"):
+            yield chunk_id, source, length, json.loads(terms)
+
+    def _load(self):
+        """在锁外从 SQLite 构建新的内存结构，完成后在锁内整体替换，写入线程不会被加载阻塞。"""
+        with self._load_lock:
+            with self._lock:
+                self._pending = []
+            try:
+                memory = _Memory()
+                # 在读事务之前取文件签名: 之后的写入都会改变签名
+                signature = self._file_signature()
+                with self._get_conn() as conn:
+                    # 同一个读事务内读取 generation 与分块，二者一致
+                    conn.execute("BEGIN")
+                    generation = self._read_generation(conn)
+                    if generation == self.generation:
+                        conn.commit()
+                        return
+                    for entry in self._read_chunks(conn):
+                        memory.add(*entry)
+                    conn.commit()
+                memory.build_term_arrays(TERM_ARRAY_MIN_DF)
+                with self._lock:
+                    # 读事务之后提交的写入不在快照里，重放到新结构上
+                    for stored, update_memory in sorted(self._pending, key=lambda item: item[0]):
+                        if stored >= generation:
+                            update_memory(memory)
+                            if generation == stored:
+                                generation = stored + 1
+                    self._memory = memory
+                    self.generation = generation
+                self._signature = signature
+                self._checked_at = time.monotonic()
+            finally:
+                with self._lock:
+                    self._pending = None
+
+    def _reload_in_background(self):
+        with self._lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return
+            self._reload_thread = threading.Thread(target=self._reload, name="lexical-index-reload", daemon=True)
+            self._reload_thread.start()
+
+    def _reload(self):
+        try:
+            self._load()
+        except Exception as e:
+            print(f"Lexical index reload failed: {e}")
+
+    def _file_signature(self):
+        signature = []
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _changed(self) -> bool:
+        """节流的 generation 检查: 距上次检查不足 check_interval 或索引文件未变化时不连接 SQLite。"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        signature = self._file_signature()
+        if signature == self._signature:
+            return False
+        with self._get_conn() as conn:
+            stored = self._read_generation(conn)
+        if stored != self.generation:
+            return True
+        self._signature = signature
+        return False
+
+    def ensure_loaded(self, wait: bool = True):
+        """
+        第一次使用时加载倒排表; 其他进程写入过 (generation 变化) 时重新加载。
+        wait=False (查询路径) 时重新加载在后台进行，期间继续使用旧数据; 从未加载过时总是同步加载。
+        """
+        if not self.loaded:
+            self._load()
+        elif self._changed():
+            if wait:
+                self._load()
+            else:
+                self._reload_in_background()
+
+    @property
+    def loaded(self) -> bool:
+        return self.generation is not None
+
+    def _commit(self, statements: List[Tuple[str, list]]) -> int:
+        """在一个写事务中执行语句并递增 generation，返回写入前的 generation。"""
+        with self._get_conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            stored = self._read_generation(conn)
+            for sql, rows in statements:
+                conn.executemany(sql, rows)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)", (str(stored + 1),))
+            conn.commit()
+        return stored
+
+    def _apply(self, stored: int, update_memory: Callable[[_Memory], None]):
+        """写入提交后同步内存结构。内存落后于其他进程的写入时不更新 generation，下次检查时重新加载。"""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((stored, update_memory))
+            if not self.loaded:
+                return
+            update_memory(self._memory)
+            if self.generation == stored:
+                self.generation = stored + 1
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._get_conn() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._get_conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            conn.commit()
+
+    def __len__(self):
+        return len(self.chunks)
+
+    # --- 维护 ---
+
+    def add(self, ids: List[str], documents: List[str], metadatas: Optional[List[dict]] = None):
+        entries = []
+        for i, (chunk_id, text) in enumerate(zip(ids, documents)):
+            source = (metadatas[i] or {}).get("source", "") if metadatas else ""
+            tokens = tokenize(text or "")
+            entries.append((chunk_id, source, len(tokens), dict(Counter(tokens))))
+        if not entries:
+            return
+        stored = self._commit([(
+            "INSERT OR REPLACE INTO chunks (id, source, length, terms) VALUES (?, ?, ?, ?)",
+            [(chunk_id, source, length, json.dumps(terms, ensure_ascii=False))
+             for chunk_id, source, length, terms in entries]
+        )])
+
+        def update_memory(memory: _Memory):
+            for entry in entries:
+                memory.add(*entry)
+        self._apply(stored, update_memory)
+
+    def set_sources(self, ids: List[str], metadatas: List[dict]):
+        """元数据更新 (例如移动) 时同步分块的来源，文本与词频不变。"""
+        rows = [
+            (metadata["source"], chunk_id) for chunk_id, metadata in zip(ids, metadatas)
+            if (metadata or {}).get("source") is not None
+        ]
+        if not rows:
+            return
+        stored = self._commit([("UPDATE chunks SET source = ? WHERE id = ?", rows)])
+
+        def update_memory(memory: _Memory):
+            for source, chunk_id in rows:
+                memory.set_source(chunk_id, source)
+        self._apply(stored, update_memory)
+
+    def delete(self, ids: Optional[List[str]] = None, source: Optional[str] = None):
+        ids = list(ids or [])
+        statements = []
+        if ids:
+            statements.append(("DELETE FROM chunks WHERE id = ?", [(i,) for i in ids]))
+        if source is not None:
+            statements.append(("DELETE FROM chunks WHERE source = ?", [(source,)]))
+        if not statements:
+            return
+        stored = self._commit(statements)
+
+        def update_memory(memory: _Memory):
+            for chunk_id in ids + list(memory.source_chunks.get(source, ())):
+                memory.remove(chunk_id)
+        self._apply(stored, update_memory)
+
+    def on_write(self, kind: str, kwargs: dict):
+        """IngestWriter 的监听回调: 一个写操作成功提交后同步更新索引。"""
+        ids = kwargs.get("ids") or []
+        if kind in ("add", "upsert") and kwargs.get("documents") is not None:
+            self.add(ids, kwargs["documents"], kwargs.get("metadatas"))
+        elif kind == "update":
+            if kwargs.get("documents") is not None:
+                self.add(ids, kwargs["documents"], kwargs.get("metadatas"))
+            elif kwargs.get("metadatas") is not None:
+                self.set_sources(ids, kwargs["metadatas"])
+        elif kind == "delete":
+            where = kwargs.get("where") or {}
+            self.delete(ids=ids, source=where.get("source"))
+
+    def rebuild(self, collection, batch_size: int = 5000):
+        """从 Chroma 集合重建索引 (首次启用、索引文件丢失或分词规则变化时)。"""
+        # 构建期间只写 SQLite，完成后一次加载
+        with self._lock:
+            self._memory = _Memory()
+            self.generation = None
+        self._commit([("DELETE FROM chunks", [()])])
+        offset = 0
+        while True:
+            result = collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            ids = result.get("ids") or []
+            if not ids:
+                break
+            self.add(ids, result.get("documents") or [], result.get("metadatas") or [])
+            offset += len(ids)
+        self.set_meta("built", INDEX_VERSION)
+        self._load()
+        print(f"Lexical index built: {len(self.chunks)} chunks.")
+
+    def ensure_built(self, collection):
+        if self.get_meta("built") != INDEX_VERSION:
+            self.rebuild(collection)
+
+    # --- 查询 ---
+
+    def search(self, query: str, k: int = 8) -> List[Tuple[str, float]]:
+        """返回 BM25 得分最高的 k 个 (chunk_id, score)。"""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        self.ensure_loaded(wait=False)
+        with self._lock:
+            return self._memory.search(terms, k, self.k1, self.b)
+
+    def stats(self) -> Dict[str, Any]:
+        """不会触发加载: 未加载时分块数从 SQLite 读取。"""
+        if self.loaded:
+            return {"chunks": len(self.chunks), "terms": len(self.postings), "loaded": True}
+        with self._get_conn() as conn:
+            chunks = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        return {"chunks": chunks, "terms": None, "loaded": False}
+
+_indexes: Dict[str, LexicalIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_lexical_index(db_path: str) -> LexicalIndex:
+    """同一索引文件在进程内共享一个实例 (IngestionEngine 与 QueryEngine 共用)。"""
+    db_path = os.path.abspath(db_path)
+    with _indexes_lock:
+        if db_path not in _indexes:
+            _indexes[db_path] = LexicalIndex(db_path)
+        return _indexes[db_path]
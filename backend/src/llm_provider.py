@@ -1,8 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import Any, Dict, Optional
 import os
-from langchain_community.chat_models import ChatOpenAI
-from crewai import LLM
+# ChatOpenAI / crewai.LLM 在各方法内按需导入: crewai 很重，只读取文档的命令不需要它
 
 class LLMProvider(ABC):
     """Abstract base class for LLM providers."""
@@ -19,6 +18,7 @@ class LLMProvider(ABC):
 
 class DeepSeekProvider(LLMProvider):
     def get_langchain_llm(self, config: Dict[str, Any]) -> Any:
+        from langchain_community.chat_models import ChatOpenAI
         api_key = config.get("api_key")
         base_url = config.get("base_url", "https://api.deepseek.com")
         model = config.get("model", "deepseek-chat")
@@ -35,6 +35,7 @@ class DeepSeekProvider(LLMProvider):
         )
 
     def get_crew_llm(self, config: Dict[str, Any]) -> Any:
+        from crewai import LLM
         api_key = config.get("api_key")
         base_url = config.get("base_url", "https://api.deepseek.com")
         model = config.get("model", "deepseek-chat")
@@ -54,6 +55,7 @@ class DeepSeekProvider(LLMProvider):
 
 class OpenAIProvider(LLMProvider):
     def get_langchain_llm(self, config: Dict[str, Any]) -> Any:
+        from langchain_community.chat_models import ChatOpenAI
         api_key = config.get("api_key")
         base_url = config.get("base_url", "https://api.openai.com/v1")
         model = config.get("model", "gpt-4")
@@ -66,6 +68,7 @@ class OpenAIProvider(LLMProvider):
         )
 
     def get_crew_llm(self, config: Dict[str, Any]) -> Any:
+        from crewai import LLM
         api_key = config.get("api_key")
         base_url = config.get("base_url")
         model = config.get("model", "gpt-4")
@@ -85,6 +88,7 @@ class OpenAIProvider(LLMProvider):
 
 class OllamaProvider(LLMProvider):
     def get_langchain_llm(self, config: Dict[str, Any]) -> Any:
+        from langchain_community.chat_models import ChatOpenAI
         base_url = config.get("base_url", "http://localhost:11434")
         model = config.get("model", "llama3")
         
@@ -98,6 +102,7 @@ class OllamaProvider(LLMProvider):
         )
 
     def get_crew_llm(self, config: Dict[str, Any]) -> Any:
+        from crewai import LLM
         base_url = config.get("base_url", "http://localhost:11434")
         model = config.get("model", "llama3")
         
@@ -120,6 +125,7 @@ class GoogleProvider(LLMProvider):
         )
 
     def get_crew_llm(self, config: Dict[str, Any]) -> Any:
+        from crewai import LLM
         api_key = config.get("api_key")
         model = config.get("model", "gemini-2.5-flash")
         
@@ -5,8 +5,7 @@ import os
 # Ensure src is in path if running from root
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from src.ingest import IngestionEngine
-from src.query import QueryEngine
+# 引擎在各子命令中按需导入，避免 --help 等命令也加载全部依赖
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -22,6 +21,7 @@ def main():
     # Command: index
     index_parser = subparsers.add_parser("index", help="Index documents from a directory")
     index_parser.add_argument("directory", type=str, nargs='?', default=default_dir, help="Path to the directory containing documents")
+    index_parser.add_argument("--workers", type=int, default=None, help="Number of parser processes (0 = auto, 1 = sequential)")
 
     # Command: ask
     ask_parser = subparsers.add_parser("ask", help="Ask a question based on indexed documents")
@@ -29,6 +29,13 @@ def main():
     ask_parser.add_argument("--quality", action="store_true", help="Enable Quality Mode (boost priority documents)")
     ask_parser.add_argument("--crew", action="store_true", help="Force CrewAI mode (bypass complexity evaluation)")
     ask_parser.add_argument("--no-crew", action="store_true", help="Force standard RAG mode (bypass CrewAI)")
+    # Retrieval filters (pushed down into the vector search)
+    ask_parser.add_argument("--type", choices=["file", "webpage"], default=None, help="Only search files or webpages")
+    ask_parser.add_argument("--ext", action="append", default=None, help="Only search these extensions (repeatable or comma-separated, e.g. --ext pdf,docx)")
+    ask_parser.add_argument("--root", type=str, default=None, help="Only search one of the configured watch paths")
+    ask_parser.add_argument("--path", type=str, default=None, help="Only search files under this directory")
+    ask_parser.add_argument("--since", type=str, default=None, help="Modified at or after (timestamp, YYYY-MM-DD or relative like 7d)")
+    ask_parser.add_argument("--until", type=str, default=None, help="Modified at or before (timestamp, YYYY-MM-DD or relative like 7d)")
 
     # Command: watch
     watch_parser = subparsers.add_parser("watch", help="Monitor a directory for changes")
@@ -44,20 +51,50 @@ def main():
             print(f"Error: Directory '{args.directory}' does not exist.")
             return
         
+        from src.ingest import IngestionEngine
         engine = IngestionEngine()
-        engine.ingest_directory(args.directory)
+        # 优先关键字变化后，已有分块的排序特征也需要更新
+        engine.ensure_ranking_features()
+        engine.ingest_directory(args.directory, workers=args.workers)
 
     elif args.command == "watch":
         from src.monitor import start_watching
         start_watching(args.directory)
 
     elif args.command == "list":
+        # 只读取元数据: 不加载嵌入模型和 LLM
+        from src.query import QueryEngine
         engine = QueryEngine()
         print(engine.list_documents())
 
     elif args.command == "ask":
-        engine = QueryEngine()
-        response = engine.ask(args.query, quality_mode=args.quality, force_crew=args.crew, no_crew=args.no_crew)
+        from src.query import QueryEngine
+        from src.filters import build_where, filter_key
+        try:
+            where = build_where(doc_type=args.type, extension=args.ext, root=args.root, path_prefix=args.path,
+                                modified_after=args.since, modified_before=args.until)
+        except ValueError as e:
+            parser.error(str(e))
+        ingestor = None
+        if args.root or args.path or args.quality:
+            # 目录过滤依赖 dir_N 元数据，质量模式依赖排序特征; 早期索引或关键字变化后需要先补充
+            from src.ingest import IngestionEngine
+            ingestor = IngestionEngine()
+            if args.root or args.path:
+                ingestor.ensure_path_index()
+            if args.quality:
+                ingestor.ensure_ranking_features()
+            engine = QueryEngine(vector_store=ingestor.vector_store, ingestor=ingestor)
+        else:
+            engine = QueryEngine()
+        try:
+            response = engine.ask(args.query, quality_mode=args.quality, force_crew=args.crew, no_crew=args.no_crew,
+                                  where=where, filter_key=filter_key(
+                                      doc_type=args.type, extensions=args.ext, watch_root=args.root,
+                                      path_prefix=args.path, modified_after=args.since, modified_before=args.until))
+        finally:
+            if ingestor is not None:
+                ingestor.close()
         print("\n" + "="*50)
         print("Answer:")
         print("="*50)
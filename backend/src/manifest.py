@@ -0,0 +1,179 @@
+import sqlite3
+import hashlib
+import json
+import os
+import time
+from typing import List, Dict, Optional, Any
+
+MANIFEST_FILE = "file_manifest.db"
+
+def hash_file(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """按块计算文件内容的 SHA-256，避免一次性读入大文件。"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class FileManifest:
+    """
+    本地文件清单 (SQLite)。记录每个已索引来源的 size / mtime / 内容哈希 / 分块 ID / 时长，
+    使未修改文件的重新扫描只需 stat，而无需查询 Chroma。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._init_db()
+
+    def _get_conn(self):
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def _init_db(self):
+        """初始化数据库表结构"""
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL DEFAULT 0,
+                    mtime REAL NOT NULL DEFAULT 0,
+                    content_hash TEXT,
+                    chunk_ids TEXT NOT NULL DEFAULT '[]',
+                    duration INTEGER NOT NULL DEFAULT 0,
+                    indexed_at REAL,
+                    chunk_hashes TEXT NOT NULL DEFAULT '[]'
+                )
+            """)
+            # 杂项键值 (例如一次性迁移的完成标记)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            # 迁移: 早期版本的清单没有 chunk_hashes 列
+            cursor.execute("PRAGMA table_info(files)")
+            columns = {row[1] for row in cursor.fetchall()}
+            if "chunk_hashes" not in columns:
+                cursor.execute("ALTER TABLE files ADD COLUMN chunk_hashes TEXT NOT NULL DEFAULT '[]'")
+            conn.commit()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._get_conn() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._get_conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            conn.commit()
+
+    @staticmethod
+    def _row_to_entry(row) -> Dict[str, Any]:
+        return {
+            "path": row[0],
+            "size": row[1],
+            "mtime": row[2],
+            "content_hash": row[3],
+            "chunk_ids": json.loads(row[4] or "[]"),
+            "duration": row[5],
+            "indexed_at": row[6],
+            # 与 chunk_ids 一一对应的分块内容哈希
+            "chunk_hashes": json.loads(row[7] or "[]")
+        }
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        with self._get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT path, size, mtime, content_hash, chunk_ids, duration, indexed_at, chunk_hashes FROM files WHERE path = ?",
+                (path,)
+            )
+            row = cursor.fetchone()
+            return self._row_to_entry(row) if row else None
+
+    def list_prefix(self, root: str) -> Dict[str, Dict[str, Any]]:
+        """
+        返回 root 目录下的所有条目 {path: entry}。
+        使用主键范围查询，而不是扫描整张表。
+        """
+        root = root.rstrip("/\\")
+        entries = {}
+        with self._get_conn() as conn:
+            cursor = conn.cursor()
+            for sep in ("/", "\\"):
+                prefix = root + sep
+                cursor.execute(
+                    "SELECT path, size, mtime, content_hash, chunk_ids, duration, indexed_at, chunk_hashes FROM files "
+                    "WHERE path >= ? AND path < ?",
+                    (prefix, prefix + "\uffff")
+                )
+                for row in cursor.fetchall():
+                    entries[row[0]] = self._row_to_entry(row)
+        return entries
+
+    def upsert(self, path: str, size: int, mtime: float, content_hash: Optional[str],
+               chunk_ids: List[str], duration: int = 0, chunk_hashes: Optional[List[str]] = None):
+        with self._get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO files (path, size, mtime, content_hash, chunk_ids, duration, indexed_at, chunk_hashes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    size = excluded.size,
+                    mtime = excluded.mtime,
+                    content_hash = excluded.content_hash,
+                    chunk_ids = excluded.chunk_ids,
+                    duration = excluded.duration,
+                    indexed_at = excluded.indexed_at,
+                    chunk_hashes = excluded.chunk_hashes
+                """,
+                (path, size, mtime, content_hash, json.dumps(chunk_ids), int(duration), time.time(),
+                 json.dumps(chunk_hashes or []))
+            )
+            conn.commit()
+
+    def touch(self, path: str, size: int, mtime: float):
+        """内容未变化 (哈希相同) 时只刷新 stat 信息。"""
+        with self._get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE files SET size = ?, mtime = ? WHERE path = ?", (size, mtime, path))
+            conn.commit()
+
+    def set_duration(self, path: str, duration: int):
+        with self._get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE files SET duration = ? WHERE path = ?", (int(duration), path))
+            conn.commit()
+
+    def rename(self, src_path: str, dest_path: str):
+        """移动/重命名: 条目改挂到新路径 (目标路径的旧条目被覆盖)。"""
+        with self._get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM files WHERE path = ?", (dest_path,))
+            cursor.execute("UPDATE files SET path = ? WHERE path = ?", (dest_path, src_path))
+            conn.commit()
+
+    def remove(self, path: str):
+        with self._get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM files WHERE path = ?", (path,))
+            conn.commit()
+
+    def remove_prefix(self, root: str) -> List[Dict[str, Any]]:
+        """删除 root 目录下的所有条目，并返回被删除的条目。"""
+        entries = list(self.list_prefix(root).values())
+        if entries:
+            with self._get_conn() as conn:
+                cursor = conn.cursor()
+                cursor.executemany("DELETE FROM files WHERE path = ?", [(e["path"],) for e in entries])
+                conn.commit()
+        return entries
@@ -1,12 +1,137 @@
 import time
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from src.ingest import IngestionEngine
+from src.config_manager import config_manager
+
+class EventQueue:
+    """
+    DocHandler 与 IngestionEngine 之间的事件队列。
+    同一路径在静默窗口 (settle window) 内的多次事件合并为最终状态，
+    例如 created -> modified -> modified 只触发一次索引，created -> deleted 只触发一次删除。
+    到期的事件交给线程池处理，watchdog 观察者线程永远不会被索引阻塞。
+    """
+
+    def __init__(self, ingestor: IngestionEngine, settle_seconds: float = None, workers: int = None):
+        self.ingestor = ingestor
+        if settle_seconds is None:
+            settle_seconds = config_manager.get("watchdog_settle_seconds", 2.0)
+        if workers is None:
+            workers = config_manager.get("watchdog_workers", 2)
+        self.settle_seconds = max(0.0, float(settle_seconds))
+        # { path: {"action": "upsert" | "delete" | "move", "duration": int, "last_event": float} }
+        # move 条目以目标路径为键，另带 "src" 和 "is_directory"
+        self._pending = {}
+        # 正在处理的路径，同一路径不会并发处理
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="docbrain-watch")
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="docbrain-event-queue", daemon=True)
+        self._thread.start()
+
+    def put(self, path: str, action: str, duration: int = 0):
+        with self._lock:
+            entry = self._pending.setdefault(path, {"action": action, "duration": 0, "last_event": 0.0})
+            if entry["action"] == "move" and action == "delete":
+                # 移动后又被删除: 最终状态是源路径的数据也应删除
+                self._pending[entry["src"]] = {"action": "delete", "duration": 0, "last_event": time.time()}
+                entry.pop("src", None)
+                entry.pop("is_directory", None)
+            # 最后一个事件决定最终状态 (移动后的修改仍按移动处理，移动完成后会检查内容)
+            if entry["action"] != "move" or action == "delete":
+                entry["action"] = action
+            entry["duration"] += int(duration)
+            entry["last_event"] = time.time()
+        self._wakeup.set()
+
+    def put_move(self, src_path: str, dest_path: str, is_directory: bool = False):
+        with self._lock:
+            src_entry = self._pending.pop(src_path, None)
+            duration = src_entry["duration"] if src_entry else 0
+            if src_entry and src_entry["action"] == "move":
+                # 连续移动 a -> b -> c 合并为 a -> c
+                src_path = src_entry["src"]
+            self._pending[dest_path] = {
+                "action": "move",
+                "src": src_path,
+                "is_directory": is_directory,
+                "duration": duration,
+                "last_event": time.time()
+            }
+        self._wakeup.set()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending) + len(self._in_flight)
+
+    def _take_ready(self, force: bool = False):
+        now = time.time()
+        ready = []
+        next_due = None
+        with self._lock:
+            for path, entry in list(self._pending.items()):
+                if path in self._in_flight or entry.get("src") in self._in_flight:
+                    continue
+                due = entry["last_event"] + self.settle_seconds
+                if force or due <= now:
+                    ready.append((path, self._pending.pop(path)))
+                    self._in_flight.add(path)
+                elif next_due is None or due < next_due:
+                    next_due = due
+        return ready, next_due
+
+    def _run(self):
+        while self._running:
+            ready, next_due = self._take_ready()
+            for path, entry in ready:
+                self._executor.submit(self._dispatch, path, entry)
+            timeout = None if next_due is None else max(0.05, next_due - time.time())
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def _dispatch(self, path: str, entry: dict):
+        try:
+            if entry["action"] == "delete":
+                self.ingestor.remove_document(path)
+            elif entry["action"] == "move" and entry["is_directory"]:
+                self.ingestor.move_directory(entry["src"], path)
+            else:
+                if entry["action"] == "move" and not self.ingestor.move_document(entry["src"], path):
+                    # 无法复用 (未索引或扩展名变化): 删除旧数据后按新文件索引
+                    self.ingestor.remove_document(entry["src"])
+                additional_duration = entry["duration"]
+                # 编辑时长走只更新元数据的路径，不再强制重新嵌入
+                if additional_duration and self.ingestor.add_effort(os.path.abspath(path), additional_duration) is not None:
+                    additional_duration = 0
+                self.ingestor.process_file(path, additional_duration=additional_duration)
+        except Exception as e:
+            print(f"Monitor: Error handling {entry['action']} for {path}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(path)
+            # 处理期间同一路径可能又有新事件
+            self._wakeup.set()
+
+    def stop(self, drain: bool = True):
+        """停止队列。drain 为 True 时立即处理尚未到期的事件并等待完成。"""
+        self._running = False
+        self._wakeup.set()
+        self._thread.join()
+        if drain:
+            ready, _ = self._take_ready(force=True)
+            for path, entry in ready:
+                self._executor.submit(self._dispatch, path, entry)
+        self._executor.shutdown(wait=drain)
 
 class DocHandler(FileSystemEventHandler):
-    def __init__(self, ingestor: IngestionEngine):
+    def __init__(self, ingestor: IngestionEngine, queue: EventQueue = None):
         self.ingestor = ingestor
+        self.queue = queue or EventQueue(ingestor)
         # 记录最后修改时间以预估工作量
         # { filepath: last_event_time }
         self.file_activity = {}
@@ -14,6 +139,11 @@ class DocHandler(FileSystemEventHandler):
 
     def process(self, event):
         if event.is_directory:
+            # 目录移动只改写元数据；子项的合成 (synthetic) 移动事件随之忽略
+            if event.event_type == 'moved':
+                self.queue.put_move(event.src_path, event.dest_path, is_directory=True)
+            return
+        if event.event_type == 'moved' and getattr(event, "is_synthetic", False):
             return
         
         filepath = event.src_path
@@ -46,20 +176,20 @@ class DocHandler(FileSystemEventHandler):
         # Update last seen time
         self.file_activity[filepath] = now
 
+        # 只入队，不在观察者线程中索引；静默窗口同时保证文件写入完成
         if event.event_type == 'deleted':
-             self.ingestor.remove_document(filepath)
+             self.queue.put(filepath, "delete")
              if filepath in self.file_activity:
                  del self.file_activity[filepath]
         elif event.event_type in ['created', 'modified']:
-             # 小延迟以确保文件写入完成
-             time.sleep(1)
-             self.ingestor.process_file(filepath, additional_duration=additional_duration)
+             self.queue.put(filepath, "upsert", additional_duration)
         elif event.event_type == 'moved':
-             # 处理重命名: 删除旧的，添加新的
-             self.ingestor.remove_document(event.src_path)
-             if not event.dest_path.split("/")[-1].startswith('.'):
-                 time.sleep(1)
-                 self.ingestor.process_file(event.dest_path)
+             # 处理重命名: 复用已有向量，只改写元数据
+             dest_name = os.path.basename(event.dest_path)
+             if dest_name.startswith('.') or dest_name.startswith('~'):
+                 self.queue.put(event.src_path, "delete")
+             else:
+                 self.queue.put_move(event.src_path, event.dest_path)
 
     def on_modified(self, event):
         self.process(event)
@@ -74,7 +204,6 @@ class DocHandler(FileSystemEventHandler):
         self.process(event)
 
 from typing import List
-from src.config_manager import config_manager
 
 class GlobalMonitor:
     def __init__(self):
@@ -84,7 +213,9 @@ class GlobalMonitor:
 
     def set_engine(self, engine: IngestionEngine):
         self.ingestor = engine
-        self.handler = DocHandler(self.ingestor)
+
+    def pending_events(self) -> int:
+        return self.handler.queue.pending_count() if self.handler else 0
 
     def start(self):
         self.stop() # 确保停止先前的观察者
@@ -98,6 +229,7 @@ class GlobalMonitor:
              return
 
         self.observer = Observer()
+        self.handler = DocHandler(self.ingestor)
         watch_paths = config_manager.get("watch_paths", ["./data"])
         
         # Get backend root for resolving relative paths
@@ -128,6 +260,8 @@ class GlobalMonitor:
             print(f"Monitor: Started watching {scheduled_count} directories.")
         else:
             self.observer = None
+            self.handler.queue.stop()
+            self.handler = None
             print("Monitor: No valid directories to watch.")
 
     def stop(self):
@@ -137,6 +271,9 @@ class GlobalMonitor:
                 self.observer.join()
             self.observer = None
             print("Monitor: Stopped.")
+        if self.handler:
+            self.handler.queue.stop()
+            self.handler = None
 
 global_monitor = GlobalMonitor()
 
@@ -164,6 +301,7 @@ def start_watching(directory: str = None):
         except KeyboardInterrupt:
             observer.stop()
         observer.join()
+        event_handler.queue.stop()
     else:
         # Server mode uses the global monitor instance
         global_monitor.start()
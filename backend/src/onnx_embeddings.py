@@ -0,0 +1,86 @@
+import json
+import os
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+# scripts/export_onnx.py 导出的文件，位于模型目录下的 onnx/ 子目录
+ONNX_DIR = "onnx"
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_qint8.onnx"
+
+def onnx_model_file(model_dir: str, quantized: bool = False) -> str:
+    return os.path.join(model_dir, ONNX_DIR, ONNX_INT8_FILE if quantized else ONNX_FILE)
+
+class OnnxEmbeddings(Embeddings):
+    """
+    用 ONNX Runtime 运行本地 sentence-transformers 模型 (CPU)。
+    与 sentence-transformers 的流程保持一致: 分词 -> Transformer -> 均值池化 -> (可选) L2 归一化，
+    因此向量与 PyTorch 后端可以直接混用。
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, threads: int = 0, batch_size: int = 32):
+        # onnxruntime / tokenizers 只在选择 ONNX 后端时导入
+        import numpy as np
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_file = onnx_model_file(model_dir, quantized)
+        if not os.path.exists(model_file):
+            raise FileNotFoundError(
+                f"ONNX model not found: {model_file}. Run scripts/export_onnx.py first."
+            )
+
+        self._np = np
+        self.batch_size = max(1, int(batch_size))
+
+        max_seq_length = 256
+        st_config = os.path.join(model_dir, "sentence_bert_config.json")
+        if os.path.exists(st_config):
+            with open(st_config, "r", encoding="utf-8") as f:
+                max_seq_length = json.load(f).get("max_seq_length", max_seq_length)
+
+        # modules.json 中包含 Normalize 模块时，sentence-transformers 会输出单位向量
+        self.normalize = False
+        modules_file = os.path.join(model_dir, "modules.json")
+        if os.path.exists(modules_file):
+            with open(modules_file, "r", encoding="utf-8") as f:
+                self.normalize = any(m.get("type", "").endswith("Normalize") for m in json.load(f))
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        if threads and threads > 0:
+            options.intra_op_num_threads = int(threads)
+        self.session = ort.InferenceSession(model_file, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        np = self._np
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # 均值池化 (忽略 padding)
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        vectors = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[i:i + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0]
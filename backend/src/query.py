@@ -1,13 +1,26 @@
 import os
-from typing import List, Optional
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
 from langchain_community.vectorstores import Chroma
 from langchain_community.vectorstores import Chroma
 from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.documents import Document
 import requests
 from typing import Optional
 from src.llm_provider import LLMFactory
 from src.config_manager import config_manager
+from src.embeddings import get_embedding_model
+from src.embedding_service import QueryEmbeddingService
+from src.embedding_cache import QueryEmbeddingCache
+from src.answer_cache import AnswerCache
+from src.router import ComplexityRouter
+from src.lexical_index import get_lexical_index, LEXICAL_INDEX_FILE
+from src.ranking import Reranker
+
+# 倒数排名融合 (Reciprocal Rank Fusion) 的平滑常数
+RRF_K = 60
 
 def call_company_agent(
         input_params: dict,
@@ -52,10 +65,70 @@ def call_company_agent(
 
     return str(text)
 
+def stream_company_agent(
+        input_params: dict,
+        base_url: str,
+        api_key: str,
+        open_id: str,
+        session_id: Optional[str] = None,
+        timeout: int = 60,
+) -> Iterator[str]:
+    """
+    以 responseMode="streaming" 调用内部模型 API，逐段产出文本。
+    兼容 SSE ("data: {...}") 与逐行 JSON 两种返回格式; output 为累计全文时只产出新增部分。
+    """
+    if not base_url or not api_key:
+        raise RuntimeError("COMPANY_API_URL 或 COMPANY_API_KEY 未配置，请在设置或 .env 中设置。")
+
+    headers = {
+        "Api-Key": api_key,
+        "Content-Type": "application/json;charset=utf-8",
+    }
+
+    payload = {
+        "sessionId": session_id or "",
+        "responseMode": "streaming",
+        "openId": open_id or "",
+        "inputParams": input_params,
+    }
+
+    with requests.post(base_url, headers=headers, json=payload, timeout=timeout, stream=True) as resp:
+        resp.raise_for_status()
+        emitted = ""
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            if line.startswith("data:"):
+                line = line[len("data:"):].strip()
+            if not line or line == "[DONE]":
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(data, dict):
+                continue
+            if data.get("returnCode") and data.get("returnCode") != "SUC0000":
+                raise RuntimeError(f"LLM API error: {data.get('returnCode')} - {data.get('errorMsg')}")
+
+            body = data.get("body") or {}
+            text = str(body.get("output") or "")
+            if not text:
+                continue
+            if text.startswith(emitted):
+                piece = text[len(emitted):]
+                emitted = text
+            else:
+                piece = text
+                emitted += text
+            if piece:
+                yield piece
+
 class QueryEngine:
-    def __init__(self, persist_directory: str = None, model_name: str = "all-MiniLM-L6-v2", vector_store=None):
+    def __init__(self, persist_directory: str = None, model_name: str = "all-MiniLM-L6-v2", vector_store=None, ingestor=None):
         """
         Initialize the Query Engine.
+        ingestor: 共享的 IngestionEngine，提供来源版本号以启用答案缓存，并共享其词法索引。
         """
         if persist_directory is None and vector_store is None:
             # Resolve to absolute path relative to project root
@@ -64,23 +137,7 @@ class QueryEngine:
             project_root = os.path.dirname(backend_dir)
             persist_directory = os.path.join(project_root, "chroma_db")
 
-        # Check for local model
-        root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        local_model_path = os.path.join(root_dir, "models", model_name)
-        if os.path.exists(local_model_path):
-            print(f"Found local model at: {local_model_path}")
-            model_name = local_model_path
-
-        print(f"Loading embedding model: {model_name}...")
-        # Force CPU to avoid iGPU spikes
-        model_kwargs = {'device': 'cpu'}
-        encode_kwargs = {'normalize_embeddings': False}
-
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name=model_name,
-            model_kwargs=model_kwargs,
-            encode_kwargs=encode_kwargs
-        )
+        self.embedding_model = get_embedding_model(model_name)
         
         if vector_store:
             print("正在使用共享向量存储实例...")
@@ -92,58 +149,173 @@ class QueryEngine:
                 embedding_function=self.embedding_model
             )
         
-        # 使用工厂初始化 LLM
-        print(f"正在初始化 LLM，提供商: {config_manager.get('active_provider', 'deepseek')}...")
+        # 投机检索线程池 (与复杂度分类并行)
+        self.prefetch_executor = None
+        if config_manager.get("speculative_retrieval", True):
+            self.prefetch_executor = ThreadPoolExecutor(
+                max_workers=config_manager.get("speculative_retrieval_workers", 4),
+                thread_name_prefix="docbrain-prefetch"
+            )
+
+        # 并发查询的向量计算合并为微批
+        self.embedding_service = QueryEmbeddingService(self.embedding_model)
+        # 重复的查询 (包括 CrewAI 研究员的检索) 直接复用向量
+        self.query_cache = QueryEmbeddingCache(config_manager.get("query_embedding_cache_size", 1024))
+
+        # 本地复杂度路由 (启发式 + 查询向量质心)，只有置信度不足时才请求 LLM 分类
+        self.router = ComplexityRouter(self.embedding_model) if config_manager.get("router_enabled", True) else None
+
+        # 混合检索: 向量检索与 BM25 词法检索的结果按倒数排名融合
+        self.retrieval_mode = config_manager.get("retrieval_mode", "hybrid")
+        self.lexical_index = None
+        if ingestor is not None:
+            self.lexical_index = ingestor.lexical_index
+        elif persist_directory is not None:
+            self.lexical_index = get_lexical_index(os.path.join(persist_directory, LEXICAL_INDEX_FILE))
+        self._lexical_checked = False
+        self._lexical_lock = threading.Lock()
+
+        # 质量模式的候选池大小与重排器 (特征在索引时写入元数据)
+        self.quality_fetch_k = int(config_manager.get("quality_fetch_k", 100))
+        self.reranker = Reranker()
+
+        # 语义答案缓存依赖索引引擎的来源版本号，独立运行 (CLI) 时不启用
+        self.answer_cache = None
+        if ingestor is not None and config_manager.get("answer_cache_enabled", True):
+            self.answer_cache = AnswerCache(ingestor)
+
+        # LLM 在第一次使用时才创建 (见 llm 属性)，list 等命令无需加载聊天模型
+        self._llm = None
+        self._llm_ready = False
+        self._llm_lock = threading.Lock()
+
+    @property
+    def llm(self):
+        if not self._llm_ready:
+            with self._llm_lock:
+                if not self._llm_ready:
+                    # 使用工厂初始化 LLM
+                    print(f"正在初始化 LLM，提供商: {config_manager.get('active_provider', 'deepseek')}...")
+                    try:
+                        self._llm = LLMFactory.create_langchain_llm(config_manager)
+                    except Exception as e:
+                        print(f"Error initializing LLM: {e}")
+                        self._llm = None
+                    self._llm_ready = True
+        return self._llm
+
+    @property
+    def llm_loaded(self) -> bool:
+        return self._llm_ready
+
+    def close(self):
+        if self.prefetch_executor is not None:
+            self.prefetch_executor.shutdown(wait=True)
+        self.embedding_service.stop()
+
+    def embed_query(self, query: str) -> List[float]:
+        model_id = self.embedding_model.model_id
+        vector = self.query_cache.get(model_id, query)
+        if vector is None:
+            vector = self.embedding_service.embed(query)
+            self.query_cache.put(model_id, query, vector)
+        return vector
+
+    def prepare_lexical_index(self) -> bool:
+        """
+        混合检索可用时返回 True。词法索引从未建立过 (例如升级后第一次启动) 时先从 Chroma 全量构建一次;
+        倒排表在这里 (或第一次查询时) 才加载，其他进程写入后重新加载。
+        """
+        if self.retrieval_mode != "hybrid" or self.lexical_index is None:
+            return False
+        if not self._lexical_checked:
+            with self._lexical_lock:
+                if not self._lexical_checked:
+                    try:
+                        self.lexical_index.ensure_built(self.vector_store._collection)
+                    except Exception as e:
+                        print(f"Error building lexical index: {e}")
+                    self._lexical_checked = True
         try:
-            self.llm = LLMFactory.create_langchain_llm(config_manager)
+            self.lexical_index.ensure_loaded()
         except Exception as e:
-            print(f"Error initializing LLM: {e}")
-            self.llm = None
+            print(f"Error loading lexical index: {e}")
+            return False
+        return len(self.lexical_index) > 0
+
+    def _dense_search(self, query_vector: List[float], n: int, where: Optional[dict] = None) -> List[Tuple[str, Document, float]]:
+        """向量检索，返回 (chunk_id, 文档, 距离)。LangChain 的封装不返回 ID，因此直接查询集合。"""
+        result = self.vector_store._collection.query(
+            query_embeddings=[query_vector], n_results=n, where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            (chunk_id, Document(page_content=text, metadata=metadata or {}), distance)
+            for chunk_id, text, metadata, distance in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+            )
+        ]
 
-    def retrieve_context(self, query: str, k: int = 8, quality_mode: bool = False) -> List[str]:
+    def _hybrid_search(self, query: str, query_vector: List[float], n: int,
+                       where: Optional[dict] = None) -> List[Tuple[Document, float]]:
+        """
+        向量检索与 BM25 检索各取前 n 个，按倒数排名融合后返回前 n 个 (文档, 分数)。
+        分数归一化到 [0, 1] (两路都排第一时为 1)，可直接乘以质量模式的加权系数。
+        有过滤条件时，词法结果多取一些，再由 Chroma 按同一 where 条件筛掉不匹配的分块。
+        """
+        fused = {}
+        docs = {}
+        dense_ids = set()
+        for rank, (chunk_id, doc, _) in enumerate(self._dense_search(query_vector, n, where)):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+            docs[chunk_id] = doc
+            dense_ids.add(chunk_id)
+
+        lexical_hits = self.lexical_index.search(query, n * 4 if where else n)
+        missing = [chunk_id for chunk_id, _ in lexical_hits if chunk_id not in docs]
+        if missing:
+            result = self.vector_store._collection.get(ids=missing, where=where, include=["documents", "metadatas"])
+            for chunk_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"]):
+                docs[chunk_id] = Document(page_content=text, metadata=metadata or {})
+        lexical_ids = [chunk_id for chunk_id, _ in lexical_hits if chunk_id in docs][:n]
+        for rank, chunk_id in enumerate(lexical_ids):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+        best = 2.0 / (RRF_K + 1)
+        ranked = sorted(fused.items(), key=lambda x: x[1], reverse=True)[:n]
+        return [(docs[chunk_id], score / best) for chunk_id, score in ranked]
+
+    def retrieve_context(self, query: str, k: int = 8, quality_mode: bool = False,
+                         where: Optional[dict] = None) -> List[str]:
         """
         为查询检索相关的文档分块。
+        retrieval_mode 为 hybrid 时融合向量检索与 BM25 词法检索，
+        对项目代号、发票号等精确标识符的召回更可靠。
+        where: Chroma 元数据过滤条件 (见 src.filters.build_where)，检索只在匹配的分块中进行。
         """
+        query_vector = self.embed_query(query)
+        hybrid = self.prepare_lexical_index()
         if not quality_mode:
-            print(f"正在搜索相关上下文: '{query}'")
-            return self.vector_store.similarity_search(query, k=k)
+            print(f"正在搜索相关上下文: '{query}'" + (f" (过滤: {where})" if where else ""))
+            if hybrid:
+                return [doc for doc, _ in self._hybrid_search(query, query_vector, k, where)]
+            return self.vector_store.similarity_search_by_vector(query_vector, k=k, filter=where)
         
         # 质量模式实现
-        print(f"正在以质量模式搜索: '{query}'")
-        priority_keywords = os.getenv("PRIORITY_KEYWORDS", "").lower().split(",")
-        priority_keywords = [kw.strip() for kw in priority_keywords if kw.strip()]
-        
+        print(f"正在以质量模式搜索: '{query}'" + (f" (过滤: {where})" if where else ""))
         # 1. 获取更大的候选池
-        fetch_k = k * 3
-        docs_with_scores = self.vector_store.similarity_search_with_relevance_scores(query, k=fetch_k)
-        
-        # 2. 根据路径关键字和新旧程度重新排序
-        ranked_results = []
-        import time
-        now = time.time()
-        
-        for doc, score in docs_with_scores:
-            boost = 1.0
-            source_path = doc.metadata.get("source", "").lower()
-            mtime = doc.metadata.get("mtime", 0)
-            
-            # Boost based on keywords in path
-            if any(kw in source_path for kw in priority_keywords):
-                boost += 0.5  # 50% boost for priority paths
-                
-            # Slight boost for recency (within the last 30 days)
-            age_days = (now - mtime) / (24 * 3600)
-            if age_days < 30:
-                # Up to 20% boost for very recent files
-                recency_boost = 0.2 * (1 - (max(0, age_days) / 30))
-                boost += recency_boost
-                
-            final_score = score * boost
-            ranked_results.append((doc, final_score))
-            
-        # 3. Sort by final score and take top k
-        ranked_results.sort(key=lambda x: x[1], reverse=True)
-        return [r[0] for r in ranked_results[:k]]
+        fetch_k = max(k, self.quality_fetch_k)
+        if hybrid:
+            docs_with_scores = self._hybrid_search(query, query_vector, fetch_k, where)
+        else:
+            docs_with_distances = self.vector_store.similarity_search_by_vector_with_relevance_scores(
+                query_vector, k=fetch_k, filter=where)
+            # 距离换算为相关度 (越大越相关)，与 similarity_search_with_relevance_scores 一致
+            relevance_fn = self.vector_store._select_relevance_score_fn()
+            docs_with_scores = [(doc, relevance_fn(distance)) for doc, distance in docs_with_distances]
+
+        # 2. 按索引时预计算的路径优先级、新旧程度和投入时长重新排序，取前 k 个
+        return self.reranker.rerank(docs_with_scores, k)
 
     def evaluate_complexity(self, query: str) -> bool:
         """
@@ -181,39 +353,76 @@ class QueryEngine:
         except Exception:
             return False
 
-    def ask(self, query: str, quality_mode: bool = False, force_crew: bool = False, no_crew: bool = False) -> str:
+    def is_complex_query(self, query: str) -> bool:
+        """先用本地路由判断复杂度，置信度不足时回退到 LLM 分类。"""
+        if self.router is not None:
+            decision = self.router.route(query, self.embed_query(query))
+            if decision["complex"] is not None:
+                label = "complex" if decision["complex"] else "simple"
+                print(f"Query classification (local, confidence {decision['confidence']:.2f}): {label}")
+                return decision["complex"]
+        return self.evaluate_complexity(query)
+
+    def _cache_options(self, quality_mode: bool, force_crew: bool, no_crew: bool, where: Optional[dict],
+                       filter_key: Optional[str] = None) -> Tuple:
+        # 优先使用未解析的过滤条件 (见 src.filters.filter_key)，相对时间条件才能命中缓存
+        where_key = filter_key if filter_key is not None else (json.dumps(where, sort_keys=True) if where else None)
+        return (quality_mode, force_crew, no_crew, where_key, config_manager.get("active_provider", ""))
+
+    def ask(self, query: str, quality_mode: bool = False, force_crew: bool = False, no_crew: bool = False,
+            bypass_cache: bool = False, where: Optional[dict] = None,
+            filter_key: Optional[str] = None) -> str:
         """
         向 LLM 提问，使用检索到的上下文或通过 CrewAI。
+        相似问题且引用来源未变化时直接返回缓存的答案; bypass_cache 跳过查找并刷新缓存。
+        where: 元数据过滤条件，限定检索范围 (见 src.filters.build_where)。
+        filter_key: 过滤条件的原始写法 (见 src.filters.filter_key)，用作答案缓存键。
         """
-        active_provider = config_manager.get("active_provider", "")
-        is_company_internal = (active_provider == "company_internal")
+        if self.answer_cache is None:
+            return self._ask(query, quality_mode, force_crew, no_crew, where)[0]
 
-        # 1. 检查复杂度 (公司内网模型直接走标准 RAG，不支持 CrewAI)
-        if is_company_internal:
-            is_complex = False
-            print(">>> 检查到公司内网模型，已跳过复杂查询网关评估 <<<")
-        else:
-            is_complex = not no_crew and (force_crew or self.evaluate_complexity(query))
-        
-        if is_complex:
-            if force_crew:
-                print(">>> 强制路由到 CrewAI 代理 (测试模式) <<<")
-            else:
-                print(">>> 路由到 CrewAI 代理 (复杂查询) <<<")
-            try:
-                from src.crew_agent import DocBrainCrew
-                crew = DocBrainCrew(self)
-                return crew.run_crew(query)
-            except Exception as e:
-                print(f"CrewAI 失败: {e}。回退到标准 RAG。")
-                # Fallback to standard RAG if CrewAI fails
-        
-        # 2. 标准 RAG (简单查询)
-        print(">>> 使用标准 RAG (简单查询) <<<")
-        docs = self.retrieve_context(query, quality_mode=quality_mode)
-        if not docs:
-            return "No relevant context found in the knowledge base."
-        
+        options = self._cache_options(quality_mode, force_crew, no_crew, where, filter_key)
+        query_vector = self.embed_query(query)
+        if not bypass_cache:
+            cached = self.answer_cache.get(query_vector, options)
+            if cached is not None:
+                return cached
+
+        started = self.answer_cache.begin()
+        answer, sources = self._ask(query, quality_mode, force_crew, no_crew, where)
+        if sources:
+            self.answer_cache.put(query, query_vector, options, answer, sources, started)
+        return answer
+
+    def ask_stream(self, query: str, quality_mode: bool = False, force_crew: bool = False, no_crew: bool = False,
+                   bypass_cache: bool = False, where: Optional[dict] = None,
+                   filter_key: Optional[str] = None) -> Iterator[str]:
+        """
+        ask 的流式版本: 逐段产出答案文本。标准 RAG 使用 LLM 的流式接口 (公司内网模型使用 streaming 模式)，
+        CrewAI 与缓存命中的答案一次性产出。
+        """
+        options = query_vector = None
+        if self.answer_cache is not None:
+            options = self._cache_options(quality_mode, force_crew, no_crew, where, filter_key)
+            query_vector = self.embed_query(query)
+            if not bypass_cache:
+                cached = self.answer_cache.get(query_vector, options)
+                if cached is not None:
+                    yield cached.raw if hasattr(cached, "raw") else str(cached)
+                    return
+            started = self.answer_cache.begin()
+
+        result = {}
+        parts = []
+        for piece in self._ask_stream(query, quality_mode, force_crew, no_crew, where, result):
+            parts.append(piece)
+            yield piece
+
+        if self.answer_cache is not None and result.get("sources"):
+            self.answer_cache.put(query, query_vector, options, "".join(parts), result["sources"], started)
+
+    def build_prompts(self, query: str, docs) -> Tuple[str, str]:
+        """由检索到的分块组装 (system_prompt, user_prompt)。"""
         # Build context string with metadata and formatted duration
         context_parts = []
         for i, doc in enumerate(docs):
@@ -243,45 +452,163 @@ class QueryEngine:
 
 User Question/Request: {query}
 """
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_prompt)
-        ]
-        
-        if is_company_internal:
+        return system_prompt, user_prompt
+
+    def _prepare_rag(self, query: str, quality_mode: bool, where: Optional[dict] = None):
+        """检索并组装提示词，返回 (docs, system_prompt, user_prompt)。可在分类进行时提前执行。"""
+        docs = self.retrieve_context(query, quality_mode=quality_mode, where=where)
+        if not docs:
+            return docs, None, None
+        system_prompt, user_prompt = self.build_prompts(query, docs)
+        return docs, system_prompt, user_prompt
+
+    def _route(self, query: str, quality_mode: bool, force_crew: bool, no_crew: bool, where: Optional[dict]):
+        """决定是否走 CrewAI，返回 (is_complex, 投机检索的 Future 或 None)。"""
+        # 检查复杂度 (公司内网模型直接走标准 RAG，不支持 CrewAI)
+        prefetch = None
+        if self._is_company_internal():
+            is_complex = False
+            print(">>> 检查到公司内网模型，已跳过复杂查询网关评估 <<<")
+        elif no_crew or force_crew:
+            is_complex = not no_crew
+        else:
+            # 投机检索: 分类 (可能是一次 LLM 调用) 进行的同时检索并组装提示词
+            if self.prefetch_executor is not None:
+                prefetch = self.prefetch_executor.submit(self._prepare_rag, query, quality_mode, where)
+            is_complex = self.is_complex_query(query)
+        return is_complex, prefetch
+
+    @staticmethod
+    def _is_company_internal() -> bool:
+        return config_manager.get("active_provider", "") == "company_internal"
+
+    def _run_crew(self, query: str, force_crew: bool, prefetch, where: Optional[dict] = None):
+        """运行 CrewAI，返回 (答案, 来源)；失败时返回 None，由调用方回退到标准 RAG。"""
+        if force_crew:
+            print(">>> 强制路由到 CrewAI 代理 (测试模式) <<<")
+        else:
+            print(">>> 路由到 CrewAI 代理 (复杂查询) <<<")
+        try:
+            from src.crew_agent import DocBrainCrew
+            crew = DocBrainCrew(self, where=where)
+            # 预取的检索结果作为研究员的第一条观察
+            prefetched_docs = None
+            if prefetch is not None:
+                try:
+                    prefetched_docs = prefetch.result()[0]
+                except Exception as e:
+                    print(f"Speculative retrieval failed: {e}")
+            answer = crew.run_crew(query, prefetched_docs=prefetched_docs)
+            return answer, crew.retrieved_sources
+        except Exception as e:
+            print(f"CrewAI 失败: {e}。回退到标准 RAG。")
+            # Fallback to standard RAG if CrewAI fails
+            return None
+
+    def _rag_context(self, query: str, quality_mode: bool, prefetch, where: Optional[dict] = None):
+        print(">>> 使用标准 RAG (简单查询) <<<")
+        if prefetch is not None:
+            return prefetch.result()
+        return self._prepare_rag(query, quality_mode, where)
+
+    @staticmethod
+    def _company_agent_config() -> dict:
+        # 获取内网专属配置获取
+        providers_config = config_manager.get("llm_providers", {})
+        internal_config = providers_config.get("company_internal", {})
+        return {
+            "api_key": internal_config.get("api_key") or os.getenv("COMPANY_API_KEY", ""),
+            "base_url": internal_config.get("base_url") or os.getenv("COMPANY_API_URL", ""),
+            "open_id": internal_config.get("open_id") or os.getenv("COMPANY_OPEN_ID", "")
+        }
+
+    def _ask(self, query: str, quality_mode: bool, force_crew: bool, no_crew: bool, where: Optional[dict] = None):
+        """返回 (答案, 引用的来源)。出错或无上下文时来源为 None，答案不会被缓存。"""
+        # 1. 检查复杂度
+        is_complex, prefetch = self._route(query, quality_mode, force_crew, no_crew, where)
+        if is_complex:
+            crew_result = self._run_crew(query, force_crew, prefetch, where)
+            if crew_result is not None:
+                return crew_result
+
+        # 2. 标准 RAG (简单查询)
+        docs, system_prompt, user_prompt = self._rag_context(query, quality_mode, prefetch, where)
+        if not docs:
+            return "No relevant context found in the knowledge base.", None
+        sources = [doc.metadata.get("source", "Unknown") for doc in docs]
+
+        if self._is_company_internal():
             print("Sending request to company internal LLM...")
             try:
-                # 获取内网专属配置获取
-                providers_config = config_manager.get("llm_providers", {})
-                internal_config = providers_config.get("company_internal", {})
-                
                 input_params = {
                     "instruction": system_prompt,
                     "question": user_prompt,
                 }
-                
-                api_key = internal_config.get("api_key") or os.getenv("COMPANY_API_KEY", "")
-                base_url = internal_config.get("base_url") or os.getenv("COMPANY_API_URL", "")
-                open_id = internal_config.get("open_id") or os.getenv("COMPANY_OPEN_ID", "")
-
                 answer = call_company_agent(
                     input_params=input_params,
-                    base_url=base_url,
-                    api_key=api_key,
-                    open_id=open_id,
                     session_id=None,
-                    response_mode="noStreaming"
+                    response_mode="noStreaming",
+                    **self._company_agent_config()
                 )
-                return answer
+                return answer, sources
             except Exception as e:
-                return f"Error communicating with company internal LLM: {e}"
+                return f"Error communicating with company internal LLM: {e}", None
         else:
+            messages = [
+                SystemMessage(content=system_prompt),
+                HumanMessage(content=user_prompt)
+            ]
             print("Sending request to LLM...")
             try:
                 response = self.llm.invoke(messages)
-                return response.content
+                return response.content, sources
+            except Exception as e:
+                return f"Error communicating with LLM: {e}", None
+
+    def _ask_stream(self, query: str, quality_mode: bool, force_crew: bool, no_crew: bool, where: Optional[dict],
+                    result: dict) -> Iterator[str]:
+        """_ask 的流式实现。完整结束且可缓存时把引用的来源写入 result["sources"]。"""
+        is_complex, prefetch = self._route(query, quality_mode, force_crew, no_crew, where)
+        if is_complex:
+            crew_result = self._run_crew(query, force_crew, prefetch, where)
+            if crew_result is not None:
+                answer, result["sources"] = crew_result
+                yield answer.raw if hasattr(answer, "raw") else str(answer)
+                return
+
+        docs, system_prompt, user_prompt = self._rag_context(query, quality_mode, prefetch, where)
+        if not docs:
+            yield "No relevant context found in the knowledge base."
+            return
+        sources = [doc.metadata.get("source", "Unknown") for doc in docs]
+
+        if self._is_company_internal():
+            print("Streaming request to company internal LLM...")
+            try:
+                input_params = {
+                    "instruction": system_prompt,
+                    "question": user_prompt,
+                }
+                for piece in stream_company_agent(input_params=input_params, session_id=None,
+                                                  **self._company_agent_config()):
+                    yield piece
+            except Exception as e:
+                yield f"Error communicating with company internal LLM: {e}"
+                return
+        else:
+            messages = [
+                SystemMessage(content=system_prompt),
+                HumanMessage(content=user_prompt)
+            ]
+            print("Streaming request to LLM...")
+            try:
+                for chunk in self.llm.stream(messages):
+                    if chunk.content:
+                        yield chunk.content
             except Exception as e:
-                return f"Error communicating with LLM: {e}"
+                yield f"Error communicating with LLM: {e}"
+                return
+        result["sources"] = sources
 
     def get_documents_data(self):
         """
@@ -0,0 +1,93 @@
+import math
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.config_manager import config_manager
+
+SECONDS_PER_DAY = 24 * 3600
+
+# 排序特征在索引时计算并写入分块元数据，质量模式的重排只做向量化的数值运算:
+#   priority     - 路径是否包含优先关键字 (配置 priority_keywords 或 PRIORITY_KEYWORDS) (0 / 1)
+#   path_tier    - 0: 不含关键字; 1: 上级目录含关键字; 2: 文件名 (或网址末段) 含关键字
+#   mtime_bucket - 修改时间所在的天 (自纪元起的天数)
+#   duration     - 投入时长 (秒)，由 IngestionEngine 维护
+# (原始设置, 解析后的关键字): 设置变化 (例如 POST /config 保存) 后重新解析
+_priority_keywords: Tuple[Optional[str], List[str]] = (None, [])
+
+def get_priority_keywords() -> List[str]:
+    """配置中的 priority_keywords 优先，未设置时读取 PRIORITY_KEYWORDS (逗号分隔，不区分大小写)。"""
+    global _priority_keywords
+    raw = config_manager.get("priority_keywords") or os.getenv("PRIORITY_KEYWORDS", "")
+    if _priority_keywords[0] != raw:
+        keywords = raw.lower().split(",")
+        _priority_keywords = (raw, [kw.strip() for kw in keywords if kw.strip()])
+    return _priority_keywords[1]
+
+def keywords_signature() -> str:
+    """关键字集合的签名，变化时需要重新计算已索引分块的路径特征。"""
+    return ",".join(sorted(get_priority_keywords()))
+
+def path_ranking_metadata(source: str) -> Dict[str, int]:
+    keywords = get_priority_keywords()
+    source = source.lower()
+    tier = 0
+    if keywords and any(kw in source for kw in keywords):
+        name = os.path.basename(source.rstrip("/"))
+        tier = 2 if any(kw in name for kw in keywords) else 1
+    return {"priority": int(tier > 0), "path_tier": tier}
+
+def ranking_metadata(source: str, mtime: float) -> Dict[str, int]:
+    metadata = path_ranking_metadata(source)
+    metadata["mtime_bucket"] = int(mtime // SECONDS_PER_DAY)
+    return metadata
+
+class Reranker:
+    """
+    质量模式的重排: 相关度分数乘以 (1 + 各特征加权之和)，整个候选池一次 NumPy 运算完成，
+    fetch_k 增大到数百也不会带来明显延迟。权重来自配置 (rank_*)。
+    """
+
+    def __init__(self, priority_weight: Optional[float] = None, tier_weight: Optional[float] = None,
+                 recency_weight: Optional[float] = None, recency_days: Optional[float] = None,
+                 effort_weight: Optional[float] = None, effort_full_seconds: Optional[float] = None):
+        def setting(value, key, default):
+            return float(config_manager.get(key, default) if value is None else value)
+
+        self.priority_weight = setting(priority_weight, "rank_priority_weight", 0.5)
+        self.tier_weight = setting(tier_weight, "rank_path_tier_weight", 0.1)
+        self.recency_weight = setting(recency_weight, "rank_recency_weight", 0.2)
+        self.recency_days = max(1.0, setting(recency_days, "rank_recency_days", 30))
+        self.effort_weight = setting(effort_weight, "rank_effort_weight", 0.1)
+        self.effort_full_seconds = max(1.0, setting(effort_full_seconds, "rank_effort_full_seconds", 3600))
+
+    @staticmethod
+    def _features(metadata: dict) -> Tuple[int, int, float]:
+        if "path_tier" in metadata and "mtime_bucket" in metadata:
+            return metadata["path_tier"], metadata["mtime_bucket"], metadata.get("duration", 0)
+        # 早期索引的分块没有预计算特征，临时计算
+        features = ranking_metadata(metadata.get("source", ""), metadata.get("mtime", 0))
+        return features["path_tier"], features["mtime_bucket"], metadata.get("duration", 0)
+
+    def rerank(self, docs_with_scores: List[Tuple[Document, float]], k: int,
+               now: Optional[float] = None) -> List[Document]:
+        if not docs_with_scores:
+            return []
+        n = len(docs_with_scores)
+        scores = np.fromiter((score for _, score in docs_with_scores), dtype=np.float64, count=n)
+        features = np.array([self._features(doc.metadata) for doc, _ in docs_with_scores], dtype=np.float64)
+        tier, bucket, duration = features[:, 0], features[:, 1], features[:, 2]
+
+        today = (time.time() if now is None else now) // SECONDS_PER_DAY
+        age_days = np.maximum(today - bucket, 0)
+        boost = 1.0 + self.priority_weight * (tier > 0) + self.tier_weight * (tier > 1)
+        boost += self.recency_weight * np.clip(1 - age_days / self.recency_days, 0, 1)
+        boost += self.effort_weight * np.clip(
+            np.log1p(np.maximum(duration, 0)) / math.log1p(self.effort_full_seconds), 0, 1)
+
+        final = scores * boost
+        order = np.argsort(-final, kind="stable")[:k]
+        return [docs_with_scores[i][0] for i in order]
@@ -0,0 +1,171 @@
+import json
+import math
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.config_manager import config_manager
+
+# router.py is in backend/src
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLES_FILE = os.path.join(BACKEND_DIR, "models", "complexity_router", "samples.jsonl")
+# 留出的评估样本，不参与质心拟合 (见 tools/evaluate_router.py)
+EVAL_FILE = os.path.join(BACKEND_DIR, "models", "complexity_router", "eval.jsonl")
+
+# 复杂查询的强特征: 比较、分析、规划、综合多个来源、给出建议
+COMPLEX_PATTERNS = [re.compile(p) for p in [
+    r"\bcompar", r"\bversus\b|\bvs\.?\s", r"\banaly[sz]", r"\bevaluat", r"\bassess",
+    r"\bplan\b|\bplanning\b|\broadmap\b|\bmilestones?\b", r"\bstrateg", r"\bbriefing\b|\bretrospective\b",
+    r"\bpros and cons\b|\btrade-?offs?\b", r"\bhow should\b|\bwhat should\b|\bshould we\b",
+    r"\brecommend|\bsuggest|\bpropos", r"\bcombine\b",
+    r"\beverything\b|\ball my\b|\bgroup(ed)? by\b", r"\bcontradict",
+    r"\bdraft\b|\bwrite an?\b|\bcreate an?\b",
+    r"对比|比较", r"分析", r"评估", r"计划|规划", r"方案|建议|如何调整|应该", r"简报",
+    r"优缺点|利弊", r"综合|结合|归纳|梳理", r"矛盾",
+]]
+
+# 弱特征: 在事实型问题里也很常见 ("Why was the launch delayed?"、"What risks did the report flag?")，
+# 只小幅推动分数，单独出现时不足以让路由器在本地判定为复杂查询
+WEAK_COMPLEX_PATTERNS = [re.compile(p) for p in [
+    r"\bwhy\b", r"\brisks?\b", r"\btrends?\b", r"\breports?\b", r"\bidentify\b",
+    r"\bacross\b|\bbased on\b|\bgiven\b",
+    r"为什么|原因", r"风险", r"趋势", r"报告",
+]]
+WEAK_WEIGHT = 0.3
+WEAK_MAX = 0.6
+
+# 简单查询的特征: 以疑问词开头的事实型问题、定位或列举
+SIMPLE_PATTERNS = [re.compile(p) for p in [
+    r"^(what|who|when|where|which|how many|how much)\b", r"^(what's|who's|where's)",
+    r"^(find|show|list|give me|open)\b", r"\bdefinition\b|\bone-line\b",
+    r"是什么|是多少|多少|哪个|哪些|谁|在哪|什么时候|几个",
+]]
+
+MULTI_PART = re.compile(r"\band\b|，|;|；|并且|并")
+
+def heuristic_score(query: str) -> float:
+    """返回 [-1, 1] 之间的分数，正数倾向复杂查询。"""
+    text = query.strip().lower()
+    complex_hits = sum(1 for p in COMPLEX_PATTERNS if p.search(text))
+    weak_hits = sum(1 for p in WEAK_COMPLEX_PATTERNS if p.search(text))
+    simple_hits = sum(1 for p in SIMPLE_PATTERNS if p.search(text))
+    score = 0.8 * (complex_hits - simple_hits) + min(WEAK_MAX, WEAK_WEIGHT * weak_hits)
+    if len(MULTI_PART.findall(text)) >= 2:
+        score += 0.4
+    if len(text) > 100:
+        score += 0.4
+    elif len(text) < 25:
+        score -= 0.3
+    return math.tanh(score)
+
+def load_samples(path: str = SAMPLES_FILE) -> List[Dict[str, str]]:
+    samples = []
+    if not os.path.exists(path):
+        return samples
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                sample = json.loads(line)
+                if sample.get("label") in ("simple", "complex"):
+                    samples.append(sample)
+    return samples
+
+class ComplexityRouter:
+    """
+    本地查询复杂度路由: 关键词启发式 + 查询向量的最近质心分类 (质心来自标注样本)。
+    两者合成复杂查询的概率，置信度低于阈值时返回 None，由调用方回退到 LLM 分类。
+    """
+
+    def __init__(self, embedding_model=None, samples_path: str = SAMPLES_FILE,
+                 threshold: Optional[float] = None, centroid_weight: Optional[float] = None):
+        self.embedding_model = embedding_model
+        self.samples_path = samples_path
+        if threshold is None:
+            threshold = config_manager.get("router_confidence_threshold", 0.3)
+        if centroid_weight is None:
+            centroid_weight = config_manager.get("router_centroid_weight", 0.6)
+        self.threshold = float(threshold)
+        self.centroid_weight = min(1.0, max(0.0, float(centroid_weight)))
+        self.centroids = None
+        self._fitted = False
+        self._lock = threading.Lock()
+        self.local_decisions = 0
+        self.llm_fallbacks = 0
+
+    @staticmethod
+    def _unit(vectors) -> np.ndarray:
+        v = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(v, axis=-1, keepdims=True)
+        return v / np.clip(norms, 1e-12, None)
+
+    def fit(self, vectors: List[List[float]], labels: List[str]):
+        """由样本向量计算 simple / complex 两个质心。"""
+        vectors = self._unit(vectors)
+        labels = np.asarray(labels)
+        if not (labels == "simple").any() or not (labels == "complex").any():
+            self.centroids = None
+            return
+        self.centroids = self._unit(np.stack([
+            vectors[labels == "simple"].mean(axis=0),
+            vectors[labels == "complex"].mean(axis=0)
+        ]))
+
+    def ensure_fitted(self):
+        """用标注样本拟合质心 (一次)。API 预热时调用，第一个查询无需等待。"""
+        if self._fitted or self.embedding_model is None:
+            return
+        with self._lock:
+            if self._fitted:
+                return
+            samples = load_samples(self.samples_path)
+            if samples:
+                try:
+                    # 样本是查询，不写入持久的文档嵌入缓存
+                    texts = [s["query"] for s in samples]
+                    embed_queries = getattr(self.embedding_model, "embed_queries", None)
+                    vectors = embed_queries(texts) if embed_queries else self.embedding_model.embed_documents(texts)
+                    self.fit(vectors, [s["label"] for s in samples])
+                except Exception as e:
+                    print(f"Error fitting complexity router: {e}")
+            self._fitted = True
+
+    def centroid_probability(self, query_vector: List[float]) -> Optional[float]:
+        """按与两个质心的余弦相似度之差给出复杂查询的概率。"""
+        if self.centroids is None:
+            return None
+        sims = self.centroids @ self._unit(query_vector)
+        margin = float(sims[1] - sims[0])
+        return 1.0 / (1.0 + math.exp(-margin * 20.0))
+
+    def route(self, query: str, query_vector: Optional[List[float]] = None) -> Dict[str, Any]:
+        """
+        返回 {"complex": True / False / None, "probability": ..., "confidence": ...}。
+        complex 为 None 表示置信度不足，应交给 LLM 判断。
+        """
+        probability = 0.5 + 0.5 * heuristic_score(query)
+        if query_vector is not None:
+            self.ensure_fitted()
+            p_centroid = self.centroid_probability(query_vector)
+            if p_centroid is not None:
+                probability = self.centroid_weight * p_centroid + (1 - self.centroid_weight) * probability
+
+        confidence = abs(probability - 0.5) * 2
+        decision = None
+        if confidence >= self.threshold:
+            decision = probability > 0.5
+            self.local_decisions += 1
+        else:
+            self.llm_fallbacks += 1
+        return {"complex": decision, "probability": round(probability, 4), "confidence": round(confidence, 4)}
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.local_decisions + self.llm_fallbacks
+        return {
+            "local_decisions": self.local_decisions,
+            "llm_fallbacks": self.llm_fallbacks,
+            "local_rate": round(self.local_decisions / total, 4) if total else 0.0
+        }
@@ -0,0 +1,178 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+from src.config_manager import config_manager
+
+# 队列清空后，只有写入仍在持续到达时才再等这么久 (秒)，总等待不超过 max_wait
+ARRIVAL_GAP_SECONDS = 0.002
+
+class WriteOp:
+    def __init__(self, kind: str, kwargs: dict):
+        self.kind = kind
+        self.kwargs = kwargs
+        self.future = Future()
+
+    def rows(self) -> int:
+        return len(self.kwargs.get("ids") or []) or 1
+
+    def signature(self):
+        """只有类型和参数键一致、且按 ID 操作的写入才能合并为一次调用。"""
+        if self.kwargs.get("where") is not None:
+            return None
+        keys = tuple(sorted(k for k, v in self.kwargs.items() if v is not None))
+        return (self.kind, keys)
+
+class IngestWriter:
+    """
+    Chroma 的唯一写入者。所有 add / upsert / update / delete 都通过队列交给一个后台线程，
+    把已排队的写入攒成一组提交 (group commit)，每组只 persist 一次，写入顺序与提交顺序一致。
+    队列一空就提交; 只有写入仍在连续到达时才短暂等待，总等待不超过 max_wait，
+    因此逐个同步写入的调用方不会为凑组而空等。
+    调用方通过返回的 Future 等待自己所在的组提交完成。
+    每个写入成功后依次通知监听者 listener(kind, kwargs)，用于维护派生索引 (例如词法索引)。
+    """
+
+    def __init__(self, vector_store, max_group_rows: Optional[int] = None, max_wait_ms: Optional[float] = None,
+                 listeners: Optional[List[Callable[[str, dict], None]]] = None):
+        self.vector_store = vector_store
+        self.listeners = list(listeners or [])
+        if max_group_rows is None:
+            max_group_rows = config_manager.get("writer_group_max_rows", 2000)
+        if max_wait_ms is None:
+            max_wait_ms = config_manager.get("writer_group_max_wait_ms", 50)
+        self.max_group_rows = max(1, int(max_group_rows))
+        self.max_wait = max(0.0, float(max_wait_ms) / 1000.0)
+        self.groups_committed = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="docbrain-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, kind: str, **kwargs) -> Future:
+        if not self._thread.is_alive():
+            raise RuntimeError("IngestWriter has been stopped.")
+        op = WriteOp(kind, kwargs)
+        self._queue.put(op)
+        return op.future
+
+    # 同步便捷方法: 等待所在的组提交完成
+    def add(self, **kwargs):
+        return self.submit("add", **kwargs).result()
+
+    def upsert(self, **kwargs):
+        return self.submit("upsert", **kwargs).result()
+
+    def update(self, **kwargs):
+        return self.submit("update", **kwargs).result()
+
+    def delete(self, **kwargs):
+        return self.submit("delete", **kwargs).result()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            op = self._queue.get()
+            if op is None:
+                break
+            group = [op]
+            rows = op.rows()
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_group_rows:
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    # 只有一个写入说明没有并发的写入者，立即提交
+                    timeout = min(ARRIVAL_GAP_SECONDS, deadline - time.monotonic())
+                    if len(group) == 1 or timeout <= 0:
+                        break
+                    try:
+                        nxt = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                if nxt is None:
+                    stopping = True
+                    break
+                group.append(nxt)
+                rows += nxt.rows()
+            self._commit(group)
+
+    def _commit(self, group: List[WriteOp]):
+        for segment in self._merge(group):
+            self._apply(segment)
+        try:
+            self.vector_store.persist()
+        except Exception:
+            # Chroma 0.4+ 自动持久化，persist 可能不可用
+            pass
+        self.groups_committed += 1
+        for op in group:
+            if not op.future.done():
+                op.future.set_result(None)
+
+    def _merge(self, group: List[WriteOp]) -> List[List[WriteOp]]:
+        """按顺序把相邻的同类写入合并为一段，同一段内的 ID 不重复。"""
+        segments = []
+        current, current_sig, current_ids = [], None, set()
+        for op in group:
+            sig = op.signature()
+            ids = op.kwargs.get("ids") or []
+            if current and sig is not None and sig == current_sig and current_ids.isdisjoint(ids):
+                current.append(op)
+                current_ids.update(ids)
+                continue
+            if current:
+                segments.append(current)
+            current, current_sig, current_ids = [op], sig, set(ids)
+        if current:
+            segments.append(current)
+        return segments
+
+    def _call(self, kind: str, kwargs: dict):
+        collection = self.vector_store._collection
+        getattr(collection, kind)(**kwargs)
+
+    def _notify(self, kind: str, kwargs: dict):
+        for listener in self.listeners:
+            try:
+                listener(kind, kwargs)
+            except Exception as e:
+                print(f"Error in writer listener for {kind}: {e}")
+
+    def _apply(self, segment: List[WriteOp]):
+        if len(segment) == 1:
+            op = segment[0]
+            try:
+                self._call(op.kind, op.kwargs)
+            except Exception as e:
+                op.future.set_exception(e)
+                return
+            self._notify(op.kind, op.kwargs)
+            return
+
+        kwargs = {}
+        for key in segment[0].kwargs:
+            if segment[0].kwargs[key] is None:
+                continue
+            merged = []
+            for op in segment:
+                merged.extend(op.kwargs[key])
+            kwargs[key] = merged
+        try:
+            self._call(segment[0].kind, kwargs)
+        except Exception:
+            # 合并调用失败时逐个重试，把异常交给对应的调用方
+            for op in segment:
+                self._apply([op])
+            return
+        self._notify(segment[0].kind, kwargs)
+
+    def stop(self):
+        """处理完队列中已有的写入后停止。"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
@@ -0,0 +1,155 @@
+import hashlib
+import math
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# 导入 src.config_manager 时会把新增的默认配置写回 docbrain_config.json，测试结束后恢复原文件
+CONFIG_PATH = os.path.join(BACKEND_DIR, "docbrain_config.json")
+_config_backup = open(CONFIG_PATH, "rb").read() if os.path.exists(CONFIG_PATH) else None
+
+def pytest_sessionfinish(session, exitstatus):
+    if _config_backup is not None:
+        with open(CONFIG_PATH, "wb") as f:
+            f.write(_config_backup)
+
+def _matches(metadata: dict, where: dict) -> bool:
+    """Chroma where 子句的最小实现: 等值、$in、$gte、$lte、$and。"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, c) for c in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$gte" and (value is None or value < operand):
+                    return False
+                if op == "$lte" and (value is None or value > operand):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+class FakeCollection:
+    """内存中的 Chroma 集合，实现引擎用到的 get / query / add / upsert / update / delete。"""
+
+    def __init__(self):
+        self.rows = {}
+        self.calls = []
+
+    def _select(self, ids=None, where=None):
+        selected = ids if ids is not None else list(self.rows)
+        return [i for i in selected if i in self.rows and _matches(self.rows[i]["metadata"], where)]
+
+    def get(self, ids=None, where=None, include=None, limit=None, offset=0):
+        self.calls.append(("get", where))
+        selected = self._select(ids, where)[offset:]
+        if limit is not None:
+            selected = selected[:limit]
+        return {
+            "ids": selected,
+            "documents": [self.rows[i]["document"] for i in selected],
+            "metadatas": [dict(self.rows[i]["metadata"]) for i in selected]
+        }
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        self.calls.append(("query", where))
+        q = query_embeddings[0]
+        scored = sorted(
+            (1 - sum(a * b for a, b in zip(q, self.rows[i]["embedding"])), i)
+            for i in self._select(None, where)
+        )[:n_results]
+        ids = [i for _, i in scored]
+        return {
+            "ids": [ids],
+            "documents": [[self.rows[i]["document"] for i in ids]],
+            "metadatas": [[dict(self.rows[i]["metadata"]) for i in ids]],
+            "distances": [[d for d, _ in scored]]
+        }
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None):
+        self.calls.append(("upsert", len(ids)))
+        for n, chunk_id in enumerate(ids):
+            self.rows[chunk_id] = {
+                "embedding": embeddings[n] if embeddings is not None else [0.0],
+                "metadata": dict(metadatas[n]) if metadatas is not None else {},
+                "document": documents[n] if documents is not None else ""
+            }
+
+    add = upsert
+
+    def update(self, ids, embeddings=None, metadatas=None, documents=None):
+        self.calls.append(("update", len(ids)))
+        for n, chunk_id in enumerate(ids):
+            row = self.rows.get(chunk_id)
+            if row is None:
+                continue
+            if metadatas is not None:
+                for key, value in metadatas[n].items():
+                    if value is None:
+                        row["metadata"].pop(key, None)
+                    else:
+                        row["metadata"][key] = value
+            if documents is not None:
+                row["document"] = documents[n]
+
+    def delete(self, ids=None, where=None):
+        self.calls.append(("delete", where))
+        for chunk_id in self._select(ids, where):
+            del self.rows[chunk_id]
+
+    def count(self):
+        return len(self.rows)
+
+class FakeChroma:
+    def __init__(self, persist_directory=None, embedding_function=None):
+        self._collection = FakeCollection()
+
+    def persist(self):
+        pass
+
+class FakeEmbeddings:
+    """按词哈希生成的归一化向量，共享词越多越相近。"""
+    loaded = True
+    model_id = "fake"
+
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+        self.calls = []
+
+    def _vector(self, text: str):
+        v = [0.0] * self.dim
+        for word in text.lower().split():
+            v[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1.0
+        norm = math.sqrt(sum(x * x for x in v)) or 1.0
+        return [x / norm for x in v]
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """使用内存集合与假嵌入模型的 IngestionEngine。"""
+    import src.ingest
+    monkeypatch.setattr(src.ingest, "Chroma", FakeChroma)
+    monkeypatch.setattr(src.ingest, "get_embedding_model", lambda model_name=None: FakeEmbeddings())
+    eng = src.ingest.IngestionEngine(persist_directory=str(tmp_path / "db"))
+    yield eng
+    eng.close()
+
+@pytest.fixture
+def collection(engine):
+    return engine.vector_store._collection
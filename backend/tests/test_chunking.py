@@ -0,0 +1,28 @@
+import src.ingest
+from src.ingest import iter_chunks, iter_file_segments, parse_file, split_documents
+
+def test_text_segments_reassemble_exactly(tmp_path):
+    path = tmp_path / "notes.md"
+    text = "".join(f"line {i} of the notes\n" + ("\n" if i % 7 == 0 else "") for i in range(1800))
+    path.write_text(text, encoding="utf-8")
+
+    segments = list(iter_file_segments(str(path)))
+    assert len(segments) > 1
+    assert "".join(segments) == text
+
+def test_streamed_chunks_match_whole_file_split(tmp_path, monkeypatch):
+    # 缓冲区调小，使切分跨越多个 500 行的文本段
+    monkeypatch.setattr(src.ingest, "STREAM_BUFFER_CHARS", 4000)
+    path = tmp_path / "notes.txt"
+    lines = []
+    for i in range(2600):
+        lines.append(f"entry {i}: " + "word " * (i % 13) + "\n")
+        if i % 40 == 39:
+            lines.append("\n")
+    path.write_text("".join(lines), encoding="utf-8")
+
+    streamed = [doc.page_content for doc in iter_chunks(str(path))]
+    whole = [doc.page_content for doc in split_documents(parse_file(str(path)))]
+    assert streamed == whole
+    # 500 行分组的边界不会产生多余的空行
+    assert not any("\n\n\n" in chunk for chunk in streamed)
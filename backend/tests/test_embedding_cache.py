@@ -0,0 +1,28 @@
+from src.embedding_cache import EmbeddingCache
+
+def vectors(prefix, n):
+    return {EmbeddingCache.make_key("m", f"{prefix}{i}"): [float(i), 1.0] for i in range(n)}
+
+def test_count_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    # 模拟进程池子进程与 API 进程各自打开同一个缓存文件
+    first, second = EmbeddingCache(path, max_entries=100), EmbeddingCache(path, max_entries=100)
+    first.put_many(vectors("a", 40))
+    second.put_many(vectors("b", 40))
+    first.put_many(vectors("a", 40))  # 重复写入不计数
+    assert first.count() == second.count() == 80
+
+    second.put_many(vectors("c", 30))
+    # 超过上限后淘汰到容量的 90%
+    assert first.count() == 90
+    with first._get_conn() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 90
+
+def test_count_initialised_from_existing_rows(tmp_path):
+    path = str(tmp_path / "cache.db")
+    EmbeddingCache(path).put_many(vectors("a", 5))
+    with EmbeddingCache(path)._get_conn() as conn:
+        conn.execute("DELETE FROM meta")
+        conn.commit()
+    assert EmbeddingCache(path).count() == 5
+    assert EmbeddingCache(path).get_many(list(vectors("a", 5)))
@@ -0,0 +1,51 @@
+import threading
+
+from conftest import FakeEmbeddings
+from src.embedding_cache import CachedEmbeddings, EmbeddingCache
+from src.embedding_service import QueryEmbeddingService
+from src.embeddings import SharedEmbeddings
+
+def _shared(tmp_path):
+    base = FakeEmbeddings()
+    cache = EmbeddingCache(str(tmp_path / "cache.db"))
+    shared = SharedEmbeddings("fake")
+    shared._model = CachedEmbeddings(base, cache, "fake")
+    shared._model_id = "fake"
+    return shared, base, cache
+
+def test_queries_do_not_fill_document_cache(tmp_path):
+    shared, base, cache = _shared(tmp_path)
+    service = QueryEmbeddingService(shared, max_batch=8, max_wait_ms=1)
+    try:
+        vector = service.embed("what changed in the release")
+    finally:
+        service.stop()
+
+    assert vector == base.embed_query("what changed in the release")
+    assert cache.stats()["entries"] == 0
+    shared.embed_query("another question")
+    assert cache.stats()["entries"] == 0
+
+    # 文档仍然写入缓存
+    shared.embed_documents(["a chunk of text"])
+    assert cache.stats()["entries"] == 1
+
+def test_concurrent_queries_share_a_batch(tmp_path):
+    shared, base, _ = _shared(tmp_path)
+    service = QueryEmbeddingService(shared, max_batch=16, max_wait_ms=200)
+    results = {}
+
+    def ask(text):
+        results[text] = service.embed(text)
+
+    texts = [f"question {n}" for n in range(6)] + ["question 0"]
+    threads = [threading.Thread(target=ask, args=(t,)) for t in texts]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    service.stop()
+
+    assert all(results[t] == base.embed_query(t) for t in texts)
+    assert service.requests == len(texts)
+    assert service.batches < len(texts)
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.endpoint_executor import EndpointExecutor, EndpointBusy
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+def test_run_rejects_when_queue_is_full():
+    executor = EndpointExecutor("test", max_concurrency=1, max_queue=0)
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(EndpointBusy):
+            await executor.run(lambda: None)
+        release.set()
+        await first
+
+    asyncio.run(main())
+    assert executor.stats()["rejected"] == 1
+    assert executor.running == executor.queued == 0
+    executor.shutdown()
+
+def test_stream_rejects_before_iteration_when_busy():
+    executor = EndpointExecutor("test", max_concurrency=1, max_queue=0)
+    release = threading.Event()
+
+    async def main():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(EndpointBusy):
+            executor.stream(lambda: iter([1]))
+        release.set()
+        await running
+
+    asyncio.run(main())
+    executor.shutdown()
+
+def test_stream_never_iterated_holds_no_slot():
+    executor = EndpointExecutor("test", max_concurrency=1, max_queue=0)
+
+    async def main():
+        executor.stream(lambda: iter([1, 2]))
+        executor.stream(lambda: iter([1, 2]))
+        return [item async for item in executor.stream(lambda: iter([1, 2]))]
+
+    assert asyncio.run(main()) == [1, 2]
+    assert executor.running == executor.queued == 0
+    executor.shutdown()
+
+def test_closing_stream_releases_slot_and_stops_producer():
+    executor = EndpointExecutor("test", max_concurrency=1, max_queue=0)
+    produced = []
+    closed = threading.Event()
+
+    def tokens():
+        try:
+            for n in range(1000):
+                produced.append(n)
+                time.sleep(0.002)
+                yield n
+        finally:
+            closed.set()
+
+    async def main():
+        stream = executor.stream(tokens)
+        received = []
+        async for token in stream:
+            received.append(token)
+            if len(received) == 3:
+                break
+        await stream.aclose()
+        return received
+
+    assert asyncio.run(main()) == [0, 1, 2]
+    assert closed.wait(2.0)
+    _wait_for(lambda: executor.running == 0)
+    assert executor.queued == 0
+    assert len(produced) < 1000
+    executor.shutdown()
+
+def test_stream_closed_while_queued_returns_slot():
+    executor = EndpointExecutor("test", max_concurrency=1, max_queue=1)
+    release = threading.Event()
+    started = []
+
+    async def main():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        stream = executor.stream(lambda: started.append(1) or iter([1]))
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.05)
+        assert executor.queued == 1
+        pending.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+        await stream.aclose()
+        assert executor.queued == 0
+        release.set()
+        await running
+
+    asyncio.run(main())
+    assert started == []
+    assert executor.running == executor.queued == 0
+    executor.shutdown()
+
+def test_stream_propagates_errors():
+    executor = EndpointExecutor("test", max_concurrency=1, max_queue=0)
+
+    def tokens():
+        yield "a"
+        raise ValueError("boom")
+
+    async def main():
+        received = []
+        with pytest.raises(ValueError):
+            async for token in executor.stream(tokens):
+                received.append(token)
+        return received
+
+    assert asyncio.run(main()) == ["a"]
+    assert executor.running == executor.queued == 0
+    executor.shutdown()
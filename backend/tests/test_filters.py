@@ -0,0 +1,79 @@
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from src.config_manager import config_manager
+from src.filters import build_where, parse_time
+
+def test_parse_time_formats():
+    assert parse_time(None) is None
+    assert parse_time("") is None
+    assert parse_time(1700000000) == 1700000000.0
+    assert parse_time("1700000000") == 1700000000.0
+    assert parse_time("2024-05-01T09:30") == datetime(2024, 5, 1, 9, 30).timestamp()
+    assert abs(parse_time("7d") - (time.time() - 7 * 24 * 3600)) < 5
+    assert abs(parse_time("12h") - (time.time() - 12 * 3600)) < 5
+
+def test_parse_time_end_of_day_only_for_dates():
+    start = datetime(2024, 5, 1).timestamp()
+    assert parse_time("2024-05-01") == start
+    assert parse_time("2024-05-01", end_of_day=True) == pytest.approx(start + 24 * 3600, abs=0.01)
+    assert parse_time("2024-05-01", end_of_day=True) < datetime(2024, 5, 2).timestamp()
+    assert parse_time("2024-05-01T09:30", end_of_day=True) == datetime(2024, 5, 1, 9, 30).timestamp()
+
+@pytest.mark.parametrize("value", ["yesterday", "2024-13-01", "7y"])
+def test_parse_time_rejects_invalid_input(value):
+    with pytest.raises(ValueError):
+        parse_time(value)
+
+def test_build_where_combines_conditions(tmp_path, monkeypatch):
+    monkeypatch.setitem(config_manager.config, "watch_paths", [str(tmp_path)])
+    assert build_where() is None
+    assert build_where(doc_type="webpage") == {"type": "webpage"}
+    assert build_where(extension="PDF") == {"extension": ".pdf"}
+    assert build_where(extension=["pdf,docx", ".md"]) == {"extension": {"$in": [".docx", ".md", ".pdf"]}}
+
+    where = build_where(root=str(tmp_path), modified_after="2024-05-01", modified_before="2024-05-31")
+    depth = len([p for p in os.path.normpath(str(tmp_path)).split(os.sep) if p])
+    assert where == {"$and": [
+        {f"dir_{depth}": os.path.normpath(str(tmp_path))},
+        {"mtime": {"$gte": parse_time("2024-05-01")}},
+        {"mtime": {"$lte": parse_time("2024-05-31", end_of_day=True)}}
+    ]}
+
+def test_build_where_rejects_invalid_filters(tmp_path, monkeypatch):
+    monkeypatch.setitem(config_manager.config, "watch_paths", [str(tmp_path / "watched")])
+    with pytest.raises(ValueError):
+        build_where(doc_type="image")
+    with pytest.raises(ValueError):
+        build_where(root=str(tmp_path / "elsewhere"))
+    with pytest.raises(ValueError):
+        build_where(modified_after="last week")
+
+def test_path_filter_matches_chunks_indexed_before_path_metadata(engine, collection, tmp_path):
+    inside = os.path.join(str(tmp_path), "docs", "old.txt")
+    outside = os.path.join(str(tmp_path), "other", "old.txt")
+    collection.upsert(
+        ids=["inside", "outside"],
+        embeddings=[[0.0], [0.0]],
+        metadatas=[{"source": inside, "type": "file", "mtime": 1.0},
+                   {"source": outside, "type": "file", "mtime": 1.0}],
+        documents=["legacy chunk", "legacy chunk"]
+    )
+    where = build_where(path_prefix=os.path.join(str(tmp_path), "docs"))
+    assert collection.get(where=where)["ids"] == []
+
+    engine.ensure_path_index()
+    assert collection.get(where=where)["ids"] == ["inside"]
+    assert "dir_1" in collection.rows["outside"]["metadata"]
+
+def test_filter_key_is_stable_for_relative_times():
+    from src.filters import filter_key
+    assert filter_key() is None
+    assert filter_key(doc_type=None, extensions=[]) is None
+    first = filter_key(doc_type="file", modified_after="7d")
+    time.sleep(0.01)
+    assert filter_key(modified_after="7d", doc_type="file") == first
+    assert filter_key(modified_after="7d") != filter_key(modified_after="30d")
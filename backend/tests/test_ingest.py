@@ -0,0 +1,210 @@
+import os
+
+import src.ingest
+from src.manifest import hash_file
+
+def paragraph(word: str) -> str:
+    return " ".join(f"{word}{i}" for i in range(150))
+
+def write(path, words):
+    path.write_text("\n\n".join(paragraph(w) for w in words), encoding="utf-8")
+    return str(path)
+
+def sources(collection):
+    return sorted({row["metadata"]["source"] for row in collection.rows.values()})
+
+def test_new_file_is_indexed_without_deletes(engine, collection, tmp_path):
+    path = write(tmp_path / "a.txt", ["alpha", "beta", "gamma"])
+    engine.process_file(path)
+
+    assert len(collection.rows) == 3
+    assert not [c for c in collection.calls if c[0] == "delete"]
+    entry = engine.manifest.get(os.path.abspath(path))
+    assert sorted(entry["chunk_ids"]) == sorted(collection.rows)
+    assert len(entry["chunk_hashes"]) == 3
+
+def test_unchanged_file_is_skipped(engine, collection, tmp_path):
+    path = write(tmp_path / "a.txt", ["alpha", "beta"])
+    engine.process_file(path)
+    calls = len(collection.calls)
+
+    os.utime(path, (os.stat(path).st_atime, os.stat(path).st_mtime + 10))
+    engine.process_file(path)
+    assert len(collection.calls) == calls
+
+def test_changed_file_reuses_unchanged_chunks(engine, collection, tmp_path):
+    path = write(tmp_path / "a.txt", ["alpha", "beta", "gamma"])
+    engine.process_file(path)
+    before = dict(collection.rows)
+
+    write(tmp_path / "a.txt", ["alpha", "gamma", "delta"])
+    engine.embedding_model.calls.clear()
+    engine.process_file(path)
+
+    texts = {row["document"].split()[0]: chunk_id for chunk_id, row in collection.rows.items()}
+    assert sorted(texts) == ["alpha0", "delta0", "gamma0"]
+    # 未变化的分块沿用原 ID，只有新分块被嵌入
+    assert texts["alpha0"] in before and texts["gamma0"] in before
+    assert texts["delta0"] not in before
+    assert [len(batch) for batch in engine.embedding_model.calls] == [1]
+    assert sorted(engine.manifest.get(os.path.abspath(path))["chunk_ids"]) == sorted(collection.rows)
+
+def test_reindex_is_idempotent(engine, collection, tmp_path):
+    path = write(tmp_path / "a.txt", ["alpha", "alpha", "beta"])
+    engine.process_file(path)
+    first = sorted(collection.rows)
+
+    engine.manifest.remove(os.path.abspath(path))
+    engine.process_file(path)
+    assert sorted(collection.rows) == first
+
+def seed_legacy(collection, source, words):
+    collection.upsert(
+        ids=[f"legacy-{w}" for w in words],
+        embeddings=[[0.0]] * len(words),
+        metadatas=[{"source": source, "mtime": 1.0, "duration": 30} for _ in words],
+        documents=[paragraph(w) for w in words]
+    )
+
+def test_legacy_chunks_replaced_after_successful_parse(engine, collection, tmp_path):
+    path = os.path.abspath(write(tmp_path / "a.txt", ["alpha", "beta"]))
+    seed_legacy(collection, path, ["old1", "old2"])
+
+    engine.process_file(path)
+    assert not [i for i in collection.rows if i.startswith("legacy-")]
+    assert len(collection.rows) == 2
+    # 旧数据的投入时长被继承
+    assert {row["metadata"]["duration"] for row in collection.rows.values()} == {30}
+
+def test_legacy_chunks_kept_when_parse_fails(engine, collection, tmp_path, monkeypatch):
+    path = os.path.abspath(write(tmp_path / "a.txt", ["alpha", "beta"]))
+    seed_legacy(collection, path, ["old1", "old2"])
+
+    def broken(file_path):
+        yield src.ingest.Document(page_content=paragraph("alpha"), metadata=src.ingest.file_metadata(file_path))
+        raise ValueError("corrupt file")
+
+    monkeypatch.setattr(src.ingest, "iter_chunks", broken)
+    engine.process_file(path)
+    assert sorted(collection.rows) == ["legacy-old1", "legacy-old2"]
+    assert engine.manifest.get(path) is None
+
+def test_move_document_rewrites_metadata_only(engine, collection, tmp_path):
+    path = write(tmp_path / "a.txt", ["alpha", "beta"])
+    engine.process_file(path)
+    ids = sorted(collection.rows)
+
+    dest = str(tmp_path / "sub" / "b.txt")
+    os.makedirs(os.path.dirname(dest))
+    os.rename(path, dest)
+    assert engine.move_document(path, dest)
+
+    assert sorted(collection.rows) == ids
+    assert sources(collection) == [dest]
+    assert collection.rows[ids[0]]["metadata"]["title"] == "b.txt"
+    assert engine.manifest.get(dest)["content_hash"] == hash_file(dest)
+
+def test_remove_documents_by_root(engine, collection, tmp_path):
+    keep = write(tmp_path / "keep.txt", ["alpha"])
+    os.makedirs(tmp_path / "drop")
+    drop = write(tmp_path / "drop" / "x.txt", ["beta"])
+    engine.process_file(keep)
+    engine.process_file(drop)
+
+    engine.remove_documents_by_root(str(tmp_path / "drop"))
+    assert sources(collection) == [os.path.abspath(keep)]
+    assert engine.list_documents_by_root(str(tmp_path / "drop")) == []
+
+def test_pool_keeps_working_while_large_files_stream(engine, tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from src.config_manager import config_manager
+
+    monkeypatch.setattr(src.ingest, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setitem(config_manager.config, "streaming_parse_threshold_mb", 0.01)
+    monkeypatch.setitem(config_manager.config, "embed_batch_size", 4)
+    large = write(tmp_path / "large.txt", [f"w{i}x" for i in range(60)])
+    small = [write(tmp_path / f"small{i}.txt", [f"s{i}"]) for i in range(3)]
+
+    recorded = []
+    record_manifest = engine._record_manifest
+    monkeypatch.setattr(engine, "_record_manifest",
+                        lambda source, *args: recorded.append(source) or record_manifest(source, *args))
+    engine.ingest_directory(str(tmp_path), workers=2)
+
+    assert sorted(recorded) == sorted(os.path.abspath(p) for p in [large] + small)
+    # 池中的小文件在大文件流式处理完成之前就已写入
+    assert recorded[-1] == os.path.abspath(large)
+
+def test_remove_webpage_deletes_vectors_and_postings(engine, collection):
+    url = "https://example.com/docs/nebula"
+    assert engine.ingest_webpage(url, "Nebula", "PROJECT_NEBULA launch notes") == 1
+    assert engine.lexical_index.search("project_nebula")
+
+    engine.remove_document(url)
+    assert collection.rows == {}
+    assert engine.lexical_index.search("project_nebula") == []
+    assert engine.manifest.get(url) is None
+
+def test_move_directory_with_chunks_outside_manifest_reindexes(engine, collection, tmp_path):
+    os.makedirs(tmp_path / "old")
+    tracked = write(tmp_path / "old" / "tracked.txt", ["alpha"])
+    engine.process_file(tracked)
+    # 清单以外的分块 (例如早期版本索引、清单丢失)
+    untracked = write(tmp_path / "old" / "untracked.txt", ["beta"])
+    engine.process_file(untracked)
+    engine.manifest.remove(os.path.abspath(untracked))
+
+    os.rename(tmp_path / "old", tmp_path / "new")
+    assert engine.move_directory(str(tmp_path / "old"), str(tmp_path / "new")) == 2
+
+    new_dir = str(tmp_path / "new")
+    assert sources(collection) == [os.path.join(new_dir, "tracked.txt"), os.path.join(new_dir, "untracked.txt")]
+    assert all(str(tmp_path / "old") not in row["metadata"].values() for row in collection.rows.values())
+    assert engine.get_ids_by_root(str(tmp_path / "old")) == []
+    assert sorted(engine.list_documents_by_root(new_dir)) == sources(collection)
+
+def test_move_directory_rewrites_metadata_when_manifest_covers_it(engine, collection, tmp_path):
+    os.makedirs(tmp_path / "old")
+    path = write(tmp_path / "old" / "a.txt", ["alpha", "beta"])
+    engine.process_file(path)
+    ids = sorted(collection.rows)
+
+    os.rename(tmp_path / "old", tmp_path / "new")
+    assert engine.move_directory(str(tmp_path / "old"), str(tmp_path / "new")) == 1
+    assert sorted(collection.rows) == ids
+    assert sources(collection) == [os.path.join(str(tmp_path / "new"), "a.txt")]
+
+def test_new_file_at_moved_path_does_not_take_over_moved_chunks(engine, collection, tmp_path):
+    a = os.path.abspath(write(tmp_path / "a.txt", ["alpha", "beta"]))
+    engine.process_file(a)
+    b = str(tmp_path / "b.txt")
+    os.rename(a, b)
+    assert engine.move_document(a, b)
+
+    # 原路径上新建的文件与移走的文件有相同的分块内容
+    write(tmp_path / "a.txt", ["alpha", "gamma"])
+    engine.process_file(a)
+    by_source = {}
+    for row in collection.rows.values():
+        by_source.setdefault(row["metadata"]["source"], []).append(row["document"].split()[0])
+    assert sorted(by_source[b]) == ["alpha0", "beta0"]
+    assert sorted(by_source[a]) == ["alpha0", "gamma0"]
+    assert sorted(engine.manifest.get(a)["chunk_ids"]) == sorted(
+        i for i, row in collection.rows.items() if row["metadata"]["source"] == a)
+
+    engine.remove_document(a)
+    assert sources(collection) == [b]
+    assert len(collection.rows) == 2
+
+def test_stale_ids_owned_by_another_source_are_not_deleted(engine, collection, tmp_path):
+    a = os.path.abspath(write(tmp_path / "a.txt", ["alpha", "beta"]))
+    engine.process_file(a)
+    entry = engine.manifest.get(a)
+    # 清单记录的旧 ID 被另一个来源占用 (例如清单滞后于一次移动)
+    other = str(tmp_path / "other.txt")
+    collection.update(ids=entry["chunk_ids"], metadatas=[{"source": other}] * len(entry["chunk_ids"]))
+
+    write(tmp_path / "a.txt", ["gamma"])
+    engine.process_file(a)
+    assert sorted(sources(collection)) == sorted([a, other])
+    assert len([r for r in collection.rows.values() if r["metadata"]["source"] == other]) == 2
@@ -0,0 +1,196 @@
+import os
+
+import pytest
+
+import src.lexical_index
+import src.query
+from conftest import FakeEmbeddings
+from src.lexical_index import LexicalIndex, tokenize
+
+@pytest.fixture
+def index(tmp_path):
+    return LexicalIndex(str(tmp_path / "lexical.db"))
+
+def test_tokenize_cjk_bigrams_and_identifiers():
+    assert tokenize("预算报告") == ["预算", "算报", "报告"]
+    assert tokenize("税") == ["税"]
+    tokens = tokenize("See PROJECT_NEBULA and INV-2024-0042")
+    assert "project_nebula" in tokens and "project" in tokens and "nebula" in tokens
+    assert "inv-2024-0042" in tokens and "0042" in tokens
+
+def test_bm25_ranks_exact_identifier_first(index):
+    index.add(
+        ["a", "b", "c"],
+        ["quarterly budget review for the team",
+         "invoice INV-2024-0042 was paid late, the budget is fine",
+         "the team meeting notes"],
+        [{"source": "a.txt"}, {"source": "b.txt"}, {"source": "c.txt"}]
+    )
+    hits = index.search("INV-2024-0042 budget", k=3)
+    assert [chunk_id for chunk_id, _ in hits][0] == "b"
+    assert {chunk_id for chunk_id, _ in hits} == {"a", "b"}
+    assert hits[0][1] > hits[1][1]
+
+def test_common_terms_skipped_when_query_has_rarer_ones(index, monkeypatch):
+    monkeypatch.setattr(src.lexical_index, "MAX_DF_MIN_CHUNKS", 0)
+    index.add(["a", "b", "c"], ["the plan", "the the report", "the launch"])
+    assert [chunk_id for chunk_id, _ in index.search("the report")] == ["b"]
+    # 只有常见词时仍然返回结果
+    assert len(index.search("the")) == 3
+
+def test_listener_keeps_index_in_sync(index):
+    index.on_write("upsert", {
+        "ids": ["a", "b"], "documents": ["alpha report", "beta report"],
+        "metadatas": [{"source": "/docs/a.txt"}, {"source": "/docs/b.txt"}]
+    })
+    index.ensure_loaded()
+    assert len(index) == 2
+
+    index.on_write("update", {"ids": ["a"], "metadatas": [{"source": "/moved/a.txt"}]})
+    assert index.chunks["a"][0] == "/moved/a.txt"
+    assert "/docs/a.txt" not in index.source_chunks
+
+    index.on_write("update", {"ids": ["b"], "documents": ["gamma"], "metadatas": [{"source": "/docs/b.txt"}]})
+    assert index.search("beta") == []
+    assert [chunk_id for chunk_id, _ in index.search("gamma")] == ["b"]
+
+    index.on_write("delete", {"where": {"source": "/moved/a.txt"}})
+    index.on_write("delete", {"ids": ["b"]})
+    assert len(index) == 0
+    assert index.stats()["chunks"] == 0
+
+def test_index_loads_lazily(tmp_path):
+    path = str(tmp_path / "lexical.db")
+    LexicalIndex(path).add(["a"], ["alpha report"], [{"source": "a.txt"}])
+
+    index = LexicalIndex(path)
+    assert not index.loaded
+    assert index.stats() == {"chunks": 1, "terms": None, "loaded": False}
+    # 未加载时的写入只进入 SQLite
+    index.delete(source="a.txt")
+    index.add(["b"], ["beta report"], [{"source": "b.txt"}])
+    assert not index.loaded
+
+    assert [chunk_id for chunk_id, _ in index.search("report")] == ["b"]
+    assert index.loaded
+
+def test_writes_from_another_instance_are_picked_up(tmp_path):
+    path = str(tmp_path / "lexical.db")
+    reader, writer = LexicalIndex(path), LexicalIndex(path)
+    reader.check_interval = 0
+    writer.add(["a"], ["alpha"], [{"source": "a.txt"}])
+    assert [chunk_id for chunk_id, _ in reader.search("alpha")] == ["a"]
+
+    writer.add(["b"], ["alpha beta"], [{"source": "b.txt"}])
+    writer.delete(source="a.txt")
+    reader.ensure_loaded()
+    assert [chunk_id for chunk_id, _ in reader.search("alpha")] == ["b"]
+
+    # 自己的写入直接更新内存，不需要重新加载
+    generation = reader.generation
+    reader.add(["c"], ["gamma"], [{"source": "c.txt"}])
+    assert reader.generation == generation + 1
+    assert [chunk_id for chunk_id, _ in reader.search("gamma")] == ["c"]
+
+def test_generation_check_is_throttled(tmp_path, monkeypatch):
+    path = str(tmp_path / "lexical.db")
+    reader, writer = LexicalIndex(path), LexicalIndex(path)
+    writer.add(["a"], ["alpha"], [{"source": "a.txt"}])
+    reader.ensure_loaded()
+
+    connects = []
+    connect = reader._get_conn
+    monkeypatch.setattr(reader, "_get_conn", lambda: connects.append(1) or connect())
+    for _ in range(50):
+        reader.search("alpha")
+    assert connects == []
+
+    # 索引文件未变化时即使间隔已到也不连接数据库
+    reader.check_interval = 0
+    reader.search("alpha")
+    reader.search("alpha")
+    assert len(connects) <= 1
+
+def test_stale_index_reloads_in_background(tmp_path):
+    path = str(tmp_path / "lexical.db")
+    reader, writer = LexicalIndex(path), LexicalIndex(path)
+    reader.check_interval = 0
+    writer.add(["a"], ["alpha"], [{"source": "a.txt"}])
+    reader.ensure_loaded()
+
+    writer.add(["b"], ["alpha beta"], [{"source": "b.txt"}])
+    # 查询不等待重新加载
+    assert [chunk_id for chunk_id, _ in reader.search("alpha")] in (["a"], ["b", "a"], ["a", "b"])
+    reader._reload_thread.join(5)
+    assert {chunk_id for chunk_id, _ in reader.search("alpha")} == {"a", "b"}
+
+def test_writes_during_reload_are_not_blocked_and_replayed(tmp_path, monkeypatch):
+    path = str(tmp_path / "lexical.db")
+    index = LexicalIndex(path)
+    index.add(["a"], ["alpha"], [{"source": "a.txt"}])
+    read_chunks = LexicalIndex._read_chunks
+
+    def slow_read(conn):
+        for entry in read_chunks(conn):
+            # 加载不持有内存锁: 同一线程在加载中途写入不会死锁
+            index.add(["b"], ["beta"], [{"source": "b.txt"}])
+            index.delete(source="a.txt")
+            yield entry
+    monkeypatch.setattr(index, "_read_chunks", slow_read)
+    index.ensure_loaded()
+    monkeypatch.undo()
+
+    assert sorted(index.chunks) == ["b"]
+    assert index.search("alpha") == []
+    assert [chunk_id for chunk_id, _ in index.search("beta")] == ["b"]
+    # 重放后与 SQLite 一致，不会再触发重新加载
+    index.check_interval = 0
+    assert not index._changed()
+
+def test_ingest_writes_reach_the_index(engine, tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("PROJECT_NEBULA launch checklist", encoding="utf-8")
+    engine.process_file(str(path))
+    hits = engine.lexical_index.search("project_nebula")
+    assert len(hits) == 1
+
+    engine.remove_document(str(path))
+    assert engine.lexical_index.search("project_nebula") == []
+
+@pytest.fixture
+def query_engine(engine, monkeypatch):
+    monkeypatch.setattr(src.query, "get_embedding_model", lambda model_name=None: engine.embedding_model)
+    qe = src.query.QueryEngine(vector_store=engine.vector_store, ingestor=engine)
+    yield qe
+    qe.close()
+
+def test_hybrid_search_fuses_dense_and_lexical_ranks(engine, collection, query_engine, tmp_path):
+    texts = {
+        "a.txt": "apple banana cherry",
+        "b.txt": "apple banana INV-2024-0042",
+        "c.txt": "durian elderberry fig"
+    }
+    for name, text in texts.items():
+        (tmp_path / name).write_text(text, encoding="utf-8")
+        engine.process_file(str(tmp_path / name))
+    assert query_engine.prepare_lexical_index()
+
+    query = "apple banana INV-2024-0042"
+    results = query_engine._hybrid_search(query, FakeEmbeddings().embed_query(query), 3)
+    names = [os.path.basename(doc.metadata["source"]) for doc, _ in results]
+    scores = [score for _, score in results]
+    # b.txt 在两路中都排第一，融合分数归一化为 1
+    assert names[0] == "b.txt"
+    assert scores[0] == pytest.approx(1.0)
+    assert scores == sorted(scores, reverse=True)
+    assert "c.txt" in names  # 只由向量检索召回
+
+def test_hybrid_search_applies_where_to_lexical_hits(engine, query_engine, tmp_path):
+    for name in ("a.txt", "b.md"):
+        (tmp_path / name).write_text("PROJECT_NEBULA status", encoding="utf-8")
+        engine.process_file(str(tmp_path / name))
+    query_engine.prepare_lexical_index()
+
+    query = "project_nebula"
+    results = query_engine._hybrid_search(query, FakeEmbeddings().embed_query(query), 5, {"extension": ".md"})
+    assert [os.path.basename(doc.metadata["source"]) for doc, _ in results] == ["b.md"]
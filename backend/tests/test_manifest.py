@@ -0,0 +1,27 @@
+from src.manifest import FileManifest
+
+def test_upsert_get_and_prefix(tmp_path):
+    manifest = FileManifest(str(tmp_path / "m.db"))
+    manifest.upsert("/data/a.txt", 10, 1.0, "h1", ["c1", "c2"], 5, chunk_hashes=["x", "y"])
+    manifest.upsert("/data/sub/b.txt", 20, 2.0, "h2", ["c3"], 0, chunk_hashes=["z"])
+    manifest.upsert("/data2/c.txt", 30, 3.0, "h3", [], 0)
+
+    entry = manifest.get("/data/a.txt")
+    assert entry["chunk_ids"] == ["c1", "c2"]
+    assert entry["chunk_hashes"] == ["x", "y"]
+    assert entry["duration"] == 5
+    # 前缀按目录匹配，不包含 /data2
+    assert sorted(manifest.list_prefix("/data")) == ["/data/a.txt", "/data/sub/b.txt"]
+
+def test_rename_touch_and_remove_prefix(tmp_path):
+    manifest = FileManifest(str(tmp_path / "m.db"))
+    manifest.upsert("/data/a.txt", 10, 1.0, "h1", ["c1"], 0, chunk_hashes=["x"])
+    manifest.touch("/data/a.txt", 11, 9.0)
+    manifest.rename("/data/a.txt", "/other/a.txt")
+
+    assert manifest.get("/data/a.txt") is None
+    entry = manifest.get("/other/a.txt")
+    assert (entry["size"], entry["mtime"], entry["chunk_ids"]) == (11, 9.0, ["c1"])
+
+    manifest.remove_prefix("/other")
+    assert manifest.get("/other/a.txt") is None
@@ -0,0 +1,26 @@
+from src.config_manager import config_manager
+from src.ranking import get_priority_keywords, path_ranking_metadata
+
+def test_keywords_follow_config_changes(monkeypatch):
+    monkeypatch.setenv("PRIORITY_KEYWORDS", "report")
+    monkeypatch.setitem(config_manager.config, "priority_keywords", "")
+    assert get_priority_keywords() == ["report"]
+
+    # 例如 POST /config 保存后，不需要重启进程
+    monkeypatch.setitem(config_manager.config, "priority_keywords", "Work, Notes")
+    assert get_priority_keywords() == ["work", "notes"]
+    assert path_ranking_metadata("/data/work/a.txt") == {"priority": 1, "path_tier": 1}
+
+def test_keyword_change_updates_indexed_chunks(engine, collection, tmp_path, monkeypatch):
+    monkeypatch.setitem(config_manager.config, "priority_keywords", "")
+    monkeypatch.delenv("PRIORITY_KEYWORDS", raising=False)
+    path = tmp_path / "zzboost.txt"
+    path.write_text("quarterly numbers", encoding="utf-8")
+    engine.process_file(str(path))
+    engine.ensure_ranking_features()
+    assert all(m["path_tier"] == 0 for m in collection.get(include=["metadatas"])["metadatas"])
+
+    monkeypatch.setitem(config_manager.config, "priority_keywords", "zzboost")
+    engine.ensure_ranking_features()
+    metadatas = collection.get(include=["metadatas"])["metadatas"]
+    assert metadatas and all(m["priority"] == 1 and m["path_tier"] == 2 for m in metadatas)
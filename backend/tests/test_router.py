@@ -0,0 +1,30 @@
+from src.router import ComplexityRouter, heuristic_score
+
+def test_weak_keyword_alone_does_not_route_complex():
+    router = ComplexityRouter(threshold=0.3)
+    for query in ("Why was the Tokyo launch delayed?", "What risks did the Q3 report flag?"):
+        decision = router.route(query)
+        assert decision["complex"] is None, (query, decision)
+
+def test_strong_patterns_still_decide_locally():
+    router = ComplexityRouter(threshold=0.3)
+    assert router.route("Compare the Q1 margins across regions and recommend where to invest.")["complex"] is True
+    assert router.route("How many customers do we have in Germany?")["complex"] is False
+
+def test_weak_keywords_nudge_the_score():
+    assert 0 < heuristic_score("Why was the Tokyo launch delayed?") < heuristic_score(
+        "Analyze why the Tokyo launch was delayed.")
+
+def test_fit_does_not_fill_document_cache(tmp_path):
+    from conftest import FakeEmbeddings
+    from src.embedding_cache import CachedEmbeddings, EmbeddingCache
+    from src.embeddings import SharedEmbeddings
+
+    cache = EmbeddingCache(str(tmp_path / "cache.db"))
+    shared = SharedEmbeddings("fake")
+    shared._model = CachedEmbeddings(FakeEmbeddings(), cache, "fake")
+    shared._model_id = "fake"
+    router = ComplexityRouter(shared, threshold=0.3)
+    router.ensure_fitted()
+    assert router.centroids is not None
+    assert cache.count() == 0
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from src.writer import IngestWriter, WriteOp
+from conftest import FakeChroma
+
+@pytest.fixture
+def store():
+    return FakeChroma()
+
+def make_writer(store, listeners=None, max_wait_ms=50):
+    return IngestWriter(store, max_group_rows=2000, max_wait_ms=max_wait_ms, listeners=listeners)
+
+def rows(n, prefix="c"):
+    ids = [f"{prefix}{i}" for i in range(n)]
+    return dict(ids=ids, embeddings=[[1.0]] * n, metadatas=[{"source": prefix} for _ in ids], documents=ids)
+
+def test_sequential_sync_writes_do_not_wait(store):
+    writer = make_writer(store, max_wait_ms=50)
+    try:
+        writer.upsert(**rows(20))
+        started = time.perf_counter()
+        for i in range(20):
+            writer.delete(ids=[f"c{i}"])
+        elapsed = time.perf_counter() - started
+    finally:
+        writer.stop()
+    # 每次同步写入都应立即提交，而不是等满 50 ms
+    assert elapsed < 0.5
+    assert store._collection.rows == {}
+
+def test_queued_writes_are_merged_in_order(store):
+    writer = make_writer(store)
+    # 先占住写入线程，让后续写入在队列中排队
+    gate = threading.Event()
+    writer.listeners.append(lambda kind, kwargs: gate.wait(5) if kwargs.get("ids") == ["block"] else None)
+    first = writer.submit("delete", ids=["block"])
+    futures = [writer.submit("upsert", **rows(3, p)) for p in ("a", "b")]
+    futures.append(writer.submit("delete", ids=["a0"]))
+    futures.append(writer.submit("upsert", **rows(1, "a")))
+    gate.set()
+    for future in [first] + futures:
+        future.result(5)
+    writer.stop()
+
+    calls = store._collection.calls
+    # a、b 两次 upsert 合并为一次调用; 之后的 delete 与重复 ID 的 upsert 保持顺序
+    assert calls == [("delete", None), ("upsert", 6), ("delete", None), ("upsert", 1)]
+    assert "a0" in store._collection.rows
+
+def test_merge_keeps_where_ops_and_duplicate_ids_apart():
+    ops = [
+        WriteOp("upsert", {"ids": ["x"], "documents": ["1"]}),
+        WriteOp("upsert", {"ids": ["y"], "documents": ["2"]}),
+        WriteOp("upsert", {"ids": ["x"], "documents": ["3"]}),
+        WriteOp("delete", {"where": {"source": "s"}}),
+        WriteOp("delete", {"where": {"source": "t"}}),
+        WriteOp("delete", {"ids": ["y"]}),
+        WriteOp("update", {"ids": ["z"], "metadatas": [{}]}),
+    ]
+    segments = IngestWriter._merge(None, ops)
+    assert [len(s) for s in segments] == [2, 1, 1, 1, 1, 1]
+
+def test_failed_write_reaches_its_caller_only(store):
+    writer = make_writer(store)
+    collection = store._collection
+    original = collection.update
+
+    def update(ids, **kwargs):
+        if "bad" in ids:
+            raise ValueError("rejected")
+        return original(ids, **kwargs)
+
+    collection.update = update
+    writer.upsert(**rows(2))
+    gate = threading.Event()
+    writer.listeners.append(lambda kind, kwargs: gate.wait(5) if kwargs.get("ids") == ["block"] else None)
+    writer.submit("delete", ids=["block"])
+    good = writer.submit("update", ids=["c0"], metadatas=[{"tag": 1}])
+    bad = writer.submit("update", ids=["bad"], metadatas=[{"tag": 2}])
+    gate.set()
+    assert good.result(5) is None
+    with pytest.raises(ValueError):
+        bad.result(5)
+    writer.stop()
+    assert collection.rows["c0"]["metadata"]["tag"] == 1
+
+def test_listeners_see_committed_writes(store):
+    seen = []
+    writer = make_writer(store, listeners=[lambda kind, kwargs: seen.append((kind, list(kwargs.get("ids") or [])))])
+    writer.upsert(**rows(2))
+    writer.delete(where={"source": "c"})
+    writer.stop()
+    assert seen == [("upsert", ["c0", "c1"]), ("delete", [])]
@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import argparse
+
+# Add backend root to path
+# benchmark_embeddings.py is in backend/tools
+backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(backend_root)
+os.chdir(backend_root)
+
+from src.embeddings import create_base_embeddings, EMBEDDING_BACKENDS
+from src.ingest import iter_chunks
+
+# 对比各嵌入后端: 与 torch 向量的余弦相似度 (一致性) 以及每秒处理的分块数
+
+def load_samples(directory: str, limit: int):
+    texts = []
+    if directory:
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                try:
+                    texts.extend(chunk.page_content for chunk in iter_chunks(os.path.join(root, name)))
+                except Exception as e:
+                    print(f"Skipping {name}: {e}")
+                if len(texts) >= limit:
+                    return texts[:limit]
+    if not texts:
+        # 没有样本目录时使用合成文本 (中英混合，长度与真实分块接近)
+        base = "docBrain 本地知识库 benchmark sample paragraph about quarterly reports and meeting notes. "
+        texts = [f"{i}: " + base * (5 + i % 15) for i in range(limit)]
+    return texts[:limit]
+
+def cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = (sum(x * x for x in a) ** 0.5) * (sum(y * y for y in b) ** 0.5)
+    return dot / norm if norm else 0.0
+
+def benchmark(texts, backends, model_name: str, batch_size: int):
+    reference = None
+    results = []
+    for backend in backends:
+        try:
+            model = create_base_embeddings(model_name, backend)
+        except Exception as e:
+            print(f"{backend:<10} | unavailable: {e}")
+            continue
+
+        model.embed_documents(texts[:batch_size])  # 预热
+        started = time.perf_counter()
+        vectors = []
+        for i in range(0, len(texts), batch_size):
+            vectors.extend(model.embed_documents(texts[i:i + batch_size]))
+        elapsed = time.perf_counter() - started
+
+        if backend == "torch":
+            reference = vectors
+        parity = None
+        if reference is not None:
+            sims = [cosine(a, b) for a, b in zip(reference, vectors)]
+            parity = (sum(sims) / len(sims), min(sims))
+        results.append((backend, len(texts) / elapsed if elapsed else 0.0, parity))
+
+    print(f"\n{'Backend':<10} | {'Chunks/s':>10} | {'Mean cos':>9} | {'Min cos':>9}")
+    print("-" * 48)
+    for backend, rate, parity in results:
+        mean_cos = f"{parity[0]:.5f}" if parity else "n/a"
+        min_cos = f"{parity[1]:.5f}" if parity else "n/a"
+        print(f"{backend:<10} | {rate:>10.1f} | {mean_cos:>9} | {min_cos:>9}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends")
+    parser.add_argument("directory", nargs="?", default=None, help="Directory with sample documents (optional)")
+    parser.add_argument("--limit", type=int, default=512, help="Number of chunks to embed")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backends", default=",".join(EMBEDDING_BACKENDS),
+                        help="Comma separated list, torch first to use it as the parity reference")
+    args = parser.parse_args()
+
+    texts = load_samples(args.directory, args.limit)
+    print(f"Embedding {len(texts)} chunks...")
+    benchmark(texts, [b.strip() for b in args.backends.split(",") if b.strip()], args.model, args.batch_size)
@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+import random
+import itertools
+import argparse
+import tempfile
+
+# Add backend root to path
+# benchmark_lexical.py is in backend/tools
+backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(backend_root)
+os.chdir(backend_root)
+
+from src.lexical_index import LexicalIndex
+
+# BM25 词法索引的基准: 构建耗时、首次查询 (从 SQLite 加载) 耗时，以及查询延迟 p50 / p95。
+# 语料为合成的中英混合分块，带项目代号与发票号这类标识符。
+
+COMMON = ("budget report meeting launch review customer revenue margin pricing strategy region "
+          "contract vendor roadmap milestone risk team notes quarterly summary invoice").split()
+CJK = "预算报告会议发布客户收入利润定价战略区域合同供应商路线图里程碑风险团队季度总结发票"
+
+def make_vocabulary(rng: random.Random, size: int):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return COMMON + ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+def make_chunk(rng: random.Random, vocabulary, cum_weights, n: int) -> str:
+    # 词频近似 Zipf 分布: 少数常见词出现在大部分分块中
+    words = rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(60, 160))
+    start = rng.randrange(len(CJK) - 20)
+    words.append(CJK[start:start + rng.randint(6, 20)])
+    words.append(f"PROJECT_{n % 500:03d}")
+    words.append(f"INV-2024-{n:05d}")
+    return " ".join(words)
+
+def make_queries(rng: random.Random, vocabulary, chunks: int, count: int):
+    queries = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            queries.append(" ".join(rng.sample(COMMON, 2) + rng.sample(vocabulary[:500], 1)))
+        elif kind == 1:
+            start = rng.randrange(len(CJK) - 6)
+            queries.append(CJK[start:start + 6])
+        elif kind == 2:
+            queries.append(f"INV-2024-{rng.randrange(chunks):05d} {rng.choice(COMMON)}")
+        else:
+            queries.append(f"PROJECT_{rng.randrange(500):03d} {rng.choice(COMMON)} {rng.choice(COMMON)}")
+    return queries
+
+def percentile(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def benchmark(chunks: int, queries: int, k: int, seed: int, vocabulary_size: int):
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng, vocabulary_size)
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(vocabulary))))
+    texts = [make_chunk(rng, vocabulary, cum_weights, n) for n in range(chunks)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "lexical_index.db")
+        index = LexicalIndex(path)
+
+        started = time.perf_counter()
+        batch = 1000
+        for offset in range(0, chunks, batch):
+            ids = [f"chunk-{n}" for n in range(offset, min(chunks, offset + batch))]
+            index.add(ids, texts[offset:offset + len(ids)],
+                      [{"source": f"/docs/{n // 20}.txt"} for n in range(offset, offset + len(ids))])
+        build_seconds = time.perf_counter() - started
+
+        # 新实例模拟进程重启: 构造不加载，第一次查询才加载
+        started = time.perf_counter()
+        cold = LexicalIndex(path)
+        init_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        cold.search("budget report", k)
+        first_seconds = time.perf_counter() - started
+
+        latencies = []
+        for query in make_queries(rng, vocabulary, chunks, queries):
+            started = time.perf_counter()
+            cold.search(query, k)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        stats = cold.stats()
+        print(f"\nChunks: {stats['chunks']}, terms: {stats['terms']}, queries: {queries}, k={k}")
+        print("-" * 60)
+        print(f"Build (tokenize + SQLite):  {build_seconds:.2f} s ({chunks / build_seconds:.0f} chunks/s)")
+        print(f"Open index:                 {init_seconds * 1000:.2f} ms")
+        print(f"First query (load):         {first_seconds * 1000:.1f} ms")
+        print(f"Query latency p50:          {percentile(latencies, 50):.2f} ms")
+        print(f"Query latency p95:          {percentile(latencies, 95):.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the BM25 lexical index")
+    parser.add_argument("--chunks", type=int, default=20000, help="Number of synthetic chunks")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("-k", type=int, default=8)
+    parser.add_argument("--vocabulary", type=int, default=20000, help="Distinct synthetic words besides the common ones")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    benchmark(args.chunks, args.queries, args.k, args.seed, args.vocabulary)
@@ -0,0 +1,130 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+# Add backend root to path
+# evaluate_router.py is in backend/tools
+backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(backend_root)
+os.chdir(backend_root)
+
+from dotenv import load_dotenv
+from src.router import ComplexityRouter, heuristic_score, load_samples, SAMPLES_FILE, EVAL_FILE
+
+load_dotenv()
+
+# 在留出的评估集上评估本地复杂度路由: 准确率、本地决策覆盖率，以及相对 LLM 分类节省的延迟。
+# 质心只用训练集拟合; 评估集默认是 eval.jsonl (不参与拟合的新问题)，
+# 没有该文件时按 --eval-fraction 从训练样本中按标签分层、固定种子划出一部分。
+
+def split_samples(samples, eval_fraction: float, seed: int):
+    rng = random.Random(seed)
+    train, held_out = [], []
+    for label in ("simple", "complex"):
+        group = [s for s in samples if s["label"] == label]
+        rng.shuffle(group)
+        n_eval = max(1, round(len(group) * eval_fraction)) if group else 0
+        held_out += group[:n_eval]
+        train += group[n_eval:]
+    return train, held_out
+
+def evaluate(samples_path: str, eval_path: str, eval_fraction: float, seed: int,
+             threshold: float, llm_latency_ms: float, with_llm: bool, no_embed: bool):
+    train = load_samples(samples_path)
+    if not train:
+        print(f"No samples found at {samples_path}")
+        return
+    held_out = load_samples(eval_path) if eval_path else []
+    if held_out:
+        source = eval_path
+    else:
+        train, held_out = split_samples(train, eval_fraction, seed)
+        source = f"{eval_fraction:.0%} of {samples_path} (seed {seed})"
+    queries = [s["query"] for s in held_out]
+    labels = [s["label"] for s in held_out]
+
+    router = ComplexityRouter(threshold=threshold)
+    vectors = None
+    if not no_embed:
+        try:
+            from src.embeddings import get_embedding_model
+            model = get_embedding_model()
+            router.fit(model.embed_queries([s["query"] for s in train]), [s["label"] for s in train])
+            vectors = model.embed_queries(queries)
+        except Exception as e:
+            print(f"Embedding model unavailable ({e}), evaluating heuristics only.")
+
+    query_engine = None
+    if with_llm:
+        from src.query import QueryEngine
+        query_engine = QueryEngine()
+
+    heuristic_correct = centroid_correct = 0
+    local = local_correct = 0
+    final_correct = 0
+    route_seconds = llm_seconds = 0.0
+    llm_calls = 0
+
+    for i, (query, label) in enumerate(zip(queries, labels)):
+        is_complex = label == "complex"
+        heuristic_correct += (heuristic_score(query) > 0) == is_complex
+
+        vector = None
+        if vectors is not None:
+            vector = vectors[i]
+            centroid_correct += (router.centroid_probability(vector) > 0.5) == is_complex
+
+        started = time.perf_counter()
+        decision = router.route(query, vector)
+        route_seconds += time.perf_counter() - started
+
+        if decision["complex"] is not None:
+            local += 1
+            local_correct += decision["complex"] == is_complex
+            final_correct += decision["complex"] == is_complex
+        elif query_engine is not None:
+            started = time.perf_counter()
+            predicted = query_engine.evaluate_complexity(query)
+            llm_seconds += time.perf_counter() - started
+            llm_calls += 1
+            final_correct += predicted == is_complex
+        else:
+            # 没有 LLM 时按概率方向计入最终准确率
+            final_correct += (decision["probability"] > 0.5) == is_complex
+
+    n = len(held_out)
+    if llm_calls:
+        llm_latency_ms = llm_seconds / llm_calls * 1000
+    print(f"\nTrain: {len(train)} samples, eval: {n} ({labels.count('simple')} simple / {labels.count('complex')} complex) from {source}")
+    print(f"Threshold: {threshold}")
+    print("-" * 60)
+    print(f"Heuristic accuracy:         {heuristic_correct / n:.1%}")
+    if vectors is not None:
+        print(f"Centroid accuracy:          {centroid_correct / n:.1%}")
+    print(f"Local decisions:            {local}/{n} ({local / n:.1%})")
+    if local:
+        print(f"Local decision accuracy:    {local_correct / local:.1%}")
+    print(f"Overall accuracy:           {final_correct / n:.1%}" + ("" if with_llm else " (ambiguous queries scored by probability)"))
+    print(f"Avg local routing latency:  {route_seconds / n * 1000:.2f} ms")
+    print(f"LLM classifier latency:     {llm_latency_ms:.0f} ms" + (" (measured)" if llm_calls else " (assumed)"))
+    print(f"Latency saved per query:    {local / n * llm_latency_ms - route_seconds / n * 1000:.0f} ms on average")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the local query complexity router")
+    parser.add_argument("--samples", default=SAMPLES_FILE, help="Labelled training samples (jsonl with query/label)")
+    parser.add_argument("--eval", default=EVAL_FILE, help="Held-out samples; pass '' to split the training samples instead")
+    parser.add_argument("--eval-fraction", type=float, default=0.3, help="Share of training samples held out when there is no eval file")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the train/eval split")
+    parser.add_argument("--threshold", type=float, default=None, help="Confidence threshold (default: config)")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0, help="Assumed LLM classifier latency")
+    parser.add_argument("--with-llm", action="store_true", help="Call the LLM classifier for ambiguous queries and measure it")
+    parser.add_argument("--no-embed", action="store_true", help="Skip the embedding model (heuristics only)")
+    args = parser.parse_args()
+
+    threshold = args.threshold
+    if threshold is None:
+        from src.config_manager import config_manager
+        threshold = config_manager.get("router_confidence_threshold", 0.3)
+    evaluate(args.samples, args.eval, args.eval_fraction, args.seed, threshold, args.llm_latency_ms, args.with_llm, args.no_embed)
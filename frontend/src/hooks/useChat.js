@@ -51,32 +51,82 @@ export function useChat(currentSessionId, onLoadSessions) {
             // We trigger the callback to let parent know it might want to refresh sessions
             const isNewSession = messages.length <= 2
 
-            const response = await axios.post(`${API_URL}/query?session_id=${currentSessionId || ''}`, {
-                query: userMessage,
-                quality_mode: false,
-                force_crew: false
-            }, {
+            // Stream the answer over Server-Sent Events and render tokens as they arrive
+            const response = await fetch(`${API_URL}/query/stream?session_id=${currentSessionId || ''}`, {
+                method: 'POST',
                 headers: {
                     'Authorization': `Bearer ${API_KEY}`,
                     'Content-Type': 'application/json'
-                }
+                },
+                body: JSON.stringify({
+                    query: userMessage,
+                    quality_mode: false,
+                    force_crew: false
+                })
             })
 
-            if (response.data && response.data.status === 'success') {
-                setMessages(prev => [...prev, { role: 'assistant', content: response.data.response }])
-                if (isNewSession && onLoadSessions) {
-                    onLoadSessions()
+            if (!response.ok || !response.body) {
+                let detail = response.statusText
+                try {
+                    detail = (await response.json()).detail || detail
+                } catch (e) { /* not JSON */ }
+                setMessages(prev => [...prev, { role: 'assistant', content: `Server Error: ${detail}` }])
+                return
+            }
+
+            setMessages(prev => [...prev, { role: 'assistant', content: '' }])
+            const updateAnswer = (content) => {
+                setMessages(prev => [...prev.slice(0, -1), { role: 'assistant', content }])
+            }
+
+            const reader = response.body.getReader()
+            const decoder = new TextDecoder()
+            let buffer = ''
+            let answer = ''
+            let finished = false
+
+            while (!finished) {
+                const { value, done } = await reader.read()
+                if (done) break
+                buffer += decoder.decode(value, { stream: true })
+
+                // SSE events are separated by a blank line
+                let boundary
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const rawEvent = buffer.slice(0, boundary)
+                    buffer = buffer.slice(boundary + 2)
+
+                    let eventType = 'message'
+                    let data = ''
+                    for (const line of rawEvent.split('\n')) {
+                        if (line.startsWith('event:')) eventType = line.slice(6).trim()
+                        else if (line.startsWith('data:')) data += line.slice(5).trim()
+                    }
+                    if (!data) continue
+                    const payload = JSON.parse(data)
+
+                    if (eventType === 'error') {
+                        updateAnswer(`Server Error: ${payload.detail}`)
+                        finished = true
+                        break
+                    } else if (eventType === 'done') {
+                        updateAnswer(payload.response)
+                        finished = true
+                        break
+                    } else {
+                        answer += payload.token
+                        updateAnswer(answer)
+                    }
                 }
-            } else {
-                setMessages(prev => [...prev, { role: 'assistant', content: 'Error: Received unexpected response from server.' }])
+            }
+
+            if (isNewSession && onLoadSessions) {
+                onLoadSessions()
             }
 
         } catch (error) {
             console.error("API Error:", error)
-            let errorMsg = "Sorry, I couldn't connect to the server. Please check if the backend is running."
-            if (error.response) {
-                errorMsg = `Server Error: ${error.response.data.detail || error.response.statusText}`
-            }
+            const errorMsg = "Sorry, I couldn't connect to the server. Please check if the backend is running."
             setMessages(prev => [...prev, { role: 'assistant', content: errorMsg }])
         } finally {
             setIsLoading(false)